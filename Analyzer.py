@@ -1,6 +1,6 @@
 from matplotlib import pyplot as plt
-import pyxdf as xdf
 import numpy as np
+from XdfReader import XdfFile
 
 
 def plot_data(filename : str) -> None:
@@ -20,15 +20,13 @@ def plot_data(filename : str) -> None:
                 "Grid" : Specify the grid was in used in the session
                 "Origin" : Specify the origin was used in the session
                 }
+    Only the samples of stream 0 are decoded (see XdfReader.py), not those of the other streams of the file
     :param filename: path to the file contains the data
     """
-    data, header = xdf.load_xdf(filename)
-
-    # extract data in shape of (N, T)where N is number of channels and T is total interval
-    numeric_data = data[0]['time_series'].T
+    with XdfFile(filename) as data:
+        # extract data in shape of (N, T)where N is number of channels and T is total interval
+        numeric_data = data.read(next(iter(data.streams.values())))[0].T
     interval = np.arange(numeric_data.shape[1])
-    print(numeric_data.shape[1])
-    exit()
 
     # extract x and y: even indices in the data are the x coordinates and odd are the y coordinates
     x_coor = numeric_data[::2, :]   # even indices <=> odd places of rows
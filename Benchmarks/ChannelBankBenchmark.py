@@ -0,0 +1,54 @@
+"""Per-tick cost of computing the features of all the channels: TouchChannel.get_qualitiative_data for every channel,
+against the ChannelBank (vectorized numpy pass, and the python math path).
+Run from the root directory of the repository:
+    python -m Benchmarks.ChannelBankBenchmark
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import timeit
+
+import numpy as np
+
+from Main import TouchChannel, parameters
+from ChannelBank import ChannelBank
+from Benchmarks.SyntheticTouch import hands, jiggle
+
+CHANNELS = [1, 4, 16, 64, 256]
+FINGERS = 4
+REPEAT = 5
+
+
+def make_channels(n_channels):
+    bank = ChannelBank(n_channels)
+    channels = [TouchChannel(*parameters, bank=bank) for _ in range(n_channels)]
+    for ch, fingers in zip(channels, hands(n_channels, FINGERS)):
+        ch.activate(fingers[0])
+        for groupy in fingers[1:]:
+            ch.add_to_group(groupy)
+        jiggle(fingers)
+        ch.move()
+        ch.update_sustain(0.05)
+    return channels, bank
+
+
+def per_tick_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number * 1e6
+
+
+def main():
+    print("%-9s %14s %14s %14s %10s" % ("channels", "per-channel", "bank numpy", "bank math", "max diff"))
+    for n_channels in CHANNELS:
+        channels, bank = make_channels(n_channels)
+        reference = np.array([ch.get_qualitiative_data() for ch in channels], dtype=float)
+        diff = max(np.abs(bank.compute() - reference).max(), np.abs(np.array(bank.features_small()) - reference).max())
+
+        number = max(200, 20000 // n_channels)
+        object_path = per_tick_us(lambda: [ch.get_qualitiative_data() for ch in channels], number)
+        numpy_path = per_tick_us(bank.compute, number)
+        math_path = per_tick_us(bank.features_small, number)
+        print("%-9d %11.1f us %11.1f us %11.1f us %10.1e" % (n_channels, object_path, numpy_path, math_path, diff))
+
+
+if __name__ == '__main__':
+    main()
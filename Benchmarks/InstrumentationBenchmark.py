@@ -0,0 +1,65 @@
+"""The live touch pipeline with and without Instruments: a BroadcastEngine ticks the channels and broadcasts them over
+UDP, while this thread moves synthetic touches through a TouchRouter at a touch screen's rate.
+Prints the measured latency histograms, and the CPU cost of the instrumentation per tick.
+Run from the root directory of the repository:
+    python -m Benchmarks.InstrumentationBenchmark
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import random
+import time
+
+from Main import TouchChannel, TouchRouter, ChannelBank, ChannelScheduler, DataBroadcaster, parameters, TIME_SERIES_DT
+from BroadcastEngine import BroadcastEngine
+from Instrumentation import Instruments
+from Benchmarks.SyntheticTouch import hands, jiggle
+
+HANDS = 8
+FINGERS = 3
+SECONDS = 3
+EVENT_DT = 0.008
+
+
+def run(instrumented):
+    instruments = Instruments(TIME_SERIES_DT) if instrumented else None
+    bank = ChannelBank(HANDS)
+    channels = [TouchChannel(*parameters, bank=bank) for _ in range(HANDS)]
+    broadcaster = DataBroadcaster(channels, bank, instruments=instruments)
+    scheduler = ChannelScheduler(channels, listeners=[broadcaster.broadcast])
+    router = TouchRouter(channels, mouse_mode=False, scheduler=scheduler, instruments=instruments)
+    engine = BroadcastEngine(scheduler.tick, TIME_SERIES_DT)
+
+    touches = [t for hand in hands(HANDS, FINGERS) for t in hand]
+    rnd = random.Random(0)
+    for touch in touches:
+        router.on_touch_down(touch)
+    engine.start()
+    end = time.perf_counter() + SECONDS
+    while time.perf_counter() < end:
+        jiggle(touches, rnd=rnd)
+        for touch in touches:
+            router.on_touch_move(touch)
+        time.sleep(EVENT_DT)
+    engine.stop()
+    return engine, instruments
+
+
+def main():
+    print("%d hands x %d fingers moving every %.0f ms, for %d s" % (HANDS, FINGERS, EVENT_DT * 1e3, SECONDS))
+    engine, _ = run(False)
+    print("not instrumented: %s" % engine.stats.summary())
+    engine, instruments = run(True)
+    print("instrumented:     %s" % engine.stats.summary())
+    print(instruments.summary())
+    start = time.perf_counter()
+    n = 100000
+    for _ in range(n):
+        t = instruments.begin_tick()
+        instruments.stage("features", t)
+        instruments.end_tick()
+    print("instrumentation cost: %.2f us per tick" % ((time.perf_counter() - start) / n * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""CPU cost per tick of sending the positions of the channels to LSL: a python list built from get_pos_as_list() and
+pushed with push_sample on every tick (as before), against LSLbroadcast, which copies the positions into its float32
+ring and pushes one chunk with the local_clock() stamps of its samples every LSL_CHUNK ticks.
+Run from the root directory of the repository:
+    python -m Benchmarks.LSLPushBenchmark
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import time
+
+from pylsl import StreamInfo, StreamOutlet
+
+from Main import TouchChannel, ChannelBank, LSLbroadcast, parameters
+from Benchmarks.SyntheticTouch import hands
+
+CHANNELS = [1, 4, 16, 64]
+CHUNKS = [1, 10, 50]
+TICKS = 20000
+
+
+def make_channels(n):
+    bank = ChannelBank(n)
+    channels = [TouchChannel(*parameters, bank=bank) for _ in range(n)]
+    for ch, hand in zip(channels, hands(n, 1)):
+        ch.activate(hand[0])
+    return channels, bank
+
+
+def per_sample(channels, bank):
+    info = StreamInfo(name="Touch events benchmark", type="benchmark", channel_count=len(channels) * 2)
+    outlet = StreamOutlet(info)
+    start = time.process_time()
+    for _ in range(TICKS):
+        positional_data = []
+        for ch in channels:
+            positional_data += ch.get_pos_as_list()
+        outlet.push_sample(positional_data)
+    return (time.process_time() - start) / TICKS
+
+
+def chunked(channels, bank, chunk):
+    lsl = LSLbroadcast(channels, "benchmark", chunk=chunk)
+    start = time.process_time()
+    for _ in range(TICKS):
+        lsl.broadcast(bank.positions())
+    lsl.flush()
+    return (time.process_time() - start) / TICKS
+
+
+def main():
+    print("CPU us per tick, %d ticks" % TICKS)
+    print("%-10s %14s" % ("channels", "push_sample") + "".join("%14s" % ("chunk of %d" % c) for c in CHUNKS))
+    for n in CHANNELS:
+        channels, bank = make_channels(n)
+        res = [per_sample(channels, bank)] + [chunked(channels, bank, c) for c in CHUNKS]
+        print("%-10d" % n + "".join("%14.2f" % (r * 1e6) for r in res))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Loopback benchmark of the UDP transport to Max: one OSC message per channel per tick (SimpleUDPClient)
+against a single timetagged OSC bundle per tick (OSCBundleEncoder).
+Run from the root directory of the repository:
+    python -m Benchmarks.OSCBundleBenchmark
+"""
+import socket
+import threading
+import time
+from random import random as rand
+
+from pythonosc.udp_client import SimpleUDPClient
+
+from OSCBundle import OSCBundleEncoder
+
+IP = "127.0.0.1"
+TICKS = 2000
+CHANNELS = [1, 4, 10, 16, 32]
+TYPE_TAGS = "ffffffif"
+
+
+class LoopbackReceiver(threading.Thread):
+    """Counts the datagrams arriving on a local UDP port"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind((IP, 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.packets = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                self.sock.recv(65536)
+                self.packets += 1
+            except socket.timeout:
+                pass
+
+    def stop(self):
+        self.running = False
+        self.join()
+        self.sock.close()
+
+
+def fake_data(n_channels):
+    return [["channel%d" % (ch + 1), [rand() for _ in range(6)] + [2] + [rand()]] for ch in range(n_channels)]
+
+
+def run_per_message(port, data):
+    client = SimpleUDPClient(IP, port)
+    for _ in range(TICKS):
+        for ch in range(len(data)):
+            client.send_message('/channel%d' % (ch + 1), data[ch][1])
+
+
+def run_bundle(port, data):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    encoder = OSCBundleEncoder(['/channel%d' % (ch + 1) for ch in range(len(data))], TYPE_TAGS)
+    for _ in range(TICKS):
+        sock.sendto(encoder.encode([ch[1] for ch in data]), (IP, port))
+    sock.close()
+
+
+def measure(sender, n_channels):
+    receiver = LoopbackReceiver()
+    receiver.start()
+    data = fake_data(n_channels)
+    wall, cpu = time.perf_counter(), time.process_time()
+    sender(receiver.port, data)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    time.sleep(0.3)     # let the receiver drain the socket
+    receiver.stop()
+    packets_sent = TICKS * (n_channels if sender is run_per_message else 1)
+    return {
+        "packets/tick": packets_sent / TICKS,
+        "packets/s": packets_sent / wall,
+        "received": receiver.packets,
+        "cpu us/tick": cpu / TICKS * 1e6,
+    }
+
+
+def main():
+    print("%d ticks per run (%.0f s of stream at 100 Hz)" % (TICKS, TICKS / 100))
+    print("%-9s %-12s %13s %12s %10s %12s" % ("channels", "transport", "packets/tick", "packets/s", "received",
+                                              "cpu us/tick"))
+    for n_channels in CHANNELS:
+        for name, sender in [("per-message", run_per_message), ("bundle", run_bundle)]:
+            res = measure(sender, n_channels)
+            print("%-9d %-12s %13d %12.0f %10d %12.1f" % (n_channels, name, res["packets/tick"], res["packets/s"],
+                                                           res["received"], res["cpu us/tick"]))
+
+
+if __name__ == '__main__':
+    main()
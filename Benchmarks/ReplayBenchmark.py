@@ -0,0 +1,75 @@
+"""Throughput of the headless replay (TouchReplay.py): a synthetic session is recorded with TouchRecorder, through a
+TouchRouter as in the app, and then replayed twice: the frames/s, and whether both replays give the same frames.
+Run from the root directory of the repository:
+    python -m Benchmarks.ReplayBenchmark
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from Main import TouchChannel, TouchRouter, ChannelBank, parameters, TIME_SERIES_DT
+from TouchLog import TouchRecorder, read_log
+from TouchReplay import TouchReplay
+from Benchmarks.SyntheticTouch import hands, jiggle
+
+SESSIONS = [(1, 3), (4, 5), (16, 5)]    # (hands, fingers)
+SECONDS = 30                            # of session
+EVENT_DT = 0.008                        # between moves of every finger, roughly a touch screen's rate
+
+
+def record(path, n_hands, fingers, seed=0):
+    """Record a session: the hands land one after the other, move, and leave one after the other"""
+    rnd = random.Random(seed)
+    recorder = TouchRecorder(path)
+    router = TouchRouter([TouchChannel(*parameters, bank=ChannelBank(n_hands)) for _ in range(n_hands)],
+                         mouse_mode=False, recorder=recorder)
+    touches = [t for hand in hands(n_hands, fingers, seed=seed) for t in hand]
+    t = 0.0
+    for touch in touches:
+        t += rnd.uniform(0.0, 0.05)
+        touch.time_start = touch.time_update = t
+        router.on_touch_down(touch)
+    while t < SECONDS:
+        t += EVENT_DT
+        jiggle(touches, rnd=rnd)
+        for touch in touches:
+            touch.time_update = t
+            router.on_touch_move(touch)
+    rnd.shuffle(touches)
+    for touch in touches:
+        t += rnd.uniform(0.0, 0.05)
+        touch.time_end = t
+        router.on_touch_up(touch)
+    recorder.close()
+    return recorder.total
+
+
+def replay(log, n_hands):
+    start = time.perf_counter()
+    frames = np.array([features for t, features in TouchReplay(log, channels=n_hands).frames()])
+    return frames, time.perf_counter() - start
+
+
+def main():
+    print("%d s sessions, ticks of %.3f s" % (SECONDS, TIME_SERIES_DT))
+    print("%-16s %10s %10s %12s %12s %10s" % ("hands x fingers", "events", "frames", "frames/s", "x real time",
+                                              "identical"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_hands, fingers in SESSIONS:
+            path = os.path.join(tmp, "session.tlog")
+            events = record(path, n_hands, fingers)
+            log = read_log(path)
+            frames, elapsed = replay(log, n_hands)
+            again, _ = replay(log, n_hands)
+            print("%-16s %10d %10d %12.0f %12.1f %10s" % ("%d x %d" % (n_hands, fingers), events, len(frames),
+                                                          len(frames) / elapsed, len(frames) * TIME_SERIES_DT / elapsed,
+                                                          np.array_equal(frames, again)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Stand-ins for Kivy MotionEvents, for driving the touch pipeline of Main.py without a touch device or a window"""
+import random
+from itertools import count
+
+_ids = count(1)
+
+
+class SyntheticTouch:
+    """Carries the attributes of a MotionEvent which Main.py reads"""
+
+    def __init__(self, x, y, t=0.0, device="wm_touch", double_tap=False, triple_tap=False):
+        self.id = self.uid = next(_ids)
+        self.device = device
+        self.is_double_tap = double_tap
+        self.is_triple_tap = triple_tap
+        self.osx, self.osy = x, y
+        self.psx, self.psy = x, y
+        self.sx, self.sy = x, y
+        self.dsx, self.dsy = 0.0, 0.0
+        self.time_start = self.time_update = t
+        self.time_end = -1
+
+    @property
+    def spos(self):
+        return self.sx, self.sy
+
+    def move(self, x, y, t=None):
+        self.psx, self.psy = self.sx, self.sy
+        self.sx, self.sy = x, y
+        self.dsx, self.dsy = x - self.psx, y - self.psy
+        if t is not None:
+            self.time_update = t
+
+
+def hands(n_hands, fingers, spread=0.05, seed=0):
+    """Touches of n_hands hands with 'fingers' fingers each. The fingers of a hand are within 'spread' of its center,
+    and the hands are spread over the screen as far as possible from each other"""
+    rnd = random.Random(seed)
+    side = max(1, int(n_hands ** 0.5 + 0.999))
+    touches = []
+    for h in range(n_hands):
+        cx = (h % side + 0.5) / side
+        cy = (h // side + 0.5) / side
+        touches.append([SyntheticTouch(cx + rnd.uniform(-spread, spread), cy + rnd.uniform(-spread, spread))
+                        for _ in range(fingers)])
+    return touches
+
+
+def jiggle(touches, step=0.003, rnd=random):
+    """Move every touch a random small step"""
+    for t in touches:
+        t.move(min(1.0, max(0.0, t.sx + rnd.uniform(-step, step))), min(1.0, max(0.0, t.sy + rnd.uniform(-step, step))))
@@ -0,0 +1,113 @@
+"""Cost of grouping the touches into channels: the linear scan over all the channels with a numpy norm per channel,
+and the area recomputed on every tick (as before TouchGrid), against the TouchGrid index with the incrementally
+updated area of TouchRouter.
+Synthetic session: 10 hands x 5 fingers land, move for a while, and leave.
+Run from the root directory of the repository:
+    python -m Benchmarks.TouchGroupingBenchmark
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import random
+import time
+
+import numpy as np
+
+from Main import TouchChannel, TouchRouter, ChannelBank, parameters, GROUPY_THRESHOLD
+from Benchmarks.SyntheticTouch import hands, jiggle
+
+HANDS = 10
+FINGERS = 5
+MOVES = 200         # rounds of moving all the fingers, one tick per round
+
+
+class LinearRouter(TouchRouter):
+    """The routing of the touch events before TouchGrid: scans all the channels for every event"""
+
+    def on_touch_down(self, touch):
+        for ch in [*self.channels, self.waiting_ch]:
+            if not ch.isActive():
+                ch.activate(touch)
+                return
+            if np.linalg.norm([ch.get_main_touch().spos[0] - touch.spos[0],
+                               ch.get_main_touch().spos[1] - touch.spos[1]]) < GROUPY_THRESHOLD:
+                ch.add_to_group(touch)
+                return
+
+    def on_touch_up(self, touch):
+        for ch in self.channels:
+            if touch == ch.get_main_touch():
+                if len(ch.get_group()) > 0:
+                    new_touch = ch.get_group()[0]
+                    ch.change_main_touch(new_touch)
+                    ch.remove_from_group(new_touch)
+                    break
+                if self.waiting_ch.isActive():
+                    ch.activate(self.waiting_ch.get_main_touch())
+                    self.waiting_ch.deactivate()
+                else:
+                    ch.deactivate()
+                break
+            if touch in ch.get_group():
+                ch.remove_from_group(touch)
+                break
+        if self.waiting_ch.get_main_touch() == touch:
+            self.waiting_ch.deactivate()
+
+
+def recomputed_area(ch):
+    """The area as computed on every tick before: a numpy norm per groupie"""
+    if not ch.isActive() or len(ch.group) == 0:
+        return 0.0
+    most_distant = 0
+    for g in ch.group:
+        most_distant = max(np.linalg.norm(np.array([ch.main_touch.sx, ch.main_touch.sy]) - g.spos), most_distant)
+    return max(0.0, min((most_distant - ch.min_area) / (ch.max_area - ch.min_area), 1.0))
+
+
+def run(router_class, incremental):
+    bank = ChannelBank(HANDS)
+    channels = [TouchChannel(*parameters, bank=bank) for _ in range(HANDS)]
+    router = router_class(channels, mouse_mode=False)
+    fingers = [t for hand in hands(HANDS, FINGERS, seed=1) for t in hand]
+    rnd = random.Random(2)
+    res = {}
+
+    t0 = time.perf_counter()
+    for touch in fingers:
+        router.on_touch_down(touch)
+    res["down"] = (time.perf_counter() - t0) / len(fingers)
+
+    t0 = time.perf_counter()
+    areas = 0.0
+    for _ in range(MOVES):
+        jiggle(fingers, rnd=rnd)
+        for touch in fingers:
+            router.on_touch_move(touch)
+        # one tick: the area of every channel
+        if incremental:
+            areas += sum(ch.get_area(ch.state) for ch in channels if ch.state is not None)
+        else:
+            areas += sum(recomputed_area(ch) for ch in channels)
+    res["move+tick"] = (time.perf_counter() - t0) / (MOVES * len(fingers))
+
+    rnd.shuffle(fingers)
+    t0 = time.perf_counter()
+    for touch in fingers:
+        router.on_touch_up(touch)
+    res["up"] = (time.perf_counter() - t0) / len(fingers)
+    res["areas"] = areas
+    return res
+
+
+def main():
+    print("%d hands x %d fingers, %d moves of every finger" % (HANDS, FINGERS, MOVES))
+    print("%-22s %12s %14s %12s %14s" % ("", "down us/ev", "move+tick us/ev", "up us/ev", "sum of areas"))
+    for name, router_class, incremental in [("linear scan", LinearRouter, False), ("TouchGrid", TouchRouter, True)]:
+        res = run(router_class, incremental)
+        print("%-22s %12.2f %14.2f %12.2f %14.6f" % (name, res["down"] * 1e6, res["move+tick"] * 1e6,
+                                                      res["up"] * 1e6, res["areas"]))
+
+
+if __name__ == '__main__':
+    main()
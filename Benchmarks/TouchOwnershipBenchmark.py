@@ -0,0 +1,131 @@
+"""Event-handling throughput of TouchRouter.on_touch_move/on_touch_up: scanning every channel with a list membership
+test per event (as before the owners map), against the touch uid -> (channel, role) map.
+A synthetic MotionEvent stream is recorded once and replayed through both routers.
+Also checks that the owners map holds the live touches only, through SWAPS swaps of a channel's main touch with the
+waiting channel's.
+Run from the root directory of the repository:
+    python -m Benchmarks.TouchOwnershipBenchmark
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import random
+import time
+
+from Main import TouchChannel, TouchRouter, ChannelBank, parameters
+from Benchmarks.SyntheticTouch import SyntheticTouch, hands
+
+SESSIONS = [(4, 5), (10, 5), (20, 10)]     # (hands, fingers)
+MOVES = 100
+SWAPS = 1000
+
+
+class ScanRouter(TouchRouter):
+    """The dispatch of moves and ups before the owners map: scans the channels and their groups for every event"""
+
+    def on_touch_move(self, touch):
+        for ch in [*self.channels, self.waiting_ch]:
+            if ch.get_main_touch() == touch:
+                ch.move()
+                self.grid.move(ch, *touch.spos)
+                return
+            if touch in ch.get_group():
+                ch.groupy_moved(touch)
+                return
+
+    def on_touch_up(self, touch):
+        for ch in self.channels:
+            if touch == ch.get_main_touch():
+                if len(ch.get_group()) > 0:
+                    new_touch = ch.get_group()[0]
+                    ch.change_main_touch(new_touch)
+                    ch.remove_from_group(new_touch)
+                    self.grid.move(ch, *new_touch.spos)
+                    break
+                if self.waiting_ch.isActive():
+                    waiting_touch = self.waiting_ch.get_main_touch()
+                    self.deactivate(self.waiting_ch)
+                    ch.activate(waiting_touch)
+                    self.grid.move(ch, *waiting_touch.spos)
+                else:
+                    self.deactivate(ch)
+                break
+            if touch in ch.get_group():
+                ch.remove_from_group(touch)
+                break
+        if self.waiting_ch.get_main_touch() == touch:
+            self.deactivate(self.waiting_ch)
+
+
+def record(n_hands, fingers, seed=0):
+    """A session of MotionEvents: [(kind, touch, x, y)]"""
+    rnd = random.Random(seed)
+    touches = [t for hand in hands(n_hands, fingers, seed=seed) for t in hand]
+    pos = {t: (t.sx, t.sy) for t in touches}
+    events = [("down", t, t.sx, t.sy) for t in touches]
+    for _ in range(MOVES):
+        for t in touches:
+            x, y = pos[t]
+            pos[t] = x, y = min(1.0, max(0.0, x + rnd.uniform(-0.003, 0.003))), \
+                            min(1.0, max(0.0, y + rnd.uniform(-0.003, 0.003)))
+            events.append(("move", t, x, y))
+    rnd.shuffle(touches)
+    events += [("up", t, *pos[t]) for t in touches]
+    return touches, events
+
+
+def replay(router_class, n_hands, touches, events):
+    for t in touches:
+        t.move(t.osx, t.osy)
+    bank = ChannelBank(n_hands)
+    router = router_class([TouchChannel(*parameters, bank=bank) for _ in range(n_hands)], mouse_mode=False)
+    handlers = {"down": router.on_touch_down, "move": router.on_touch_move, "up": router.on_touch_up}
+    spent = {"move": 0.0, "up": 0.0}
+    counts = {"move": 0, "up": 0}
+    checksum = 0.0
+    for kind, touch, x, y in events:
+        if kind == "move":
+            touch.move(x, y)
+        t0 = time.perf_counter()
+        handlers[kind](touch)
+        if kind in spent:
+            spent[kind] += time.perf_counter() - t0
+            counts[kind] += 1
+        checksum += sum(sum(row) for row in bank.features_small())
+    return {kind: counts[kind] / spent[kind] for kind in spent}, checksum
+
+
+def check_swaps():
+    """
+    A single channel, whose main touch lifts while another touch waits (on the waiting channel) again and again: the
+    waiting touch becomes the main touch of the channel every time
+    """
+    router = TouchRouter([TouchChannel(*parameters, bank=ChannelBank(1))], mouse_mode=False)
+    main_touch = SyntheticTouch(0.2, 0.2)
+    router.on_touch_down(main_touch)
+    for i in range(SWAPS):
+        waiting = SyntheticTouch(*((0.8, 0.8) if i % 2 == 0 else (0.2, 0.2)))
+        router.on_touch_down(waiting)
+        assert router.waiting_ch.get_main_touch() is waiting, i
+        router.on_touch_up(main_touch)
+        assert router.channels[0].get_main_touch() is waiting and not router.waiting_ch.isActive(), i
+        assert set(router.owners) == {waiting.uid}, (i, router.owners)
+        main_touch = waiting
+    router.on_touch_up(main_touch)
+    assert not router.owners, router.owners
+    print("The owners map holds the live touches only, through %d swaps with the waiting channel" % SWAPS)
+
+
+def main():
+    check_swaps()
+    print("%-16s %-12s %14s %14s %16s" % ("hands x fingers", "dispatch", "moves/s", "ups/s", "features checksum"))
+    for n_hands, fingers in SESSIONS:
+        touches, events = record(n_hands, fingers)
+        for name, router_class in [("scan", ScanRouter), ("owners map", TouchRouter)]:
+            rates, checksum = replay(router_class, n_hands, touches, events)
+            print("%-16s %-12s %14.0f %14.0f %16.6f" % ("%d x %d" % (n_hands, fingers), name, rates["move"],
+                                                        rates["up"], checksum))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Time of the queries "the touch samples between t0 and t1" of a LabRecorder recording: pyxdf.load_xdf (the whole file
+parsed for every query), XdfReader.py (the file indexed for every query, and the chunks of the range decoded) and a
+recording converted once by XdfColumnar.py (a binary search on the memory-mapped time index), on LabRecorder/test.xdf
+and on the synthetic recording of about --gb GB of XdfReaderBenchmark.py, of which a chunk of the EEG stream is
+written out of order.
+Also checks that the 3 return the very same samples & time stamps, and that the converted recording has the very same
+samples, time stamps & clock offsets of every stream as load_xdf.
+Run from the root directory of the repository:
+    python -m Benchmarks.XdfColumnarBenchmark [--gb 1]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyxdf
+
+from Benchmarks.XdfReaderBenchmark import STREAMS, TEST_XDF, write_xdf
+from XdfColumnar import ColumnarRecording, convert
+from XdfReader import XdfFile
+
+QUERIES = 200               # random ranges of the touch stream
+RANGE_SEC = 10              # of a query
+LOAD_XDF_QUERIES = 1        # load_xdf is timed on the first ones only
+
+
+def swap_chunks(path, stream_id=0):
+    """Swap the samples of the 2 first [Samples] chunks of a stream, as a recording of a stream out of order"""
+    with XdfFile(path) as f:
+        first, second = f.streams[stream_id].chunks[:2]
+    assert first.end - first.start == second.end - second.start
+    with open(path, "r+b") as f:
+        f.seek(first.start)
+        a = f.read(first.end - first.start)
+        f.seek(second.start)
+        b = f.read(second.end - second.start)
+        f.seek(first.start)
+        f.write(b)
+        f.seek(second.start)
+        f.write(a)
+
+
+def in_range(values, stamps, t0, t1):
+    keep = (stamps >= t0) & (stamps <= t1)
+    return values[keep], stamps[keep]
+
+
+def check(path, columns, ranges):
+    streams, header = pyxdf.load_xdf(path, synchronize_clocks=False, dejitter_timestamps=False)
+    recording = ColumnarRecording(columns)
+    for s in streams:
+        converted = recording.find(name=s["info"]["name"][0])[0]
+        order = np.argsort(s["time_stamps"], kind="stable")
+        values = np.asarray(s["time_series"])
+        if converted.channel_format == "string":
+            values = np.array(s["time_series"], dtype=str).reshape(len(order), converted.channel_count)
+        assert np.array_equal(converted.values, values[order]), converted
+        assert np.array_equal(converted.stamps, s["time_stamps"][order]), converted
+        assert np.array_equal(np.asarray(converted.order), order), converted
+        assert converted.clock_times == s["clock_times"] and converted.clock_values == s["clock_values"], converted
+    touch = recording.find(type=STREAMS[1][1])[0] if recording.find(type=STREAMS[1][1]) else \
+        recording.streams[min(recording.streams)]
+    expected = [s for s in streams if s["info"]["name"][0] == touch.name][0]
+    with XdfFile(path) as f:
+        for t0, t1 in ranges:
+            values, stamps = in_range(expected["time_series"], expected["time_stamps"], t0, t1)
+            for v, s in [f.read(f.find(name=touch.name)[0], t0, t1), touch.between(t0, t1)]:
+                assert np.array_equal(v, values) and np.array_equal(s, stamps), (t0, t1)
+    print("%s: same samples, time stamps & clock offsets of %d streams, same samples of %d queries of %r" %
+          (path, len(streams), len(ranges), touch))
+    return touch.name
+
+
+def measure(query, ranges):
+    """:return: <float> sec. per query"""
+    start = time.perf_counter()
+    for t0, t1 in ranges:
+        query(t0, t1)
+    return (time.perf_counter() - start) / len(ranges)
+
+
+def compare(path, columns, rnd):
+    with XdfFile(path) as f:
+        stamps = f.read(f.find(name=STREAMS[1][0])[0] if f.find(name=STREAMS[1][0]) else
+                        f.streams[min(f.streams)])[1]
+    t0 = rnd.uniform(stamps[0], max(stamps[0], stamps[-1] - RANGE_SEC), QUERIES)
+    ranges = list(zip(t0, t0 + RANGE_SEC))
+    touch = check(path, columns, ranges[:5])
+
+    def load_xdf_query(t0, t1):
+        streams, _ = pyxdf.load_xdf(path, synchronize_clocks=False, dejitter_timestamps=False)
+        s = [s for s in streams if s["info"]["name"][0] == touch][0]
+        return in_range(s["time_series"], s["time_stamps"], t0, t1)
+
+    def xdf_file_query(t0, t1):
+        with XdfFile(path) as f:
+            return f.read(f.find(name=touch)[0], t0, t1)
+
+    def columnar_query(t0, t1):
+        return ColumnarRecording(columns).find(name=touch)[0].between(t0, t1)
+
+    recording = ColumnarRecording(columns).find(name=touch)[0]
+    results = [("load_xdf", measure(load_xdf_query, ranges[:LOAD_XDF_QUERIES])),
+               ("XdfFile", measure(xdf_file_query, ranges)),
+               ("converted, opened per query", measure(columnar_query, ranges)),
+               ("converted, opened once", measure(recording.between, ranges))]
+    print("%-40s %14s %12s" % ("query of %d s" % RANGE_SEC, "ms per query", "x"))
+    for name, elapsed in results:
+        print("%-40s %14.3f %12.1f" % (name, elapsed * 1000, results[0][1] / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gb", type=float, default=1, help="size of the synthetic recording")
+    args = parser.parse_args()
+    rnd = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        compare(TEST_XDF, convert(TEST_XDF, os.path.join(tmp, "test_columns")), rnd)
+        path = os.path.join(tmp, "synthetic.xdf")
+        seconds = write_xdf(path, args.gb, rnd)
+        swap_chunks(path)
+        start = time.perf_counter()
+        columns = convert(path)
+        print("Converted a recording of %d s (%.1f MB) in %.1fs" % (seconds, os.path.getsize(path) / 2 ** 20,
+                                                                   time.perf_counter() - start))
+        compare(path, columns, rnd)
+
+
+if __name__ == '__main__':
+    main()
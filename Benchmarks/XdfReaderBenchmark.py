@@ -0,0 +1,193 @@
+"""Time and peak memory of reading the touch stream of a LabRecorder recording: pyxdf.load_xdf (which decodes every
+stream of the file) against XdfReader.py (an index of the chunks, and only the touch stream decoded), on
+LabRecorder/test.xdf and on a synthetic recording of about --gb GB (an EEG stream of 64 channels at 1 kHz, the touch
+stream of Main.py's LSLbroadcast, 2 channels of 2 fields at 100 Hz, and a marker stream of strings). The peak memory is
+the peak RSS of a fresh process for each reading.
+Also checks that both read the very same samples, time stamps & clock offsets of every stream.
+Run from the root directory of the repository:
+    python -m Benchmarks.XdfReaderBenchmark [--gb 1]
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import resource
+import struct
+import tempfile
+import time
+
+import numpy as np
+import pyxdf
+
+from XdfReader import XdfFile
+
+TEST_XDF = os.path.join("LabRecorder", "test.xdf")
+STREAMS = [  # name, type, channels, rate, format
+    ("EEG", "EEG", 64, 1000, "float32"),
+    ("Touch events", "Origin: Bottom_left, Grid: Rectangle", 4, 100, "float32"),
+    ("Markers", "Markers", 1, 0, "string"),
+]
+CHUNK_SEC = 1               # LabRecorder writes a chunk per stream about every sec.
+CLOCK_OFFSET_SEC = 5
+BOUNDARY_SEC = 10
+OMIT_STAMPS_EVERY = 10      # every N-th chunk of the touch stream omits its time stamps (but the first one's)
+RANGE = (0.5, 0.55)         # a time range of the touch stream, as fractions of its duration
+
+
+def chunk(tag, content):
+    return b"\x08" + struct.pack("<QH", len(content) + 2, tag) + content
+
+
+def stream_chunk(tag, stream_id, content):
+    return chunk(tag, struct.pack("<I", stream_id) + content)
+
+
+def header_xml(name, type, channels, rate, fmt):
+    return ('<?xml version="1.0"?><info><name>%s</name><type>%s</type><channel_count>%d</channel_count>'
+            '<nominal_srate>%d</nominal_srate><channel_format>%s</channel_format><source_id>bench</source_id>'
+            '<desc/></info>' % (name, type, channels, rate, fmt)).encode()
+
+
+def samples_chunk(stream_id, fmt, stamps, values, omit_stamps=False):
+    n = len(stamps)
+    head = b"\x04" + struct.pack("<I", n)
+    if fmt == "string":
+        body = b"".join(b"\x08" + struct.pack("<d", t) + b"".join(b"\x04" + struct.pack("<I", len(v)) + v
+                                                                      for v in row)
+                        for t, row in zip(stamps, values))
+    elif omit_stamps:
+        body = b"\x08" + struct.pack("<d", stamps[0]) + values[0].tobytes() + \
+               b"".join(b"\x00" + row.tobytes() for row in values[1:])
+    else:
+        record = np.zeros(n, dtype=[("b", "u1"), ("t", "<f8"), ("v", values.dtype, (values.shape[1],))])
+        record["b"], record["t"], record["v"] = 8, stamps, values
+        body = record.tobytes()
+    return stream_chunk(3, stream_id, head + body)
+
+
+def write_xdf(path, gb, rnd):
+    """A recording of about gb GB, as LabRecorder writes them"""
+    sample_bytes = sum(9 + channels * 4 for _, _, channels, rate, _ in STREAMS for _ in range(rate))
+    seconds = int(gb * 2 ** 30 / sample_bytes)
+    with open(path, "wb") as f:
+        f.write(b"XDF:" + chunk(1, b'<?xml version="1.0"?><info><version>1.0</version></info>'))
+        for i, stream in enumerate(STREAMS):
+            f.write(stream_chunk(2, i, header_xml(*stream)))
+        for sec in range(0, seconds, CHUNK_SEC):
+            if sec % BOUNDARY_SEC == 0:
+                f.write(chunk(5, bytes(range(16))))
+            for i, (_, _, channels, rate, fmt) in enumerate(STREAMS):
+                if fmt == "string":
+                    if sec % 2 == 0:
+                        f.write(samples_chunk(i, fmt, [sec + 0.5], [[b"marker %d" % sec]]))
+                else:
+                    n = rate * CHUNK_SEC
+                    stamps = sec + np.arange(n) / rate + rnd.normal(0, 1e-4, n)
+                    values = rnd.standard_normal((n, channels)).astype(np.float32)
+                    f.write(samples_chunk(i, fmt, stamps, values,
+                                          omit_stamps=(i == 1 and (sec // CHUNK_SEC) % OMIT_STAMPS_EVERY == 0)))
+                if sec % CLOCK_OFFSET_SEC == 0:
+                    f.write(stream_chunk(4, i, struct.pack("<dd", sec, -0.001 * rnd.random())))
+        for i in range(len(STREAMS)):
+            f.write(stream_chunk(6, i, b'<?xml version="1.0"?><info></info>'))
+    return seconds
+
+
+def digest(values, stamps):
+    h = hashlib.sha1()
+    if isinstance(values, list):
+        h.update(repr(values).encode())
+    else:
+        h.update(np.ascontiguousarray(values).data)
+    h.update(np.ascontiguousarray(stamps).data)
+    return h.hexdigest()
+
+
+def digest_blocks(f, stream):
+    """digest of the samples of a numeric stream, read chunk by chunk"""
+    h = hashlib.sha1()
+    stamps = []
+    for values, s in f.blocks(stream):
+        h.update(np.ascontiguousarray(values).data)
+        stamps.append(s)
+    h.update(np.concatenate(stamps).data if stamps else b"")
+    return h.hexdigest()
+
+
+def with_load_xdf(path, touch, t0, t1):
+    """Every stream, decoded by load_xdf: the touch stream & the digests of all"""
+    streams, _ = pyxdf.load_xdf(path, synchronize_clocks=False, dejitter_timestamps=False)
+    res = {s["info"]["name"][0]: (digest(s["time_series"], s["time_stamps"]), s["clock_times"], s["clock_values"])
+           for s in streams}
+    touch_stream = [s for s in streams if s["info"]["name"][0] == touch][0]
+    return touch_stream["time_series"].shape, res
+
+
+def with_xdf_file(path, touch, t0, t1):
+    """Only the touch stream, decoded by XdfFile"""
+    with XdfFile(path) as f:
+        values, stamps = f.read(f.find(name=touch)[0])
+    return values.shape, None
+
+
+def with_xdf_file_range(path, touch, t0, t1):
+    with XdfFile(path) as f:
+        values, stamps = f.read(f.find(name=touch)[0], t0, t1)
+    return values.shape, None
+
+
+def digests_xdf_file(path):
+    with XdfFile(path) as f:
+        return {s.name: (digest(*f.read(s)) if s.dtype is None else digest_blocks(f, s), s.clock_times,
+                         s.clock_values) for s in f.streams.values()}
+
+
+def run(fn, args, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    res = fn(*args)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024, res))
+
+
+def measure(fn, *args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(fn, args, queue))
+    process.start()
+    res = queue.get()
+    process.join()
+    return res
+
+
+def compare(path, touch):
+    with XdfFile(path) as f:
+        stamps = f.read(f.find(name=touch)[0])[1]
+        first, last = stamps[0], stamps[-1]
+    t0, t1 = (first + (last - first) * r for r in RANGE)
+    results = [("load_xdf (all streams)", measure(with_load_xdf, path, touch, t0, t1)),
+               ("XdfFile (%s)" % touch, measure(with_xdf_file, path, touch, t0, t1)),
+               ("XdfFile (%s, %.2f-%.2f s)" % (touch, t0, t1), measure(with_xdf_file_range, path, touch, t0, t1))]
+    expected = results[0][1][2][1]
+    assert digests_xdf_file(path) == expected, path
+    print("%s (%.1f MB): same samples, time stamps & clock offsets of %d streams" %
+          (path, os.path.getsize(path) / 2 ** 20, len(expected)))
+    print("%-40s %10s %14s %16s" % ("reading", "s", "peak RSS MB", "touch samples"))
+    for name, (elapsed, rss, (shape, _)) in results:
+        print("%-40s %10.3f %14.1f %16s" % (name, elapsed, rss / 2 ** 20, shape))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gb", type=float, default=1, help="size of the synthetic recording")
+    args = parser.parse_args()
+    compare(TEST_XDF, "SendDataC")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.xdf")
+        start = time.perf_counter()
+        seconds = write_xdf(path, args.gb, np.random.default_rng(0))
+        print("Wrote a recording of %d s in %.1fs" % (seconds, time.perf_counter() - start))
+        compare(path, STREAMS[1][0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import threading
+import time
+from math import sqrt
+
+
+class TickStats:
+    """
+    Running statistics of a periodic tick: achieved rate, interval jitter and lateness against the schedule.
+    Updated by the ticking thread only, and read by anyone - every value is a plain float/int, so a reader may see
+    statistics which are one tick old, but never a broken one.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.missed = 0              # ticks skipped because the previous tick overran its slot
+        self.first_t = None
+        self.last_t = None
+        self.interval_mean = 0.0     # Welford running mean & M2 of the intervals between ticks
+        self.interval_m2 = 0.0
+        self.interval_max = 0.0
+        self.late_sum = 0.0
+        self.late_max = 0.0
+
+    def update(self, t, scheduled):
+        """Record a tick which started at time t (perf_counter, in sec.) and was scheduled to start at 'scheduled'"""
+        if self.last_t is not None:
+            interval = t - self.last_t
+            n = self.ticks
+            delta = interval - self.interval_mean
+            self.interval_mean += delta / n
+            self.interval_m2 += delta * (interval - self.interval_mean)
+            self.interval_max = max(self.interval_max, interval)
+        else:
+            self.first_t = t
+        late = t - scheduled
+        self.late_sum += late
+        self.late_max = max(self.late_max, late)
+        self.last_t = t
+        self.ticks += 1
+
+    def rate(self):
+        """Achieved ticks per second"""
+        if self.ticks < 2:
+            return 0.0
+        return (self.ticks - 1) / (self.last_t - self.first_t)
+
+    def jitter(self):
+        """Standard deviation of the intervals between ticks, in sec."""
+        if self.ticks < 3:
+            return 0.0
+        return sqrt(self.interval_m2 / (self.ticks - 2))
+
+    def summary(self):
+        return "ticks: %d, rate: %.2f Hz (nominal %.2f Hz), interval: %.3f ms +- %.3f ms (max %.3f ms), " \
+               "lateness: mean %.3f ms max %.3f ms, missed: %d" % \
+               (self.ticks, self.rate(), 1 / self.period, self.interval_mean * 1e3, self.jitter() * 1e3,
+                self.interval_max * 1e3, (self.late_sum / max(self.ticks, 1)) * 1e3, self.late_max * 1e3, self.missed)
+
+
+class BroadcastEngine(threading.Thread):
+    """
+    Runs a tick function on its own thread, with a strict period.
+    Ticks are scheduled on absolute deadlines (start + k * period) of a monotonic high resolution clock, so the
+    error of a single sleep never accumulates into drift. The thread sleeps until shortly before the deadline and
+    spins for the rest, to be independent of the sleep resolution of the OS. The spin yields the GIL at every turn,
+    so that it does not take the time slices of the UI thread.
+    If a tick overruns by more than a whole period, the missed slots are skipped (and counted) rather than
+    fired in a burst.
+    """
+
+    def __init__(self, tick, period, spin=0.001, report_every=None):
+        """
+        :param tick: <Callable> called every period with the actual time passed since the previous tick (in sec.),
+                     and the unix time (in sec.) the tick was scheduled for
+        :param period: <float> time between ticks, in sec.
+        :param spin: <float> time before each deadline to busy-wait instead of sleep, in sec.
+        :param report_every: <float> print the tick statistics every this many seconds. None for never
+        """
+        super().__init__(name="BroadcastEngine", daemon=True)
+        self.tick = tick
+        self.period = period
+        self.spin = spin
+        self.report_every = report_every
+        self.stats = TickStats(period)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        clock = time.perf_counter
+        next_t = clock()
+        prev_t = next_t - self.period
+        # from the clock of the schedule to unix time, i.e. for the timetags of the OSC bundles
+        epoch = time.time() - next_t
+        next_report = next_t + self.report_every if self.report_every else None
+        while not self._stop_event.is_set():
+            remaining = next_t - clock()
+            if remaining > self.spin:
+                self._stop_event.wait(remaining - self.spin)
+                continue
+            while clock() < next_t:
+                time.sleep(0)
+
+            now = clock()
+            self.stats.update(now, next_t)
+            self.tick(now - prev_t, next_t + epoch)
+            prev_t = now
+
+            # drift correction: the next deadline is derived from the schedule, not from the current time
+            next_t += self.period
+            behind = clock() - next_t
+            if behind > self.period:
+                skipped = int(behind // self.period)
+                next_t += skipped * self.period
+                self.stats.missed += skipped
+
+            if next_report is not None and now >= next_report:
+                print(self.stats.summary())
+                next_report += self.report_every
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
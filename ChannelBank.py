@@ -0,0 +1,209 @@
+import math
+import numpy as np
+
+# Up to this many channels, computing the features with plain python math is cheaper than the fixed cost of
+# dispatching the vectorized numpy pass
+SMALL_BANK = 12
+
+# Columns of the bank. The first ones are published together by the UI thread on every touch event (see
+# ChannelBank.publish), the rest are the state of the channel itself.
+# The touch time is written by the ticking thread only: the UI thread requests its resets & reductions by counting
+# them (RESETS, REDUCTIONS), and the ticking thread applies the ones it did not apply yet (RESETS_DONE,
+# REDUCTIONS_DONE), so each column has a single writer and no update of the touch time is ever lost.
+ACTIVE, SX, SY, DSX, DSY, GROUP_DIST, START_X, START_Y, MODE, VELOCITY, TOUCH_TIME, RESETS, REDUCTIONS, \
+    RESETS_DONE, REDUCTIONS_DONE = range(15)
+COLUMNS = 15
+# a reduction multiplies the touch time by it
+TOUCH_TIME_REDUCTION = 0.1
+# [start_pos_x, start_pos_y, pos_x, pos_y, velocity, touch_time, mode, area]
+FEATURES = 8
+MODE_FEATURE = 6
+
+
+class BankColumn:
+    """An attribute of a TouchChannel which is stored in its row of the channel's bank"""
+
+    def __init__(self, *columns, type=float):
+        self.columns = columns
+        self.type = type
+
+    def __get__(self, ch, owner):
+        if ch is None:
+            return self
+        if len(self.columns) == 1:
+            return self.type(ch.bank.data[ch.row, self.columns[0]])
+        return [self.type(ch.bank.data[ch.row, col]) for col in self.columns]
+
+    def __set__(self, ch, value):
+        if len(self.columns) == 1:
+            ch.bank.data[ch.row, self.columns[0]] = value
+        else:
+            ch.bank.data[ch.row, list(self.columns)] = value
+
+
+class ChannelBank:
+    """
+    Struct-of-arrays storage of the state of many TouchChannels: one row per channel of a contiguous
+    (channels, COLUMNS) array, whose columns are the positions, start positions, velocities, touch times, modes etc.
+    The features of all the channels are computed from the columns in one vectorized pass, instead of a handful of
+    numpy calls on 2-element lists per channel. For a few channels, the same features are computed with python math.
+    Every numpy call holds the GIL, so writing a row slice (publish) and copying the whole array (compute) can not
+    interleave - the broadcaster thread always computes from a consistent snapshot, without locking.
+    All the channels of a bank share the same origin & grid, which are taken from the first channel attached.
+    """
+
+    def __init__(self, capacity=1, small=SMALL_BANK):
+        """
+        :param capacity: <int> number of rows to preallocate. The bank grows if more channels are attached
+        :param small: <int> up to this many channels, use the python math path
+        """
+        self.small = small
+        self.channels = []
+        self.data = np.zeros((capacity, COLUMNS))
+        self.snapshot = np.zeros((0, COLUMNS))
+        self.out = np.zeros((0, FEATURES))
+
+    def __len__(self):
+        return len(self.channels)
+
+    def attach(self, ch):
+        """Add a channel to the bank. Returns the channel's row"""
+        if not self.channels:
+            self.origin_string = ch.origin_string
+            self.grid_string = ch.grid_string
+            self.origin_x, self.origin_y = ch.origin
+            self.max_norm = float(ch.max_norm)
+            self.min_area = ch.min_area
+            self.area_range = ch.max_area - ch.min_area
+            self.sustain_dt = ch.sustain_dt
+        elif ch.origin_string != self.origin_string or ch.grid_string != self.grid_string:
+            raise ValueError("All the channels of a ChannelBank must share the same origin & grid")
+
+        row = len(self.channels)
+        if row == len(self.data):
+            self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+        self.channels.append(ch)
+        self.snapshot = np.zeros((len(self.channels), COLUMNS))
+        self.out = np.zeros((len(self.channels), FEATURES))
+        return row
+
+    def publish(self, row, sx, sy, dsx, dsy, group_dist):
+        """Publish the touch-derived state of an active channel"""
+        self.data[row, ACTIVE:GROUP_DIST + 1] = (1.0, sx, sy, dsx, dsy, group_dist)
+
+    def clear(self, row):
+        """Publish that a channel is not active"""
+        self.data[row, ACTIVE:GROUP_DIST + 1] = 0.0
+
+    def positions(self):
+        """The (channels, 2) [sx, sy] of every channel, (0, 0) for inactive ones. A view into the bank"""
+        return self.data[:len(self.channels), SX:SY + 1]
+
+    def reset_touch_time(self, row):
+        """Request the touch time of a channel to restart from 0 (UI thread)"""
+        self.data[row, RESETS] += 1
+
+    def reduce_touch_time(self, row):
+        """Request the touch time of a channel to be reduced by TOUCH_TIME_REDUCTION (UI thread)"""
+        self.data[row, REDUCTIONS] += 1
+
+    def advance_touch_time(self, row, dt):
+        """Apply the requests of a channel, and advance its touch time by dt (in sec.). Ticking thread only"""
+        d = self.data[row]
+        resets, reductions = float(d[RESETS]), float(d[REDUCTIONS])
+        t = float(d[TOUCH_TIME])
+        if resets != d[RESETS_DONE]:
+            t = 0.0         # the reductions which were requested before the reset do not matter
+        elif reductions != d[REDUCTIONS_DONE]:
+            t *= TOUCH_TIME_REDUCTION ** (reductions - d[REDUCTIONS_DONE])
+        d[RESETS_DONE], d[REDUCTIONS_DONE] = resets, reductions
+        d[TOUCH_TIME] = t + dt
+
+    def update_sustain(self, dt):
+        """Advance the touch time & velocity of all the active channels by dt (in sec.). Ticking thread only"""
+        data = self.data[:len(self.channels)]
+        active = data[:, ACTIVE]
+        resets, reductions = data[:, RESETS].copy(), data[:, REDUCTIONS].copy()
+        t = data[:, TOUCH_TIME] * TOUCH_TIME_REDUCTION ** (reductions - data[:, REDUCTIONS_DONE])
+        t[resets != data[:, RESETS_DONE]] = 0.0
+        data[:, RESETS_DONE], data[:, REDUCTIONS_DONE] = resets, reductions
+        data[:, TOUCH_TIME] = t + dt * active
+        data[:, VELOCITY] = np.hypot(data[:, DSX], data[:, DSY]) * 13 * active
+
+    def compute(self):
+        """Compute the (channels, 8) feature matrix of all the channels into self.out, in one vectorized pass"""
+        raw = self.snapshot
+        np.copyto(raw, self.data[:len(raw)])
+        out = self.out
+        active = raw[:, ACTIVE]
+        dx = raw[:, SX] - self.origin_x
+        dy = raw[:, SY] - self.origin_y
+
+        out[:, 0] = raw[:, START_X]
+        out[:, 1] = raw[:, START_Y]
+
+        # positional attributes
+        if self.grid_string == "Circular":
+            out[:, 2] = np.sqrt(np.hypot(dx, dy) / self.max_norm)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[:, 3] = np.where(dx == 0, 0.0, np.abs(np.tanh(dy / dx)))
+        elif self.origin_string == "Center":
+            out[:, 2] = 2 * np.abs(dx)
+            out[:, 3] = 2 * np.abs(dy)
+        elif self.origin_string == "Center_bottom":
+            out[:, 2] = 2 * np.abs(dx)
+            out[:, 3] = np.abs(dy)
+        else:
+            out[:, 2] = raw[:, SX]
+            out[:, 3] = raw[:, SY]
+
+        np.minimum(raw[:, VELOCITY], 1.0, out=out[:, 4])
+
+        # touch time: a sharp sigmoid in the very first moment, and a long one after it
+        t = raw[:, TOUCH_TIME]
+        out[:, 5] = 1 / (1 + np.exp(np.where(t < 0.07, self.sustain_dt * t + 4, -t + 4)))
+
+        out[:, 6] = raw[:, MODE]
+        # no groupies => distance 0 => area 0
+        np.clip((raw[:, GROUP_DIST] - self.min_area) / self.area_range, 0.0, 1.0, out=out[:, 7])
+
+        # a non-active channel holds only its start position and mode
+        out[:, 2:6] *= active[:, None]
+        out[:, 7] *= active
+        return out
+
+    def features_small(self):
+        """The python math version of compute. Returns a list of features per channel"""
+        res = []
+        for row in self.data[:len(self.channels), :TOUCH_TIME + 1].tolist():
+            active, sx, sy, dsx, dsy, group_dist, start_x, start_y, mode, velocity, t = row
+            if not active:
+                res.append([start_x, start_y, 0.0, 0.0, 0.0, 0.0, int(mode), 0.0])
+                continue
+
+            dx = sx - self.origin_x
+            dy = sy - self.origin_y
+            if self.grid_string == "Circular":
+                position = [math.sqrt(math.hypot(dx, dy) / self.max_norm), 0 if dx == 0 else abs(math.tanh(dy / dx))]
+            elif self.origin_string == "Center":
+                position = [2 * abs(dx), 2 * abs(dy)]
+            elif self.origin_string == "Center_bottom":
+                position = [2 * abs(dx), abs(dy)]
+            else:
+                position = [sx, sy]
+
+            touch_time = 1 / (1 + math.exp(self.sustain_dt * t + 4 if t < 0.07 else -t + 4))
+            area = max(0.0, min((group_dist - self.min_area) / self.area_range, 1.0))
+            res.append([start_x, start_y] + position + [min(1.0, velocity), touch_time, int(mode), area])
+        return res
+
+    def features(self):
+        """The features of every channel, as a list of lists:
+        [start_pos_x, start_pos_y, pos_x, pos_y, velocity, touch_time, mode, area]"""
+        if len(self.channels) <= self.small:
+            return self.features_small()
+        rows = self.compute().tolist()
+        # the mode is sent as an integer
+        for row in rows:
+            row[MODE_FEATURE] = int(row[MODE_FEATURE])
+        return rows
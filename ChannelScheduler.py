@@ -0,0 +1,75 @@
+import time
+
+
+class ChannelScheduler:
+    """
+    A single timer callback for all the TouchChannels: every tick it advances the sustain state (touch time and
+    velocity) of every registered channel, and then calls its listeners (i.e. the broadcaster), so the channels
+    and the broadcast are always in lockstep.
+    Channels can be added and removed at any time, from any thread: the registry is never changed in place, but
+    replaced by a new one with a single assignment, so a tick in progress keeps iterating the registry it started with.
+    """
+
+    def __init__(self, channels=(), listeners=()):
+        """
+        :param channels: <List> of TouchChannel to advance every tick
+        :param listeners: <List> of Callable, called with dt & tick_time after the channels were advanced
+        """
+        self.banks = {}              # ChannelBank -> tuple of its registered channels
+        self.listeners = tuple(listeners)
+        for ch in channels:
+            self.add(ch)
+
+        # instrumentation
+        self.start_t = None
+        self.callbacks = 0
+        self.channel_updates = 0
+
+    def add(self, ch):
+        banks = dict(self.banks)
+        registered = banks.get(ch.bank, ())
+        if ch not in registered:
+            banks[ch.bank] = registered + (ch,)
+        self.banks = banks
+
+    def remove(self, ch):
+        banks = dict(self.banks)
+        registered = tuple(c for c in banks.get(ch.bank, ()) if c is not ch)
+        if registered:
+            banks[ch.bank] = registered
+        else:
+            banks.pop(ch.bank, None)
+        self.banks = banks
+
+    def channels(self):
+        return [ch for registered in self.banks.values() for ch in registered]
+
+    def tick(self, dt, tick_time=None, *args):
+        """
+        Advance all the channels by dt (in sec.) and notify the listeners
+        :param tick_time: <float> unix time the tick was scheduled for (see BroadcastEngine). None for now
+        """
+        if self.start_t is None:
+            self.start_t = time.perf_counter()
+        self.callbacks += 1
+        for bank, registered in self.banks.items():
+            # a whole large bank is advanced in one vectorized call, otherwise channel by channel
+            if len(registered) == len(bank) and len(bank) > bank.small:
+                bank.update_sustain(dt)
+            else:
+                for ch in registered:
+                    ch.update_sustain(dt)
+            self.channel_updates += len(registered)
+        for listener in self.listeners:
+            listener(dt, tick_time)
+
+    def callbacks_per_second(self):
+        """The rate of timer callbacks, and the rate there would be with a timer per channel"""
+        if self.start_t is None:
+            return 0.0, 0.0
+        elapsed = max(time.perf_counter() - self.start_t, 1e-9)
+        return self.callbacks / elapsed, (self.callbacks + self.channel_updates) / elapsed
+
+    def summary(self):
+        rate, per_channel_rate = self.callbacks_per_second()
+        return "scheduled callbacks: %.1f/s (a timer per channel would be %.1f/s)" % (rate, per_channel_rate)
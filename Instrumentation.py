@@ -0,0 +1,208 @@
+import json
+import math
+import time
+
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+# The buckets of the latency histograms are log spaced from MIN_LATENCY, BUCKETS_PER_DECADE per decade (each ~12%
+# wide), over DECADES decades. Shorter durations fall into the first bucket, and longer ones into the last
+MIN_LATENCY = 1e-6
+DECADES = 7
+BUCKETS_PER_DECADE = 20
+PERCENTILES = (50, 95, 99)
+# The stages of every tick, whose histograms exist from the start (even before a first touch), so the channels of the
+# LSL diagnostic stream are the same whenever it is created. The "send <client>" ones are added by Instruments.timed
+STAGES = ("ingress->send", "tick jitter", "features", "tick")
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of durations, with the percentiles estimated from the upper edges of the buckets.
+    Written by a single thread only, without locks: a reader from another thread may see a count one sample
+    behind the max, which does not matter for statistics.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (DECADES * BUCKETS_PER_DECADE + 2)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration):
+        """:param duration: <float> in sec."""
+        if duration > MIN_LATENCY:
+            i = min(int(math.log10(duration / MIN_LATENCY) * BUCKETS_PER_DECADE) + 1, len(self.counts) - 1)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.n += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    @staticmethod
+    def upper_edge(i):
+        return MIN_LATENCY * 10 ** (i / BUCKETS_PER_DECADE)
+
+    def percentile(self, q):
+        """The q-th percentile in sec., accurate to the width of a bucket"""
+        if self.n == 0:
+            return 0.0
+        target = q / 100 * self.n
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self.upper_edge(i), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def summary(self):
+        return "%s: n=%d mean %.3f ms, " % (self.name, self.n, self.mean() * 1e3) + \
+               ", ".join("p%d %.3f ms" % (q, self.percentile(q) * 1e3) for q in PERCENTILES) + \
+               ", max %.3f ms" % (self.max * 1e3)
+
+    def as_dict(self):
+        res = {"count": self.n, "mean_ms": self.mean() * 1e3, "max_ms": self.max * 1e3}
+        res.update({"p%d_ms" % q: self.percentile(q) * 1e3 for q in PERCENTILES})
+        res["buckets_ms"] = {"%.6g" % (self.upper_edge(i) * 1e3): count
+                             for i, count in enumerate(self.counts) if count}
+        return res
+
+
+class Instruments:
+    """
+    Monotonic (perf_counter) time stamps at the stages of the live touch pipeline, collected into latency histograms:
+    - "ingress->send": from a touch event reaching the TouchRouter, until the OSC packet of the next tick has left,
+                       i.e the latency of a touch until Max hears about it
+    - "tick jitter": deviation of the interval between ticks from the period
+    - "features": computing the features of all the channels
+    - "send <client>": the broadcast of each client (see timed)
+    - "tick": the whole broadcast of a tick
+    All the histograms are written by the ticking thread only. The touch events only leave the time stamp of the oldest
+    event which was not broadcast yet, with a single assignment.
+    The histograms are printed every report_every sec., and can also be pushed to an LSL diagnostic stream at that rate,
+    and dumped to a JSON file at exit.
+    """
+
+    def __init__(self, period, report_every=None, lsl=False, dump=None):
+        """
+        :param period: <float> time between ticks, in sec.
+        :param report_every: <float> print a summary every this many seconds. None for only at exit
+        :param lsl: <bool> push the percentiles of every stage to an LSL stream at every summary (every 1 sec. if no
+                    report_every)
+        :param dump: <String> path of a JSON file the histograms are written to at exit. None for no file
+        """
+        self.period = period
+        self.report_every = report_every or (1.0 if lsl else None)
+        self.print_reports = report_every is not None
+        self.lsl = lsl
+        self.dump_path = dump
+        self.histograms = {name: LatencyHistogram(name) for name in STAGES}
+        self.pending = None            # ingress time of the oldest touch event which was not broadcast yet
+        self.prev_tick = None
+        self.tick_start = None
+        self.next_report = None
+        self.outlet = None
+
+    def histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram(name)
+        return self.histograms[name]
+
+    def ingress(self):
+        """A touch event arrived (called by the UI thread)"""
+        if self.pending is None:
+            self.pending = time.perf_counter()
+
+    def timed(self, client):
+        """Wrap a broadcasting client so each of its broadcasts is timed into 'send <client>'"""
+        return TimedClient(client, self.histogram("send " + type(client).__name__))
+
+    def begin_tick(self):
+        now = time.perf_counter()
+        if self.prev_tick is not None:
+            self.histogram("tick jitter").record(abs(now - self.prev_tick - self.period))
+        self.prev_tick = self.tick_start = now
+        return now
+
+    def stage(self, name, t0):
+        """Record the time since t0 into the histogram of the stage 'name', and return the current time"""
+        now = time.perf_counter()
+        self.histogram(name).record(now - t0)
+        return now
+
+    def end_tick(self):
+        """The packets of the tick have left"""
+        now = time.perf_counter()
+        self.histogram("tick").record(now - self.tick_start)
+        pending = self.pending
+        if pending is not None:
+            self.pending = None
+            self.histogram("ingress->send").record(now - pending)
+
+        if self.report_every is not None:
+            if self.next_report is None:
+                self.next_report = now + self.report_every
+            elif now >= self.next_report:
+                self.next_report += self.report_every
+                self.report()
+
+    def summary(self):
+        return "\n".join(h.summary() for h in self.histograms.values())
+
+    def report(self):
+        if self.print_reports:
+            print("-------------Pipeline latency------------\n" + self.summary())
+        if self.lsl:
+            self.push_lsl()
+
+    def push_lsl(self):
+        """Push [p50, p95, p99, max] (in ms) of every stage as one sample of the diagnostic stream, which is created
+        at the first push: with the STAGES, and the clients which were timed before the first tick"""
+        if self.outlet is None:
+            self.lsl_stages = list(self.histograms)
+            info = StreamInfo(name="Touch pipeline latency", type="Diagnostics",
+                              channel_count=len(self.lsl_stages) * (len(PERCENTILES) + 1),
+                              nominal_srate=1 / self.report_every, channel_format="float32")
+            chns = info.desc().append_child("channels")
+            for stage in self.lsl_stages:
+                for label in ["p%d" % q for q in PERCENTILES] + ["max"]:
+                    chn = chns.append_child("channel")
+                    chn.append_child_value("label", "%s %s" % (stage, label))
+                    chn.append_child_value("unit", "ms")
+                    chn.append_child_value("type", "Latency")
+            self.outlet = StreamOutlet(info)
+        sample = []
+        for stage in self.lsl_stages:
+            h = self.histograms[stage]
+            sample += [h.percentile(q) * 1e3 for q in PERCENTILES] + [h.max * 1e3]
+        self.outlet.push_sample(sample, local_clock())
+
+    def dump(self):
+        """Write the histograms into the dump file (if any)"""
+        if self.dump_path is None:
+            return
+        with open(self.dump_path, "w") as f:
+            json.dump({"period_ms": self.period * 1e3,
+                       "stages": {name: h.as_dict() for name, h in self.histograms.items()}}, f, indent=2)
+        print("-------------Pipeline latency histograms written to %s------------" % self.dump_path)
+
+
+class TimedClient:
+    """A broadcasting client, with the duration of every broadcast recorded into a histogram"""
+
+    def __init__(self, client, histogram):
+        self.client = client
+        self.histogram = histogram
+
+    def broadcast(self, data, *args):
+        t0 = time.perf_counter()
+        self.client.broadcast(data, *args)
+        self.histogram.record(time.perf_counter() - t0)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -1,13 +1,23 @@
 from os import environ
 environ['SDL_VIDEODRIVER'] = 'windows'
+import math
+import socket
 import time
+from collections import namedtuple, deque
 from kivy.app import App
 from kivy.clock import Clock
-from kivy.core.window import Window
 from kivy.uix.widget import Widget
-from pylsl import StreamInfo, StreamOutlet
+import pylsl
+from pylsl import StreamInfo, StreamOutlet, local_clock
 from pythonosc.udp_client import SimpleUDPClient
 import numpy as np
+from OSCBundle import OSCBundleEncoder
+from BroadcastEngine import BroadcastEngine
+from ChannelScheduler import ChannelScheduler
+from TouchGrid import TouchGrid
+from TouchLog import TouchRecorder
+from Instrumentation import Instruments
+from ChannelBank import ChannelBank, BankColumn, START_X, START_Y, MODE, VELOCITY, TOUCH_TIME
 
 
 # UDP details
@@ -15,10 +25,30 @@ IP = "127.0.0.1"
 CLIENT_PORT = 2222
 SERVER_PORT = 2223
 SEND_TO_LSL = False
+# Also stream the features sent to Max (all 8 per channel) to LSL, so recordings hold what the sound engine received
+SEND_FEATURES_TO_LSL = False
+# Number of ticks collected before they are pushed to LSL as one chunk (1 for a push per tick)
+LSL_CHUNK = 10
+# Pack the messages of all the channels into a single timetagged OSC bundle per tick (one datagram per tick)
+OSC_BUNDLE = True
+# Broadcast from a dedicated timer thread instead of the Kivy Clock (which shares the render loop)
+BROADCAST_THREAD = True
 
 ########################## Developing section ###############################
 # Turn this on if you want to print the data generated by th machine
 PRINT_DATA = False
+# Print the achieved rate & jitter of the broadcast ticks every this many seconds (None for only at exit)
+PRINT_TICK_STATS = None
+# Measure the latency of the touch pipeline (touch event -> OSC packet), the tick jitter and the cost of every stage
+INSTRUMENT_PIPELINE = False
+# Print the latency histograms (p50/p95/p99/max) every this many seconds (None for only at exit)
+PRINT_LATENCY = None
+# Also push the latency percentiles to an LSL diagnostic stream
+LATENCY_TO_LSL = False
+# Write the latency histograms into this JSON file at exit (None for no file)
+LATENCY_DUMP = None
+# Record the raw touch events of the session into this touch log, for TouchReplay.py (None for no recording)
+RECORD_TOUCHES = None
 # Turn this on if you are currently without a touch pad, and want enable mouse touches
 MOUSE_DEV_MODE = False
 # Full window switch
@@ -55,6 +85,12 @@ GROUPY_THRESHOLD = 0.27
 MIN_TOUCH_TIME = 0.08
 SUSTAIN_TIME = -10      # The higher this value, the faster Sustain reach to maximum
 
+# The touch-derived state of an active channel, as published by the UI thread for the broadcaster:
+# position, last movement and the distance of the most distant groupie
+TouchState = namedtuple("TouchState", ["sx", "sy", "dsx", "dsy", "group_dist"])
+# The roles of a touch in the channel it belongs to
+MAIN = "main"
+GROUPY = "groupy"
 
 class TouchChannel:
     """
@@ -64,6 +100,13 @@ class TouchChannel:
     If the main touch disconnected, but there are still some groupies - one of them become the main touch.
     A channel starts as not-active. When a touch event occurs, the 'TouchInput'(Widget) object connect it to the first
     available channel and then activate the channel.
+    The MotionEvents are owned by the UI thread. Whenever they change, the channel publishes a snapshot of them
+    (self.state) by a single assignment of an immutable TouchState, so the broadcaster can read a consistent state
+    from another thread without locking.
+    The numeric state of the channel is stored in its row of a ChannelBank, shared by all the channels of the app,
+    which computes the features of all of them at once.
+    Every touch of the channel is registered in self.owners: touch uid -> (channel, role). The TouchRouter shares
+    one such map between all its channels, so the channel of a touch event is found in O(1).
     """
     max_area = TOUCH_MAX_RADIUS
     min_area = TOUCH_MIN_RADIUS
@@ -71,7 +114,13 @@ class TouchChannel:
     sustain_dt = SUSTAIN_TIME
     CH_ID = 0
 
-    def __init__(self, origin, grid):
+    # stored in the bank
+    start_pos = BankColumn(START_X, START_Y)
+    mode = BankColumn(MODE, type=int)
+    velocity = BankColumn(VELOCITY)
+    touch_time = BankColumn(TOUCH_TIME)
+
+    def __init__(self, origin, grid, bank=None):
         # identity attributes
         TouchChannel.CH_ID += 1
         self.channel_id = TouchChannel.CH_ID
@@ -82,41 +131,97 @@ class TouchChannel:
         self.grid_string = grid
 
         # data-generating related
-        self.touch_time = 0
-        self.start_pos = [0.0, 0.0]
         self.max_norm = np.linalg.norm(np.array([1, 1]) - self.origin)
         self.reduce_time_threshold = self.max_norm / 300  # ||pos - prev_pos|| > threshold => reduce time_touch
+        self.bank = bank if bank is not None else ChannelBank()
+        self.row = self.bank.attach(self)
+        self.owners = {}
+        self.main_touch = None
+        self.group = deque()
+        self.start_pos = [0.0, 0.0]
         self.mode = 0
         # initialize the values to zero
         self.deactivate()
-        update_sustain_event = Clock.schedule_interval(self.update_sustain, self.dt)
 
     def activate(self, touch):
-        """When a touch event is connected to the deactivated channel"""
+        """When a touch event is connected to the deactivated channel (or replaces its main touch, which ended)"""
+        if self.main_touch is not None:
+            self.disown(self.main_touch, MAIN)
         self.main_touch = touch
+        self.owners[touch.uid] = (self, MAIN)
         self.start_pos = [self.main_touch.osx, self.main_touch.osy]
         self.velocity = 0.0
-        self.touch_time = 0.0
+        self.bank.reset_touch_time(self.row)
+        self.measure_group()
+        self.publish()
         self.switch = True
 
     def deactivate(self):
         """When the main touch is disconnected, and there are no more groupies"""
+        if self.main_touch is not None:
+            self.disown(self.main_touch, MAIN)
+        for groupy in self.group:
+            self.disown(groupy, GROUPY)
         self.main_touch = None
         self.prev_pos_time = time.time()
         self.velocity = 0.0
-        self.touch_time = 0
+        self.bank.reset_touch_time(self.row)
         self.switch = False
-        self.group = []
+        self.group = deque()
+        self.group_dists = {}        # groupie -> its distance from the main touch
+        self.farthest = None         # the most distant groupie
+        self.state = None
+        self.bank.clear(self.row)
+
+    def disown(self, touch, role):
+        """Unregister a touch from the owners map, if it is still registered to this channel in this role"""
+        if self.owners.get(touch.uid) == (self, role):
+            del self.owners[touch.uid]
+
+    def publish(self):
+        """Publish a snapshot of the touch events of this channel. Must be called whenever one of them changes"""
+        touch = self.main_touch
+        group_dist = self.group_dists[self.farthest] if self.farthest is not None else 0.0
+        self.state = TouchState(touch.sx, touch.sy, touch.dsx, touch.dsy, group_dist)
+        self.bank.publish(self.row, touch.sx, touch.sy, touch.dsx, touch.dsy, group_dist)
+
+    def distance(self, groupy):
+        """The distance of a groupie from the main touch"""
+        return math.hypot(self.main_touch.sx - groupy.spos[0], self.main_touch.sy - groupy.spos[1])
+
+    def measure_group(self):
+        """Measure the distances of all the groupies from the main touch, and find the most distant one"""
+        self.group_dists = {g: self.distance(g) for g in self.group}
+        self.find_farthest()
+
+    def find_farthest(self):
+        self.farthest = max(self.group_dists, key=self.group_dists.get) if self.group_dists else None
+
+    def groupy_moved(self, groupy):
+        """When one of the groupies, and only it, moves. Updates the most distant groupie incrementally"""
+        dist = self.distance(groupy)
+        self.group_dists[groupy] = dist
+        if self.farthest is None or dist > self.group_dists[self.farthest]:
+            self.farthest = groupy
+        elif groupy is self.farthest:
+            # the most distant groupie got closer => one of the others may be the most distant now
+            self.find_farthest()
+        self.publish()
 
     def update_sustain(self, dt):
         """Every period of dt (in sec.), update the self.touch_time & self.velocity attributes"""
-        if self.isActive():
-            self.touch_time += dt
-            self.velocity = np.linalg.norm([self.main_touch.dsx, self.main_touch.dsy]) * 13
+        state = self.state
+        if state is not None:
+            self.bank.advance_touch_time(self.row, dt)
+            self.velocity = math.hypot(state.dsx, state.dsy) * 13
 
     def change_main_touch(self, touch):
         """When the main touch event is terminated and need to be switched to another"""
+        self.disown(self.main_touch, MAIN)
         self.main_touch = touch
+        self.owners[touch.uid] = (self, MAIN)
+        self.measure_group()
+        self.publish()
 
     def isActive(self):
         return self.switch
@@ -130,10 +235,11 @@ class TouchChannel:
     def get_channel_id(self):
         return self.channel_id
 
-    def get_pos_as_list(self):
-        if not self.isActive():
+    def get_pos_as_list(self, state=None):
+        state = state or self.state
+        if state is None:
             return [0.0, 0.0]
-        return [self.main_touch.sx, self.main_touch.sy]
+        return [state.sx, state.sy]
 
     def get_prev_pos(self):
         return [self.main_touch.psx, self.main_touch.psy]
@@ -146,6 +252,18 @@ class TouchChannel:
 
     def remove_from_group(self, groupy):
         self.group.remove(groupy)
+        self.disown(groupy, GROUPY)
+        del self.group_dists[groupy]
+        if groupy is self.farthest:
+            self.find_farthest()
+        self.publish()
+
+    def promote_groupy(self):
+        """When the main touch is terminated and the first groupie becomes the main touch"""
+        groupy = self.group.popleft()
+        del self.group_dists[groupy]
+        self.change_main_touch(groupy)
+        return groupy
 
     def next_mode(self):
         """When a very short double-touch occurs"""
@@ -158,19 +276,27 @@ class TouchChannel:
 
     def move(self):
         """When a moving, and only moving, occurs"""
-        # reduce the time touch value if position is changed a lot
-        ds = np.linalg.norm([self.main_touch.dsx, self.main_touch.dsy])
+        # the main touch moved => the distances of all the groupies changed
+        self.measure_group()
+        self.publish()
+        # reduce the time touch value if position is changed a lot (by the ticking thread, see ChannelBank)
+        ds = math.hypot(self.main_touch.dsx, self.main_touch.dsy)
         if ds > self.reduce_time_threshold:
-            self.touch_time *= 0.1
+            self.bank.reduce_touch_time(self.row)
 
     def add_to_group(self, touch):
         """Add a touch event to the group of this one"""
         self.group.append(touch)
+        self.owners[touch.uid] = (self, GROUPY)
+        self.group_dists[touch] = self.distance(touch)
+        if self.farthest is None or self.group_dists[touch] > self.group_dists[self.farthest]:
+            self.farthest = touch
+        self.publish()
 
-    def positional_circular_rep(self) -> list:
+    def positional_circular_rep(self, state) -> list:
         """Generate the circular positional attributes"""
         # 'raw' euclidean distance of the position from the origin
-        dist = np.array([self.main_touch.sx, self.main_touch.sy]) - self.origin
+        dist = np.array([state.sx, state.sy]) - self.origin
         norm = np.linalg.norm(dist)
 
         # calculate normalized radius. Normalization done by stretching the maximum value to 1.
@@ -180,23 +306,23 @@ class TouchChannel:
         tan = 0 if dist[0] == 0 else np.abs(np.tanh(dist[1] / dist[0]))
         return [radius, tan]
 
-    def get_positional_data(self):
+    def get_positional_data(self, state):
         """Generate the positional attributes"""
         if self.grid_string == "Circular":
-            return self.positional_circular_rep()
+            return self.positional_circular_rep(state)
 
         # else => Origin maybe not CENTER
         # If origin is center, the normalization is just *2 for both axis
         elif self.origin_string == "Center":
-            return [2 * np.abs(self.main_touch.sx - self.origin[0]), 2 * np.abs(self.main_touch.sy - self.origin[1])]
+            return [2 * np.abs(state.sx - self.origin[0]), 2 * np.abs(state.sy - self.origin[1])]
 
         # If origin is X center, Y bottom, the normalization is *2 only for X axis
         elif self.origin_string == "Center_bottom":
-            return [2 * np.abs(self.main_touch.sx - self.origin[0]), np.abs(self.main_touch.sy - self.origin[1])]
+            return [2 * np.abs(state.sx - self.origin[0]), np.abs(state.sy - self.origin[1])]
 
         # else => origin is default (bottom left), no normalization required
         else:
-            return self.get_pos_as_list()
+            return self.get_pos_as_list(state)
 
     def get_velocity(self):
         """Calculate velocity in respect to time interval of self.dt"""
@@ -211,31 +337,26 @@ class TouchChannel:
         # after the very first moment, a long sigmoid
         return 1 / (1 + np.exp(-self.touch_time + 4))
 
-    def get_area(self):
+    def get_area(self, state):
         """Calculate the density of the touch's group. The density defined as the MAXIMAL distance between
-        the main touch and one of the groupies"""
-        if len(self.group) > 0:
-            most_distant = 0
-            for g in self.group:
-                area = np.linalg.norm(np.array([self.main_touch.sx, self.main_touch.sy]) - g.spos)
-                most_distant = max(area, most_distant)
-            area = (most_distant - self.min_area) / (self.max_area - self.min_area)
-            return max(0.0, min(area, 1.0))
-        else:
-            return 0.0
+        the main touch and one of the groupies. It is kept up to date on every touch event, see 'groupy_moved'"""
+        # without groupies the distance is 0, which is below the minimal area
+        area = (state.group_dist - self.min_area) / (self.max_area - self.min_area)
+        return max(0.0, min(area, 1.0))
 
     def get_qualitiative_data(self):
         """Generate the data to be broadcast through UDP. The data is a list of concatenated values:
         [start_pos_x, start_pos_y, pos_x, pos_y, velocity, touch_time, mode, area]"""
         # if this channel is not active
-        if not self.switch:
+        state = self.state
+        if state is None:
             return self.start_pos + [0.0] * 4 + [self.mode] + [0.0]
 
-        position = self.get_positional_data()
+        position = self.get_positional_data(state)
         velocity = [min(1.0, self.velocity)]
         touch_time = [self.get_touch_time()]
         mode = [self.mode]
-        area = [self.get_area()]
+        area = [self.get_area(state)]
         return self.start_pos + position + velocity + touch_time + mode + area
 
     def __repr__(self):
@@ -245,50 +366,146 @@ class TouchChannel:
 class UDPclient:
     """
     Object represents the connection to the UDP, which holds for the communication with Max8.
+    In bundle mode, all the channels are sent as a single OSC bundle per tick, timetagged with the tick's time.
     """
+    # [start_pos_x, start_pos_y, pos_x, pos_y, velocity, touch_time, mode, area]
+    type_tags = "ffffffif"
 
-    def __init__(self):
+    def __init__(self, bundle=OSC_BUNDLE):
+        self.bundle = bundle
         self.client = SimpleUDPClient(IP, CLIENT_PORT)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.encoder = None
 
-    def broadcast(self, data):
-        for ch in range(len(data)):
-            self.client.send_message('/channel%d'%(ch+1), data[ch][1])
+    def broadcast(self, data, tick_time=None):
+        """
+        :param data: <List> of [name, features] per channel
+        :param tick_time: <float> unix time of the tick, the timetag of the bundle. None for now
+        """
+        if self.bundle:
+            self.broadcast_bundle(data, tick_time)
+        else:
+            for ch in range(len(data)):
+                self.client.send_message('/channel%d'%(ch+1), data[ch][1])
+
+    def broadcast_bundle(self, data, tick_time=None):
+        # The encoder is built once, and rebuilt only if the number of channels changes
+        if self.encoder is None or len(self.encoder) != len(data):
+            self.encoder = OSCBundleEncoder(['/channel%d' % (ch+1) for ch in range(len(data))], self.type_tags)
+        self.sock.sendto(self.encoder.encode([ch[1] for ch in data], timestamp=tick_time), (IP, CLIENT_PORT))
 
 class Printer:
     """
     Broadcaster to the screen
     """
 
-    def broadcast(self, data):
+    def broadcast(self, data, tick_time=None):
         for ch in data:
             print(ch[0], ch[1])
 
+def push_chunk_stamps():
+    """
+    :return: <bool> whether the installed pylsl pushes a chunk with a time stamp per sample (pylsl >= 1.16). Older ones
+             take a single time stamp per chunk, and mistake the samples of a 2-D chunk for values
+    """
+    version = getattr(pylsl, "__version__", "")
+    try:
+        return tuple(int(part) for part in version.split(".")[:2]) >= (1, 16)
+    except ValueError:
+        return False
+
+
 class LSLbroadcast:
     """
-    A wrapper for a broadcasting LSL connection
+    A wrapper for a broadcasting LSL connection, of the positions of the channels.
+    The data of every tick is written into a preallocated float32 ring, together with its local_clock() time stamp,
+    and the ring is pushed to the outlet as one chunk once it is full.
+    The labels and units of the LSL channels are described in the stream's meta-data.
     """
-    def __init__(self, channels, session_info_LSL):
+    name = "Touch events"
+    # (label, unit) of each value of a channel
+    fields = [("sx", "normalized"), ("sy", "normalized")]
+
+    def __init__(self, channels, session_info_LSL, chunk=LSL_CHUNK):
         self.channels = channels
+        self.chunk = chunk
+        self.samples = np.zeros((chunk, len(channels) * len(self.fields)), dtype=np.float32)
+        # the same ring, as (sample, channel, field)
+        self.rows = self.samples.reshape(chunk, len(channels), len(self.fields))
+        self.stamps = np.zeros(chunk)
+        self.n = 0
         self.conn = self.establishLSL(session_info_LSL)
 
     def establishLSL(self, session_info_LSL):
-        self.info = StreamInfo(name="Touch events", type=session_info_LSL, channel_count=len(self.channels) * 2)
-        self.outlet = StreamOutlet(self.info)
-        print("-------------Outlet stream was created, LSL connections established successfully------------")
+        self.info = StreamInfo(name=self.name, type=session_info_LSL,
+                               channel_count=len(self.channels) * len(self.fields),
+                               nominal_srate=1 / TIME_SERIES_DT, channel_format="float32")
+        self.describe(self.info.desc())
+        self.outlet = StreamOutlet(self.info, chunk_size=self.chunk)
+        self.chunk_stamps = push_chunk_stamps()
+        print("-------------Outlet stream '%s' was created, LSL connections established successfully------------"
+              % self.name)
         print("-------------info type string: %s------------" % session_info_LSL)
 
+    def describe(self, desc):
+        """Attach the meta-data of the stream (see https://github.com/sccn/xdf/wiki/Meta-Data)"""
+        chns = desc.append_child("channels")
+        for ch in self.channels:
+            for label, unit in self.fields:
+                chn = chns.append_child("channel")
+                chn.append_child_value("label", "channel%d_%s" % (ch.get_channel_id(), label))
+                chn.append_child_value("unit", unit)
+                chn.append_child_value("type", "Touch")
+        desc.append_child_value("origin", parameters[0])
+        desc.append_child_value("grid", parameters[1])
+
     def broadcast(self, data):
         """
         Broadcasting the data to LSL connection
+        :param data: <np.ndarray> or <list> (channels, fields) of the data of every channel
         """
-        self.outlet.push_sample(data)
+        np.copyto(self.rows[self.n], data)
+        self.stamps[self.n] = local_clock()
+        self.n += 1
+        if self.n == self.chunk:
+            self.flush()
+
+    def flush(self):
+        """Push the samples collected so far"""
+        if self.n > 0:
+            if self.chunk_stamps:
+                self.outlet.push_chunk(self.samples[:self.n], self.stamps[:self.n].tolist())
+            else:
+                # a push per sample, to keep their time stamps
+                for sample, stamp in zip(self.samples[:self.n], self.stamps[:self.n].tolist()):
+                    self.outlet.push_sample(sample, stamp)
+            self.n = 0
+
+
+class LSLFeatureBroadcast(LSLbroadcast):
+    """
+    A broadcasting LSL connection of the features which are sent to Max, i.e
+    [start_pos_x, start_pos_y, pos_x, pos_y, velocity, touch_time, mode, area] per channel
+    """
+    name = "Touch features"
+    fields = [("start_pos_x", "normalized"), ("start_pos_y", "normalized"), ("pos_x", "normalized"),
+              ("pos_y", "normalized"), ("velocity", "normalized"), ("touch_time", "normalized"), ("mode", "index"),
+              ("area", "normalized")]
+
 
 class DataBroadcaster:
 
-    def __init__(self, channels):
+    def __init__(self, channels, bank, instruments=None):
         self.channels = channels
+        self.bank = bank
+        self.instruments = instruments
         self.positional_clients = self.initialize_positional_clients()
+        self.feature_clients = self.initialize_feature_clients()
         self.generated_data_clients = self.initialize_generated_data_clients_clients()
+        if instruments is not None:
+            self.positional_clients = [instruments.timed(client) for client in self.positional_clients]
+            self.feature_clients = [instruments.timed(client) for client in self.feature_clients]
+            self.generated_data_clients = [instruments.timed(client) for client in self.generated_data_clients]
 
     def initialize_positional_clients(self):
         list = []
@@ -296,6 +513,12 @@ class DataBroadcaster:
             list.append(LSLbroadcast(self.channels, self.generate_type_string()))
         return list
 
+    def initialize_feature_clients(self):
+        list = []
+        if SEND_FEATURES_TO_LSL:
+            list.append(LSLFeatureBroadcast(self.channels, self.generate_type_string()))
+        return list
+
     def initialize_generated_data_clients_clients(self):
         list = []
         list.append(UDPclient())
@@ -307,7 +530,7 @@ class DataBroadcaster:
         return "Origin: " + parameters[0] +\
                ", " + "Grid: " + parameters[1]
 
-    def broadcast(self, *args):
+    def broadcast(self, dt=None, tick_time=None, *args):
         """
         Broadcasting the data from channels to the customers.
         1st customer is LSL connection
@@ -315,105 +538,198 @@ class DataBroadcaster:
         Data is a list of float numbers, in the shape:
         (Time, Channels), where "Time" is the time stamp and channels is the number of channels defined by the run.
         In order to plot the data correctly, a transposition needs to be applied
+        :param dt: <float> time since the previous tick, in sec.
+        :param tick_time: <float> unix time the tick was scheduled for, the timetag of the OSC bundles. None for now
         """
 
+        instruments = self.instruments
+        if instruments is not None:
+            t = instruments.begin_tick()
+
         # Prepare data
+        features = self.bank.features()
+        if instruments is not None:
+            instruments.stage("features", t)
         generated_data = []
-        positional_data = []
-        for ch in self.channels:
-            positional_data += ch.get_pos_as_list()
-            generated_data.append(["channel%d" % ch.get_channel_id(), ch.get_qualitiative_data()])
+        for ch, ch_features in zip(self.channels, features):
+            generated_data.append(["channel%d" % ch.get_channel_id(), ch_features])
 
         # Broadcasting the positional_data (i.e to LSL)
+        positional_data = self.bank.positions()
         for client in self.positional_clients:
             client.broadcast(positional_data)
 
+        # Broadcasting the features (i.e to LSL)
+        for client in self.feature_clients:
+            client.broadcast(features)
+
         # Broadcasting the generated_data (i.e to MAX)
         for client in self.generated_data_clients:
-            client.broadcast(generated_data)
+            client.broadcast(generated_data, tick_time)
+
+        if instruments is not None:
+            instruments.end_tick()
+
+    def flush(self):
+        """Push out what the LSL clients still hold (i.e the last chunk)"""
+        for client in self.positional_clients + self.feature_clients:
+            client.flush()
 
 
-class TouchInput(Widget):
+class TouchRouter:
     """
     Handle the touch events that occurs determine what to do with them.
     Activations and deactivations of the channels happen here.
+    The main touches of the active channels are indexed in a TouchGrid, so finding the channel a new touch belongs
+    to does not scan all the channels, and the channel (and role) of every touch is kept in an owners map, shared by
+    all the channels, so moves and ups are dispatched in O(1).
+    This is the Kivy-free part of TouchInput, so the same logic can be driven without a window.
     """
 
     touch_time_threshold = MIN_TOUCH_TIME
 
-    def __init__(self, channels, mouse_mode, **kwargs):
+    def __init__(self, channels, mouse_mode, scheduler=None, recorder=None, instruments=None, **kwargs):
         super().__init__(**kwargs)
         self.channels = channels
+        self.recorder = recorder
+        self.instruments = instruments
         self.waiting_ch = TouchChannel(*parameters)
+        if scheduler is not None:
+            scheduler.add(self.waiting_ch)
         self.touch_mode = "mouse" if mouse_mode else "wm_touch"
+        self.grid = TouchGrid([*self.channels, self.waiting_ch], GROUPY_THRESHOLD)
+        self.owners = {}
+        for ch in [*self.channels, self.waiting_ch]:
+            ch.owners = self.owners
+
+    def activate(self, ch, touch):
+        ch.activate(touch)
+        self.grid.insert(ch, *touch.spos)
+
+    def deactivate(self, ch):
+        ch.deactivate()
+        self.grid.remove(ch)
 
     def on_touch_down(self, touch):
+        if self.instruments is not None:
+            self.instruments.ingress()
+        if self.recorder is not None:
+            self.recorder.record("down", touch)
         # If not touch mode type, do nothing
         if touch.device == self.touch_mode:
-            for ch in [*self.channels, self.waiting_ch]:
-                # If there is no active touch - create one
-                if not ch.isActive():
-                    if touch.is_double_tap:
-                        ch.next_mode()
-                    elif touch.is_triple_tap:
-                        ch.prev_mode()
-                    else:
-                        ch.activate(touch)
-                    return
-                # If there is an active touch, and the current touch occurred immediately after it - Add to group
-                if np.linalg.norm([ch.get_main_touch().spos[0] - touch.spos[0],
-                                   ch.get_main_touch().spos[1] - touch.spos[1]]) < GROUPY_THRESHOLD:
-                    ch.add_to_group(touch)
-                    return
+            ch = self.grid.owner(*touch.spos)
+            if ch is None:
+                return
+            # If there is no active touch - create one
+            if not ch.isActive():
+                if touch.is_double_tap:
+                    ch.next_mode()
+                elif touch.is_triple_tap:
+                    ch.prev_mode()
+                else:
+                    self.activate(ch, touch)
+            # If there is an active touch, and the current touch occurred immediately after it - Add to group
+            else:
+                ch.add_to_group(touch)
 
     def on_touch_move(self, touch):
+        if self.instruments is not None:
+            self.instruments.ingress()
+        if self.recorder is not None:
+            self.recorder.record("move", touch)
         if touch.device == self.touch_mode:
-            for ch in [*self.channels, self.waiting_ch]:
-                if ch.get_main_touch() == touch:
-                    ch.move()
-                    return
+            owner = self.owners.get(touch.uid)
+            if owner is None:
+                return
+            ch, role = owner
+            if role == MAIN:
+                ch.move()
+                self.grid.move(ch, *touch.spos)
+            # a groupie moved => only the distance of the group changes
+            else:
+                ch.groupy_moved(touch)
 
     def on_touch_up(self, touch):
+        if self.instruments is not None:
+            self.instruments.ingress()
+        if self.recorder is not None:
+            self.recorder.record("up", touch)
         if touch.device != self.touch_mode:
             return
-        for ch in self.channels:
-            # Case: The touch up refers to an active channel
-            if touch == ch.get_main_touch():
-                # Case: The channel have an active group => change the channel to one of the groupies
-                if len(ch.get_group()) > 0:
-                    new_touch = ch.get_group()[0]
-                    ch.change_main_touch(new_touch)
-                    ch.remove_from_group(new_touch)
-                    break
-                # Case: Waiting channel is active => Replace channels
-                if self.waiting_ch.isActive():
-                    ch.activate(self.waiting_ch.get_main_touch())
-                    self.waiting_ch.deactivate()
-                # else => deactivate
-                else:
-                    ch.deactivate()
-                break
-            # Case: the touch up related to one of the channel's groupies (in this case
-            # the channels must be activated) => remove it from the group
-            if touch in ch.get_group():
-                ch.remove_from_group(touch)
-                break
-        if self.waiting_ch.get_main_touch() == touch:
-            self.waiting_ch.deactivate()
+        owner = self.owners.get(touch.uid)
+        if owner is None:
+            return
+        ch, role = owner
+        # The waiting channel is only released by its main touch
+        if ch is self.waiting_ch:
+            if role == MAIN:
+                self.deactivate(self.waiting_ch)
+            return
+
+        # Case: The touch up refers to an active channel
+        if role == MAIN:
+            # Case: The channel have an active group => change the channel to one of the groupies
+            if len(ch.get_group()) > 0:
+                new_touch = ch.promote_groupy()
+                self.grid.move(ch, *new_touch.spos)
+            # Case: Waiting channel is active => Replace channels
+            elif self.waiting_ch.isActive():
+                waiting_touch = self.waiting_ch.get_main_touch()
+                self.deactivate(self.waiting_ch)
+                ch.activate(waiting_touch)
+                self.grid.move(ch, *waiting_touch.spos)
+            # else => deactivate
+            else:
+                self.deactivate(ch)
+        # Case: the touch up related to one of the channel's groupies (in this case
+        # the channels must be activated) => remove it from the group
+        else:
+            ch.remove_from_group(touch)
+
+
+class TouchInput(TouchRouter, Widget):
+    """The TouchRouter as a Kivy widget, which receives the touch events of the window"""
 
 
 class MyApp(App):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.channels = [TouchChannel(*parameters) for ch in range(CHANNELS)]
-        self.broadcaster = DataBroadcaster(self.channels)
+        self.bank = ChannelBank(CHANNELS)
+        self.channels = [TouchChannel(*parameters, bank=self.bank) for ch in range(CHANNELS)]
+        self.instruments = Instruments(TIME_SERIES_DT, report_every=PRINT_LATENCY, lsl=LATENCY_TO_LSL,
+                                       dump=LATENCY_DUMP) if INSTRUMENT_PIPELINE else None
+        self.broadcaster = DataBroadcaster(self.channels, self.bank, instruments=self.instruments)
+        # advances the channels and then broadcasts them, in one callback per tick
+        self.scheduler = ChannelScheduler(self.channels, listeners=[self.broadcaster.broadcast])
+        self.engine = None
+        self.recorder = TouchRecorder(RECORD_TOUCHES) if RECORD_TOUCHES else None
 
     def build(self):
-        Clock.schedule_interval(self.broadcaster.broadcast, TIME_SERIES_DT)
-        return TouchInput(self.channels, mouse_mode=MOUSE_DEV_MODE)
+        if BROADCAST_THREAD:
+            self.engine = BroadcastEngine(self.scheduler.tick, TIME_SERIES_DT, report_every=PRINT_TICK_STATS)
+            self.engine.start()
+        else:
+            Clock.schedule_interval(self.scheduler.tick, TIME_SERIES_DT)
+        return TouchInput(self.channels, mouse_mode=MOUSE_DEV_MODE, scheduler=self.scheduler, recorder=self.recorder,
+                          instruments=self.instruments)
+
+    def on_stop(self):
+        if self.engine is not None:
+            self.engine.stop()
+            print("-------------Broadcast ticks: %s------------" % self.engine.stats.summary())
+        self.broadcaster.flush()
+        print("-------------%s------------" % self.scheduler.summary())
+        if self.recorder is not None:
+            self.recorder.close()
+            print("-------------%d touch events recorded to %s------------" % (self.recorder.total, RECORD_TOUCHES))
+        if self.instruments is not None:
+            print("-------------Pipeline latency------------\n" + self.instruments.summary())
+            self.instruments.dump()
 
 if __name__ == "__main__":
+    # Importing the window opens it, so it is done only when running the app
+    from kivy.core.window import Window
 
     if FULL_WINDOW:
         # Avoiding the user from accidentally close the app
@@ -0,0 +1,69 @@
+import struct
+import time
+
+# Seconds between the NTP epoch (1900-01-01), which OSC timetags use, and the unix epoch (1970-01-01)
+NTP_EPOCH_OFFSET = 2208988800
+BUNDLE_HEADER = b'#bundle\x00'
+OSC_TYPES = 'fi'   # float32 and int32 arguments; their struct format characters are the same letters
+
+
+def ntp_timetag(t):
+    """Convert a unix time stamp (in sec.) to an OSC timetag: 32 bit seconds + 32 bit fraction since 1900"""
+    seconds = int(t)
+    fraction = int((t - seconds) * (1 << 32)) & 0xFFFFFFFF
+    return (seconds + NTP_EPOCH_OFFSET) & 0xFFFFFFFF, fraction
+
+
+def osc_string(s):
+    """Encode a string as OSC string: null terminated and padded to a multiple of 4 bytes"""
+    raw = s.encode('ascii') + b'\x00'
+    return raw + b'\x00' * (-len(raw) % 4)
+
+
+class OSCBundleEncoder:
+    """
+    Packs one OSC message per channel into a single timetagged OSC bundle.
+    The layout of the bundle does not change between ticks (same addresses, same type tags, same sizes), so it is
+    encoded once into a preallocated buffer, and every tick only the timetag and the arguments are overwritten in place.
+    """
+
+    def __init__(self, addresses, type_tags):
+        """
+        :param addresses: <List> OSC address of every message in the bundle, i.e. ['/channel1', '/channel2']
+        :param type_tags: <String> OSC type tags of the arguments of every message, i.e. 'ffffffif'
+        """
+        for tag in type_tags:
+            if tag not in OSC_TYPES:
+                raise ValueError("Unsupported OSC type tag '%s'" % tag)
+        self.addresses = list(addresses)
+        self.type_tags = type_tags
+        self.args_format = struct.Struct('>' + type_tags)
+
+        # build the static template: header, timetag placeholder, then [size, address, tags, args] per message
+        template = bytearray(BUNDLE_HEADER + b'\x00' * 8)
+        self.args_offsets = []
+        for address in self.addresses:
+            head = osc_string(address) + osc_string(',' + type_tags)
+            template += struct.pack('>i', len(head) + self.args_format.size) + head
+            self.args_offsets.append(len(template))
+            template += b'\x00' * self.args_format.size
+
+        self.buffer = template
+        self.view = memoryview(self.buffer)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def encode(self, values, timestamp=None):
+        """
+        Write the timetag and the arguments into the preallocated buffer.
+        :param values: <List> one list of arguments per message, in the order of the addresses
+        :param timestamp: <float> unix time the bundle refers to. Default is now
+        :return: <memoryview> the encoded bundle. Valid only until the next call to encode
+        """
+        struct.pack_into('>II', self.buffer, len(BUNDLE_HEADER),
+                         *ntp_timetag(time.time() if timestamp is None else timestamp))
+        pack_into = self.args_format.pack_into
+        for offset, args in zip(self.args_offsets, values):
+            pack_into(self.buffer, offset, *args)
+        return self.view
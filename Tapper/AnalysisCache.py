@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+CACHE_VERSION = 1           # bump when the analysis changes in a way its parameters don't tell
+HASH_BLOCK = 1 << 20        # bytes read at once while hashing a file
+
+# the numpy intermediates of the analysis, one .npy file each
+ARRAYS = ["index", "tapNum", "time_stamp", "npdata", "vel", "vel_filtered", "peaks", "high_peaks", "not_high_peaks",
+          "intervals"]
+# the scalars of extract_data & analyze_motion
+SCALARS = ["session", "screen_type", "n_samples", "number", "name", "trial", "time_length", "time_prespective",
+           "filter_size"]
+META_FILE = "meta.json"
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _scalar(value):
+    """numpy scalars (i.e. from a DataFrame) to plain python, for json"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class AnalysisCache:
+    """
+    On-disk cache of the velocity peaks analysis of the motion sessions (see Analyzer.analyze_motion).
+    An entry is keyed by the hash of the content of the csv file together with the parameters of the analysis, so
+    it is never stale: editing the file or any of the parameters simply misses the cache.
+    Every entry is a directory of .npy files, one per array, which are loaded memory-mapped (read only), and a json
+    file of the scalars. Entries are written to a temporary directory and renamed, so processes may share the cache.
+    The cache is bounded in size: the least recently used entries (by the modification time of their json file,
+    which is touched on every hit) are evicted once it grows beyond max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        :param directory: <String> directory of the cache, created if needed
+        :param max_bytes: <int> size of the cache on disk, beyond which the least recently used entries are evicted
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path, params):
+        """
+        :param path: <String> the csv file
+        :param params: <dict> the parameters of the analysis
+        """
+        h = hashlib.sha1(file_hash(path).encode())
+        h.update(json.dumps([CACHE_VERSION, params], sort_keys=True).encode())
+        return h.hexdigest()
+
+    def load(self, path, params):
+        """:return: <dict> as analyze_motion's, with the arrays memory-mapped. None if the entry is not cached"""
+        entry = os.path.join(self.directory, self.key(path, params))
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                data = json.load(f)
+            for name in ARRAYS:
+                data[name] = np.load(os.path.join(entry, name + ".npy"), mmap_mode="r")
+            os.utime(os.path.join(entry, META_FILE))
+        except (OSError, ValueError):
+            return None
+        return data
+
+    def store(self, path, params, data):
+        """
+        :param data: <dict> as analyze_motion's: the arrays are taken from it, and the time stamps and samples count
+                     of the preprocessed DataFrame
+        """
+        entry = os.path.join(self.directory, self.key(path, params))
+        if os.path.isdir(entry):
+            return
+        tmp = os.path.join(self.directory, "tmp-%s" % uuid.uuid4().hex)
+        os.makedirs(tmp)
+        arrays = {"index": data['data'].index.to_numpy(), "tapNum": data['data']['tapNum'].to_numpy(),
+                  "time_stamp": data['data']['time_stamp (in ms.)'].to_numpy()}
+        for name in ARRAYS:
+            np.save(os.path.join(tmp, name + ".npy"), np.asarray(arrays[name] if name in arrays else data[name]))
+        with open(os.path.join(tmp, META_FILE), "w") as f:
+            json.dump({name: _scalar(data[name]) for name in SCALARS}, f)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # another process stored the same entry meanwhile
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """:return: <List> of (last use, size in bytes, path) of the entries"""
+        res = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.startswith("tmp-") or not os.path.isdir(entry):
+                continue
+            try:
+                files = [os.path.join(entry, f) for f in os.listdir(entry)]
+                res.append((os.path.getmtime(os.path.join(entry, META_FILE)), sum(map(os.path.getsize, files)), entry))
+            except OSError:
+                continue        # evicted by another process meanwhile
+        return res
+
+    def evict(self):
+        """Remove the least recently used entries, until the cache fits in max_bytes"""
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry in entries:
+            if size <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            size -= entry_size
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
@@ -1,21 +1,23 @@
+import ntpath
+import os
 import pandas as pd
 import numpy as np
 import scipy.stats
 from util import CSV_COLS_PER_TASK as head_lines
 from util import CIRCLES, FREE_MOTION, TAPPER
 import matplotlib.pyplot as plt
-from matplotlib import cm
 from matplotlib.animation import FuncAnimation
 from scipy import signal
 from scipy.ndimage import gaussian_filter1d
 from sklearn.cluster import KMeans
+from AnalysisCache import AnalysisCache
+from TaskCsv import read_task_csv
 
 # TODO: create intervals files: both for whole circle and for entire peaks set
 
 ################# animation parameters ####################
 ANIMATION_TAIL = 90         # Tail of the animation factor
 ANIMATION_SPEED = 0.2       # FastForWard factor
-FRAME_COUNTER = 0           # don't change this
 
 ############### pre-process parameters ####################
 TRIM_SEC = 2               # time of the beginning of the trial to be cut, in sec.
@@ -39,29 +41,37 @@ OUTLIERS_TOL = 1               # tolerance for outliers. POSITIVE INTEGER
 PEAKS_SGN = -1                 # sign of the peaks: 1 for Max and -1 for Min
 COLORS = {'vel' : 'C0', 'vel_smooth' : 'C1', 'vel_filtered' : 'C2'}
 
+################### cache parameters ######################
+USE_CACHE = True                                # cache the analysis of the motion sessions, see AnalysisCache.py
+CACHE_DIR = os.path.join("Anlyzes", "cache")
+CACHE_MAX_BYTES = 512 * 2 ** 20                 # least recently used analyses are evicted beyond this size
+
 # TODO : fix data trimming without time_length signature
 # TODO: ignore the file if the data is trimmed in the end al lot
 
 
 def extract_data(path):
     """Extract the data from a given file (as path)"""
-    arr = path.split('\\')
-    session = arr[-1].split('_')[0]
-    screen_type = "small" if arr[-1].split('_')[1].split('.')[0]=='1' else "big"
+    # ntpath splits on both '\\' and '/', so Windows & POSIX paths are parsed alike
+    file_name = ntpath.basename(path)
+    session = file_name.split('_')[0]
+    screen_type = "small" if file_name.split('_')[1].split('.')[0]=='1' else "big"
     col_list = head_lines[session]
-    data = pd.read_csv(path, usecols=col_list)
-    trial = data.iloc[0]['subject'].split('_')[-1]
-    name = data.iloc[0]['subject'].split('_')[-2]
-    num = data.iloc[0]['subject'].split('_')[0]
-    time_length = data.iloc[-2]["tapNum"]
-    time_perspective = data.iloc[-1]["tapNum"]
-
-    # trim the beginning of the data and normalize the time stamp and the sample count accordingly
-    data = data.iloc[int(TRIM_SEC * len(data) / time_length):].reset_index()
-    data['time_stamp (in ms.)'] = data['time_stamp (in ms.)'] - data['time_stamp (in ms.)'][0]
-
-    # old index and name of subject are not necessary anymore
-    data = data.drop(['subject', 'index'], axis=1)[:-2]
+    table = read_task_csv(path, col_list)
+    trial = table['subject'].split('_')[-1]
+    name = table['subject'].split('_')[-2]
+    num = table['subject'].split('_')[0]
+    time_length = table['time_length']
+    time_perspective = table['time_perspective']
+    if time_length is None:
+        raise ValueError("%s has no footer (time elapsed & subject perception)" % path)
+
+    # trim the beginning of the data (the rows are counted with the 2 of the footer) and normalize the time stamp and
+    # the sample count accordingly. The frame is built once, from views of the loaded arrays
+    start = int(TRIM_SEC * (table['n_rows'] + 2) / time_length)
+    columns = {col: arr[start:] for col, arr in table['columns'].items()}
+    columns['time_stamp (in ms.)'] = columns['time_stamp (in ms.)'] - columns['time_stamp (in ms.)'][0]
+    data = pd.DataFrame(columns)
 
     dict = {
         "data": data,
@@ -80,8 +90,38 @@ def extract_data(path):
 def normalize_arr(arr):
     return (arr - np.min(arr)) / (np.max(arr) - np.min(arr))
 
+class TailBuffer:
+    """
+    The last points of the animation, in a ring of fixed size (the empty slots are nan, which are not drawn).
+    Every point is written twice, size apart, so that x & y are views of the points in order, without copying them
+    """
+
+    def __init__(self, size=ANIMATION_TAIL):
+        self.size = size
+        self.ring = np.full((2, 2 * size), np.nan)
+        self.pos = 0
+
+    def push(self, points):
+        """:param points: <np.ndarray> (n, 2) the next points, in order"""
+        points = points[-self.size:]
+        idx = (self.pos + np.arange(len(points))) % self.size
+        self.ring[:, idx] = self.ring[:, idx + self.size] = points.T
+        self.pos = (self.pos + len(points)) % self.size
+
+    @property
+    def x(self):
+        return self.ring[0, self.pos:self.pos + self.size]
+
+    @property
+    def y(self):
+        return self.ring[1, self.pos:self.pos + self.size]
+
+def velocity_colors(vel):
+    """:return: <np.ndarray> (len(vel), 4) the RGBA color of every normalized velocity value"""
+    return plt.get_cmap('viridis', len(vel))(vel)
+
 def animate_free_movement(data_dict):
-    """Animate the coordinates of a single session"""
+    """Animate the coordinates of a single session (see VideoExport.py to export the animation to a video file)"""
 
     name = data_dict['name']
     trial = data_dict['trial']
@@ -98,13 +138,10 @@ def animate_free_movement(data_dict):
 
     fig, ax = plt.subplots(figsize=(16,9))
     ax.set_title("subject: %s, %s session number %d" % (name, session, int(trial)+1), fontdict=None, loc='center', pad=None)
-    xdata, ydata, col = [], [], []
     ln, = plt.plot([], [], 'o')
-    global FRAME_COUNTER
-    FRAME_COUNTER = len(data)
-
-    viridis = cm.get_cmap('viridis', len(vel))
-    cmap = viridis(vel, len(vel))
+    # the tail in a ring buffer, and the color of the velocity at every point, computed once
+    tail = TailBuffer(ANIMATION_TAIL)
+    cmap = velocity_colors(vel)
     ax.set_xlim(0, 1)
     ax.set_ylim(0, 1)
     ax.get_xaxis().set_visible(False)
@@ -114,19 +151,15 @@ def animate_free_movement(data_dict):
         return ln,
 
     def update(frame):
-        global FRAME_COUNTER
-        FRAME_COUNTER -= 1
-        if FRAME_COUNTER == 0:
+        if frame == len(data) - 1:
             plt.pause(1)
             plt.close(fig)
-        xdata.append(frame[0])
-        ydata.append(frame[1])
-        col.append('%f' % vel[-FRAME_COUNTER])
-        ln.set_data(xdata[-ANIMATION_TAIL:], ydata[-ANIMATION_TAIL:])
-        ln.set_color(cmap[-FRAME_COUNTER])
+        tail.push(data[frame:frame+1])
+        ln.set_data(tail.x, tail.y)
+        ln.set_color(cmap[frame])
         return ln,
 
-    ani = FuncAnimation(fig, update, frames=data, init_func=init,
+    ani = FuncAnimation(fig, update, frames=len(data), init_func=init,
                         interval=time_length / n_samples / ANIMATION_SPEED, blit=True, repeat=False)
 
     plt.show()
@@ -138,11 +171,12 @@ def preprocess_motion(data):
     data = data.iloc[::CHUNK_SAMPLES, :]
 
     # replaces -1 to nan
-    data.replace(-1, np.nan, inplace=True)
+    data = data.replace(-1, np.nan)
 
-    # interpolate to fill the nan values
-    data['x_pos'].interpolate(method="linear", inplace=True)
-    data['y_pos'].interpolate(method="linear", inplace=True)
+    # interpolate to fill the nan values (assigned back: with pandas' Copy-on-Write an inplace method on a column
+    # does not update the frame)
+    data['x_pos'] = data['x_pos'].interpolate(method="linear")
+    data['y_pos'] = data['y_pos'].interpolate(method="linear")
 
     return data
 
@@ -152,28 +186,22 @@ def get_velocity_vector(data):
     return dist / dt * MULTIPY_FACTOR
 
 
-def get_fft(one_d_data, bp_width=None):
-
-    # Band pass factor; percentages of frequencies to trim from high and low areas
-    bp_width = 33
-
-    fft_amp = np.fft.fft(one_d_data)
-    np.fft.fftshift(fft_amp)
-    fft_freq = np.fft.fftfreq(len(one_d_data))
-    np.fft.fftshift(fft_freq)
+def get_fft(one_d_data, bp_width=33):
+    """
+    The one-sided spectrum of a real signal (see Spectrum.py for the PSD of the velocity of many trials at once)
+    :param bp_width: <int> Band pass factor; percentage of the frequencies (of the length of the signal) to keep from
+                     the low ones, None to keep them all. DC is always trimmed
+    :return: <np.ndarray> the frequencies (in cycles per sample), the amplitudes & the band-passed signal
+    """
+    fft_amp = np.fft.rfft(one_d_data)
+    fft_freq = np.fft.rfftfreq(len(one_d_data))
 
     mask = np.ones(len(fft_freq))
     mask[fft_freq==0] = 0
     if bp_width is not None:
-        mask[(len(fft_freq)*bp_width//100):] = 0
-        mask[-(len(fft_freq)*bp_width//100):] = 0
+        mask[(len(one_d_data)*bp_width//100):] = 0
 
-    # TODO: postprocess for FFT:
-    # BAND PASS to exclude the robust freq, and the very high ones
-    # AVG: average the frequencies
-    # COMPARE to tapping results
-
-    filtered_signal = np.fft.ifft(fft_amp * mask)
+    filtered_signal = np.fft.irfft(fft_amp * mask, n=len(one_d_data))
 
     return fft_freq*mask, np.abs(fft_amp*mask), filtered_signal
 
@@ -201,32 +229,49 @@ def plot_fft(x_dft, y_dft, ax):
     ax.plot(x_dft, y_dft)
 
 def separate_high_peaks(data):
-    center_y = np.mean(data['npdata'][:, 1])
-
-    # for every peak P, check if the next points in data are in descending order in the y axis
-    # check out half of the points between two peaks
-    # if YES: insure that P_y is > center_y
-    res = []
-    for i in range(len(data['peaks'][:-1])):
-        p_cur = data['peaks'][i]
-        p_next = data['peaks'][i+1]
-        if data['npdata'][p_cur][1] > np.average(data['npdata'][p_cur:p_next][:, 1]) and data['npdata'][p_cur][1] > center_y:
-            res.append(p_cur)
-    p_last = data['peaks'][-1]
-    if data['npdata'][p_last][1] > np.average(data['npdata'][p_last:][:, 1]):
-        res.append(p_last)
-    data['high_peaks'] = np.array(res)
-    data['not_high_peaks'] = np.setdiff1d(data['peaks'], data['high_peaks'])
+    y = data['npdata'][:, 1]
+    peaks = np.asarray(data['peaks'], dtype=np.intp)
+    center_y = np.mean(y)
+    if len(peaks) == 0:
+        data['high_peaks'] = data['not_high_peaks'] = peaks
+        return
+
+    # for every peak P, check if the next points in data are in descending order in the y axis, i.e. if P_y is above
+    # the average of y from P to the next peak (to the end of the data for the last peak)
+    # if YES: insure that P_y is > center_y (but for the last peak)
+    # The averages of all the segments are taken at once from a cumulative sum of y (relative to center_y, for
+    # precision). As a cumulative sum rounds differently than np.average, the peaks within the bound of the rounding
+    # errors of both from their average (i.e. a still finger) are checked again with np.average
+    high = np.zeros(len(peaks), dtype=bool)
+    if np.isnan(center_y):
+        # nan values (not interpolated, at the beginning of the data): no peak is above the center, but the last
+        high[-1] = y[peaks[-1]] > np.average(y[peaks[-1]:])
+    else:
+        dev = y - center_y
+        bounds = np.append(peaks, len(y))
+        lengths = np.diff(bounds)
+        cum = np.concatenate([[0.], np.cumsum(dev)])
+        above = dev[peaks] - (cum[bounds[1:]] - cum[bounds[:-1]]) / lengths
+        tol = 2 * np.finfo(np.float64).eps * (2 * len(y) * np.sum(np.abs(dev)) / lengths +
+                                              lengths * np.max(np.abs(y)) + 2 * np.max(np.abs(dev)))
+        for i in np.flatnonzero(np.abs(above) <= tol):
+            above[i] = 1 if y[peaks[i]] > np.average(y[bounds[i]:bounds[i + 1]]) else -1
+        high = above > 0
+        high[:-1] &= y[peaks[:-1]] > center_y
+
+    data['high_peaks'] = peaks[high]
+    data['not_high_peaks'] = peaks[~high]
 
 def plot_peaks(data, ax):
     ax.set_yticks([])
     ax.set_xticks([])
     ax.set(ylabel="vel.")
     ax.plot(data['vel'], alpha=1)
-    for x in data['high_peaks']:
-        ax.axvline(x, color='red', linestyle='--', linewidth=0.8)
-    for x in data['not_high_peaks']:
-        ax.axvline(x, color='Orange', linestyle='--', linewidth=0.8)
+    # a single collection of vertical lines (over the whole height of the axis) per kind of peaks
+    ax.vlines(data['high_peaks'], 0, 1, transform=ax.get_xaxis_transform(), color='red', linestyle='--',
+              linewidth=0.8)
+    ax.vlines(data['not_high_peaks'], 0, 1, transform=ax.get_xaxis_transform(), color='Orange', linestyle='--',
+              linewidth=0.8)
     ax.scatter(data['not_high_peaks'], data['vel'][data['not_high_peaks']], marker="^", color='Orange', zorder=2, linewidth=0.3, edgecolors='black', s=20)
     ax.scatter(data['high_peaks'], data['vel'][data['high_peaks']], marker='o', color='red', zorder=2, linewidth=0.3, edgecolors='black', s=20)
 
@@ -247,13 +292,76 @@ def plot_interval_hist(data, ax):
     ax.legend(loc='upper left', prop={'size': 8})
     ax.set(xlabel="ms.")
 
-def plot_smooth_vec(data, ax):
+def smooth_velocity(data):
+    """Smooth the velocity vector with a Gaussian filter, which is wider the slower the movement"""
     mean = np.mean(data['vel'])
     filter_size = int(VELOCITY_FILTER_SIZE + (0 if mean > DEFAULT_VEL_MEAN else 14 * np.abs(mean - DEFAULT_VEL_MEAN)))
     data['vel_filtered'] = gaussian_filter1d(data['vel'], filter_size)
-    plot_velocity_vector(data, ax[1], fil_size=filter_size, filtered=True)
+    data['filter_size'] = filter_size
 
-def plot_analyze(path, ax_arr, animate=False):
+def plot_smooth_vec(data, ax):
+    plot_velocity_vector(data, ax[1], fil_size=data['filter_size'], filtered=True)
+
+def analyze_motion(data):
+    """
+    The velocity peaks analysis of a motion session, without plotting. Adds to the dictionary of extract_data:
+    npdata, vel, vel_filtered, filter_size, peaks, high_peaks, not_high_peaks & intervals (in ms.)
+    """
+    data['data'] = preprocess_motion(data['data'])
+
+    # generate positional data as numpy array
+    data['npdata'] = np.array([data['data']['x_pos'], data['data']['y_pos']]).T
+    # generate velocity vector
+    data['vel'] = get_velocity_vector(data)
+    # Smooth the vector with Gaussian Filter
+    smooth_velocity(data)
+
+    # Find the peaks (minima) of the velocity vector
+    data['peaks'], _ = signal.find_peaks(PEAKS_SGN * (data['vel_filtered']), height=-np.inf)
+    # data['peaks_time_stamps'] = data['data']['time_stamp (in ms.)'] \
+    #     .reset_index().loc[data['peaks']].rename(columns={"time_stamp (in ms.)": "natRhythmTap (in ms.)"})
+    # data['peaks_time_stamps'].to_csv(path[:-4] + "_peaks_int.csv")
+    separate_high_peaks(data)
+
+    p = (data['data']['time_stamp (in ms.)'].reset_index(drop=True))[data['high_peaks']]
+    data['intervals'] = p[1:].copy().reset_index(drop=True).subtract(p[:-1].copy().reset_index(drop=True))
+    return data
+
+def analysis_params():
+    """The parameters the analysis of a motion session depends on, which key its cache entry with the file"""
+    return {"TRIM_SEC": TRIM_SEC, "CHUNK_SAMPLES": CHUNK_SAMPLES, "MULTIPY_FACTOR": MULTIPY_FACTOR,
+            "VELOCITY_FILTER_SIZE": VELOCITY_FILTER_SIZE, "DEFAULT_VEL_MEAN": DEFAULT_VEL_MEAN, "PEAKS_SGN": PEAKS_SGN}
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = AnalysisCache(CACHE_DIR, CACHE_MAX_BYTES)
+    return _cache
+
+def load_analysis(path, use_cache=None):
+    """
+    extract_data, and for the motion sessions analyze_motion, through the on-disk cache: an unchanged file which was
+    analyzed with the same parameters is loaded (memory-mapped) instead of being parsed & analyzed again
+    :param use_cache: <bool> None for USE_CACHE
+    """
+    use_cache = USE_CACHE if use_cache is None else use_cache
+    if use_cache:
+        data = get_cache().load(path, analysis_params())
+        if data is not None:
+            data['data'] = pd.DataFrame({'tapNum': data['tapNum'], 'x_pos': data['npdata'][:, 0],
+                                         'y_pos': data['npdata'][:, 1], 'time_stamp (in ms.)': data['time_stamp']},
+                                        index=data['index'])
+            return data
+    data = extract_data(path)
+    if data['session'] in [FREE_MOTION, CIRCLES]:
+        analyze_motion(data)
+        if use_cache:
+            get_cache().store(path, analysis_params(), data)
+    return data
+
+def plot_analyze(path, ax_arr, animate=False, use_cache=None):
 
     # Extract the data into a dictionary structure with the next keys:
     #   session          : <String>; one of: "FREE MOTION", "CIRCLES", "TAPPER"
@@ -264,31 +372,15 @@ def plot_analyze(path, ax_arr, animate=False):
     #   trial            : <String>; integer of number of the trial
     #   time_length      : <String>; integer of total time the trial took, in sec.
     #   time_perspective : <String>; integer of time the subject thought that passed, in sec.
-    data = extract_data(path)
+    # For motion sessions, also the keys of analyze_motion (loaded from the cache if the file was already analyzed)
+    data = load_analysis(path, use_cache)
     ax_arr[0].set_title("SUBJECT: %s, TASK: %s, SCREEN SIZE: %s" % (data['name'], data['session'], data['screen_type']))
 
     # analyze motion data
     if data['session'] in [FREE_MOTION, CIRCLES]:
-        data['data'] = preprocess_motion(data['data'])
-
-        # generate positional data as numpy array
-        data['npdata'] = np.array([data['data']['x_pos'], data['data']['y_pos']]).T
-        # generate velocity vector
-        data['vel'] = get_velocity_vector(data)
         plot_velocity_vector(data, ax_arr[0])
-        # Smooth the vector with Gaussian Filter
         plot_smooth_vec(data, ax_arr)
-
-        # Find the peaks (minima) of the velocity vector
-        data['peaks'], _ = signal.find_peaks(PEAKS_SGN * (data['vel_filtered']), height=-np.inf)
-        # data['peaks_time_stamps'] = data['data']['time_stamp (in ms.)'] \
-        #     .reset_index().loc[data['peaks']].rename(columns={"time_stamp (in ms.)": "natRhythmTap (in ms.)"})
-        # data['peaks_time_stamps'].to_csv(path[:-4] + "_peaks_int.csv")
-        separate_high_peaks(data)
         plot_peaks(data, ax_arr[2])
-
-        p = (data['data']['time_stamp (in ms.)'].reset_index(drop=True))[data['high_peaks']]
-        data['intervals'] = p[1:].copy().reset_index(drop=True).subtract(p[:-1].copy().reset_index(drop=True))
         plot_interval_hist(data, ax_arr[3])
 
         if animate:
@@ -296,6 +388,17 @@ def plot_analyze(path, ax_arr, animate=False):
 
     return data
 
+def plot_peaks_map(data, ax):
+    # plot the velocity peaks of the data on the movements shape. not that peaks are MINIMA points
+    ax.set_xlim(0, 1)
+    ax.set_ylim(-1.2, 2.2)
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+    ax.set_title("Minimal velocity points (including outliers) along the move")
+    ax.scatter(data['npdata'][:,0], data['npdata'][:,1], alpha=0.8)
+    ax.scatter(data['npdata'][:,0][data['not_high_peaks']], data['npdata'][:,1][data['not_high_peaks']], marker="^", color='Orange', zorder=2, edgecolors='black', linewidths=1.)
+    ax.scatter(data['npdata'][:,0][data['high_peaks']], data['npdata'][:,1][data['high_peaks']], marker="o", color='r', zorder=2, edgecolors='black', linewidths=1.)
+
 def init_axis(ax, title):
     ax.annotate(title, xy=(0, 0.5), xytext=(-ax.yaxis.labelpad - 5, 0),
                        xycoords=ax.yaxis.label, textcoords='offset points',
@@ -320,20 +423,11 @@ def analyze_velocity_peaks(files, animate=False):
 
     if map:
         data = data[0]
-        # plot the velocity peaks of the data on the movements shape. not that peaks are MINIMA points
         gs = axs[1, 0].get_gridspec()
         # remove the underlying axes
         for ax in axs[0:, -1]:
             ax.remove()
-        axbig = fig.add_subplot(gs[0:, -1])
-        axbig.set_xlim(0, 1)
-        axbig.set_ylim(-1.2, 2.2)
-        axbig.get_xaxis().set_visible(False)
-        axbig.get_yaxis().set_visible(False)
-        axbig.set_title("Minimal velocity points (including outliers) along the move")
-        axbig.scatter(data['npdata'][:,0], data['npdata'][:,1], alpha=0.8)
-        axbig.scatter(data['npdata'][:,0][data['not_high_peaks']], data['npdata'][:,1][data['not_high_peaks']], marker="^", color='Orange', zorder=2, edgecolors='black', linewidths=1.)
-        axbig.scatter(data['npdata'][:,0][data['high_peaks']], data['npdata'][:,1][data['high_peaks']], marker="o", color='r', zorder=2, edgecolors='black', linewidths=1.)
+        plot_peaks_map(data, fig.add_subplot(gs[0:, -1]))
 
     plt.show()
 
@@ -0,0 +1,163 @@
+"""
+Headless analysis of a whole Data directory: the velocity peaks analysis of Analyzer.py (extract_data ->
+preprocess_motion -> velocity -> smoothing -> find_peaks -> separate_high_peaks -> intervals) of every
+Data/<subject>/<Task>_<n>.csv file of the motion tasks, on a pool of processes, without any figure.
+Writes to the output directory:
+- summary.csv: a row per trial, with the dominant frequency of its velocity (Welch's PSD of all the trials at once,
+  see Spectrum.py) & the mean inter-tap interval of the subject's Tapper session of the same screen, to compare with
+  the intervals
+- intervals/<subject>_<Task>_<n>.npy: the intervals between the high peaks of the trial, in ms.
+Run from the Tapper directory:
+    python BatchAnalysis.py [--data Data] [--out Anlyzes/batch] [--workers N] [--tasks Motion Circles] [--no-cache]
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from csv import writer
+from glob import glob
+
+import matplotlib
+matplotlib.use("Agg")       # the workers never open a window
+import numpy as np
+
+from util import CIRCLES, FREE_MOTION, TAPPER
+from Analyzer import load_analysis
+from OnlineAnalysis import analyze_tapper_file
+from Spectrum import SpectrumEngine, uniform_velocity
+
+DATA_DIR = "Data"
+OUT_DIR = os.path.join("Anlyzes", "batch")
+WORKERS = None              # processes of the pool. None for one per CPU, 0 to analyze in this process
+TASKS = [FREE_MOTION, CIRCLES]
+PROGRESS_EVERY = 1          # print the progress every N trials
+
+SUMMARY_COLUMNS = ["subject", "task", "counter", "screen_type", "number", "name", "trial", "n_samples",
+                   "time_length", "time_perspective", "vel_mean", "vel_std", "filter_size", "peaks", "high_peaks",
+                   "intervals", "interval_mean", "interval_std", "interval_cv", "dominant_freq", "dominant_period",
+                   "tapper_iti_mean", "status", "seconds", "path"]
+
+
+def discover(data_dir=DATA_DIR, tasks=TASKS):
+    """:return: <List> of the paths of the Data/<subject>/<Task>_<n>.csv files of the given tasks, sorted"""
+    pattern = re.compile(r"^(%s)_(\d+)\.csv$" % "|".join(re.escape(task) for task in tasks))
+    return sorted(path for path in glob(os.path.join(data_dir, "*", "*.csv"))
+                  if pattern.match(os.path.basename(path)))
+
+
+def analyze_trial(path, use_cache=None):
+    """
+    The analysis of a single trial. Runs in a worker process, so it never raises: a trial which fails is reported
+    by its status
+    :param use_cache: <bool> load the analysis from the cache if the file was already analyzed. None for
+                      Analyzer.USE_CACHE
+    :return: <dict> the row of the summary, <np.ndarray> the intervals & <np.ndarray> the velocity resampled
+             uniformly, for its spectrum (both empty if the trial failed)
+    """
+    start = time.perf_counter()
+    task, counter = os.path.splitext(os.path.basename(path))[0].split("_")
+    row = {col: "" for col in SUMMARY_COLUMNS}
+    row.update({"subject": os.path.basename(os.path.dirname(path)), "task": task, "counter": counter, "path": path})
+    intervals = velocity = np.zeros(0)
+    try:
+        data = load_analysis(path, use_cache)
+        if 'intervals' not in data:
+            raise ValueError("not a motion session")
+        intervals = np.asarray(data['intervals'], dtype=np.float64)
+        row.update({"screen_type": data['screen_type'], "number": data['number'], "name": data['name'],
+                    "trial": data['trial'], "n_samples": data['n_samples'], "time_length": data['time_length'],
+                    "time_perspective": data['time_prespective'], "vel_mean": np.mean(data['vel']),
+                    "vel_std": np.std(data['vel']), "filter_size": data['filter_size'],
+                    "peaks": len(data['peaks']), "high_peaks": len(data['high_peaks']),
+                    "intervals": len(intervals), "status": "ok"})
+        if len(intervals):
+            mean, std = np.mean(intervals), np.std(intervals)
+            row.update({"interval_mean": mean, "interval_std": std, "interval_cv": std / mean if mean else ""})
+        velocity = uniform_velocity(np.asarray(data['vel']), data['data']['time_stamp (in ms.)'].to_numpy())
+        tapper = os.path.join(os.path.dirname(path), "%s_%s.csv" % (TAPPER, counter))
+        if os.path.exists(tapper):
+            row["tapper_iti_mean"] = analyze_tapper_file(tapper)["iti_mean"]
+    except Exception as e:
+        row["status"] = "error: %s: %s" % (type(e).__name__, " ".join(str(e).split()))
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row, intervals, velocity
+
+
+def add_dominant_frequency(rows, velocities):
+    """
+    Add the dominant frequency of the velocity (in Hz) & its period (in ms., to compare with the intervals) to the
+    rows of the trials, from their PSDs, all computed at once
+    :param velocities: <List> the velocities resampled uniformly of the trials, empty for those that failed
+    """
+    trials = [i for i, vel in enumerate(velocities) if len(vel)]
+    if not trials:
+        return
+    engine = SpectrumEngine()
+    freqs = engine.dominant(engine.welch([velocities[i] for i in trials]))
+    for i, freq in zip(trials, freqs):
+        rows[i].update({"dominant_freq": freq, "dominant_period": 1000 / freq})
+
+
+def run_batch(paths, out_dir=OUT_DIR, workers=WORKERS, progress_every=PROGRESS_EVERY, use_cache=None):
+    """
+    Analyze the given trials and write the summary & the intervals of every trial
+    :param paths: <List> of the paths of the trials, as found by discover
+    :param out_dir: <String> output directory
+    :param workers: <int> processes of the pool. None for one per CPU, 0 to analyze in this process
+    :param progress_every: <int> print the progress every N trials. 0 for no progress
+    :param use_cache: <bool> use the cache of the analysis. None for Analyzer.USE_CACHE
+    :return: <List> of the rows of the summary, in the order of paths
+    """
+    intervals_dir = os.path.join(out_dir, "intervals")
+    os.makedirs(intervals_dir, exist_ok=True)
+    rows = [None] * len(paths)
+    velocities = [None] * len(paths)
+    start = time.perf_counter()
+
+    def done(i, row, intervals, velocity):
+        rows[i] = row
+        velocities[i] = velocity
+        if row["status"] == "ok":
+            np.save(os.path.join(intervals_dir, "%s_%s_%s.npy" % (row["subject"], row["task"], row["counter"])),
+                    intervals)
+        finished = sum(r is not None for r in rows)
+        if progress_every and (finished % progress_every == 0 or finished == len(paths)):
+            print("[%d/%d] %.1fs %s: %s" % (finished, len(paths), time.perf_counter() - start, paths[i],
+                                            row["status"]))
+
+    if workers == 0:
+        for i, path in enumerate(paths):
+            done(i, *analyze_trial(path, use_cache))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(analyze_trial, path, use_cache): i for i, path in enumerate(paths)}
+            for future in as_completed(futures):
+                done(futures[future], *future.result())
+    add_dominant_frequency(rows, velocities)
+
+    with open(os.path.join(out_dir, "summary.csv"), "w", newline="") as f:
+        w = writer(f)
+        w.writerow(SUMMARY_COLUMNS)
+        for row in rows:
+            w.writerow([row[col] for col in SUMMARY_COLUMNS])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Velocity peaks analysis of every motion trial of a Data directory")
+    parser.add_argument("--data", default=DATA_DIR, help="the Data directory")
+    parser.add_argument("--out", default=OUT_DIR, help="output directory")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="processes of the pool (default: one per CPU, 0: no pool)")
+    parser.add_argument("--tasks", nargs="+", default=TASKS, help="tasks to analyze")
+    parser.add_argument("--no-cache", action="store_true", help="analyze every file again, see Analyzer.USE_CACHE")
+    args = parser.parse_args()
+
+    paths = discover(args.data, args.tasks)
+    print("-------------Analyzing %d trials of %s------------" % (len(paths), args.data))
+    start = time.perf_counter()
+    rows = run_batch(paths, args.out, args.workers, use_cache=False if args.no_cache else None)
+    failed = [row for row in rows if row["status"] != "ok"]
+    print("-------------%d trials analyzed in %.1fs, %d failed. Summary in %s------------" %
+          (len(rows), time.perf_counter() - start, len(failed), os.path.join(args.out, "summary.csv")))
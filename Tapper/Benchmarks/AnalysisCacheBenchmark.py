@@ -0,0 +1,52 @@
+"""Cost of the velocity peaks analysis of every motion trial of the Data directory: analyzed from the csv files
+(a cold cache, which also stores the entries), then loaded from the cache, memory-mapped. Also checks that the
+cached intermediates are the same as the analyzed ones.
+Run from the Tapper directory:
+    python -m Benchmarks.AnalysisCacheBenchmark
+"""
+import tempfile
+import time
+
+import numpy as np
+
+import Analyzer
+from AnalysisCache import AnalysisCache
+from BatchAnalysis import discover
+
+ARRAYS = ["npdata", "vel", "vel_filtered", "peaks", "high_peaks", "intervals"]
+
+
+def load_all(paths, use_cache):
+    res = {}
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            res[path] = Analyzer.load_analysis(path, use_cache)
+        except Exception:
+            pass        # the broken files of the Data directory
+    return res, time.perf_counter() - start
+
+
+def main():
+    paths = discover()
+    with tempfile.TemporaryDirectory() as tmp:
+        Analyzer._cache = AnalysisCache(tmp, Analyzer.CACHE_MAX_BYTES)
+        analyzed, no_cache = load_all(paths, use_cache=False)
+        _, cold = load_all(paths, use_cache=True)
+        cached, warm = load_all(paths, use_cache=True)
+        size = sum(entry[1] for entry in Analyzer._cache.entries())
+
+        for path, data in analyzed.items():
+            for name in ARRAYS:
+                assert np.array_equal(np.asarray(data[name]), np.asarray(cached[path][name])), (path, name)
+            assert data['data'].equals(cached[path]['data']), path
+
+    print("%d trials (%d analyzed), cache of %.1f MB. The cached intermediates are the same" %
+          (len(paths), len(analyzed), size / 2 ** 20))
+    print("%-24s %10s %14s" % ("", "total s", "ms per trial"))
+    for name, t in [("no cache", no_cache), ("cold cache (store)", cold), ("warm cache (mmap)", warm)]:
+        print("%-24s %10.3f %14.2f" % (name, t, t / len(paths) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""separate_high_peaks: the former loop over the peaks (an np.average of the slice of every segment) against the
+vectorized version of Analyzer.py (all the averages from a cumulative sum), on synthetic Circles trajectories of
+increasing length (80 Hz, as the app samples, with a circle every ~0.7 s, and pauses of a still finger).
+Also checks that both separate the very same peaks: on every motion file of the Data directory, on the synthetic
+trajectories, and on adversarial ones (constant segments, so that peaks equal their average, and nan values).
+Run from the Tapper directory:
+    python -m Benchmarks.HighPeaksBenchmark
+"""
+import time
+
+import numpy as np
+from scipy import signal
+
+import Analyzer
+from BatchAnalysis import discover
+
+RATE = 80                       # samples per sec.
+DURATIONS = [60, 600, 3600]     # sec.
+REPEAT = 5
+
+
+def separate_high_peaks_loop(data):
+    """separate_high_peaks, as it was before the vectorized version"""
+    center_y = np.mean(data['npdata'][:, 1])
+    res = []
+    for i in range(len(data['peaks'][:-1])):
+        p_cur = data['peaks'][i]
+        p_next = data['peaks'][i+1]
+        if data['npdata'][p_cur][1] > np.average(data['npdata'][p_cur:p_next][:, 1]) and \
+                data['npdata'][p_cur][1] > center_y:
+            res.append(p_cur)
+    p_last = data['peaks'][-1]
+    if data['npdata'][p_last][1] > np.average(data['npdata'][p_last:][:, 1]):
+        res.append(p_last)
+    data['high_peaks'] = np.array(res)
+    data['not_high_peaks'] = np.setdiff1d(data['peaks'], data['high_peaks'])
+
+
+def trajectory(seconds, rnd):
+    """(npdata, peaks) of circles drawn at a varying speed, with pauses of a still finger"""
+    t = np.arange(seconds * RATE) / RATE
+    speed = 2 * np.pi / 0.7 * (1 + 0.3 * np.sin(t * 0.5)) * (rnd.random(len(t)) > 0.02)
+    phase = np.cumsum(speed) / RATE
+    npdata = np.array([0.5 + 0.3 * np.cos(phase), 0.5 + 0.3 * np.sin(phase)]).T
+    npdata += rnd.normal(0, 0.002, npdata.shape)
+    vel = np.linalg.norm(np.diff(npdata, axis=0), axis=1)
+    peaks, _ = signal.find_peaks(-vel, height=-np.inf)
+    return npdata, peaks
+
+
+def adversarial(rnd):
+    """Trajectories where peaks equal the average of their segment, up to rounding, and with nan values"""
+    res = []
+    for _ in range(200):
+        n = rnd.integers(50, 2000)
+        y = np.repeat(rnd.choice([0.1, 0.3, 1 / 3, 0.7, 2 / 3], size=n // 10 + 1), 10)[:n]
+        y[rnd.random(n) < 0.3] += rnd.choice([0, 1e-17, 1e-16, -1e-16], size=1)[0]
+        if rnd.random() < 0.2:
+            y[:rnd.integers(1, 20)] = np.nan      # the -1 samples at the beginning, which are not interpolated
+        peaks = np.unique(rnd.integers(0, n, rnd.integers(1, n // 5 + 2)))
+        res.append((np.array([y, y]).T, peaks))
+    return res
+
+
+def same(npdata, peaks):
+    a = {'npdata': npdata, 'peaks': peaks}
+    b = {'npdata': npdata, 'peaks': peaks}
+    separate_high_peaks_loop(a)
+    Analyzer.separate_high_peaks(b)
+    return np.array_equal(a['high_peaks'], b['high_peaks']) and \
+        np.array_equal(a['not_high_peaks'], b['not_high_peaks'])
+
+
+def check(rnd):
+    cases = []
+    for path in discover():
+        try:
+            data = Analyzer.load_analysis(path, use_cache=False)
+        except Exception:
+            continue        # the broken files of the Data directory
+        cases.append((data['npdata'], data['peaks']))
+    n_files = len(cases)
+    cases += [trajectory(seconds, rnd) for seconds in DURATIONS]
+    cases += adversarial(rnd)
+    different = [i for i, (npdata, peaks) in enumerate(cases) if not same(npdata, peaks)]
+    assert not different, different
+    return n_files, len(cases)
+
+
+def measure(fn, npdata, peaks):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn({'npdata': npdata, 'peaks': peaks})
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    rnd = np.random.default_rng(0)
+    n_files, n_cases = check(rnd)
+    print("Same high peaks on %d cases (%d motion files of the Data directory)" % (n_cases, n_files))
+    print("%-10s %10s %10s %12s %14s %8s" % ("recording", "samples", "peaks", "loop ms", "vectorized ms", "x"))
+    for seconds in DURATIONS:
+        npdata, peaks = trajectory(seconds, rnd)
+        loop = measure(separate_high_peaks_loop, npdata, peaks)
+        vectorized = measure(Analyzer.separate_high_peaks, npdata, peaks)
+        print("%-10s %10d %10d %12.2f %14.3f %8.0f" %
+              ("%d s" % seconds, len(npdata), len(peaks), loop * 1e3, vectorized * 1e3, loop / vectorized))
+
+
+if __name__ == '__main__':
+    main()
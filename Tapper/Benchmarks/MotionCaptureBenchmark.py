@@ -0,0 +1,115 @@
+"""Fidelity and cost of the two ways of capturing a motion session:
+- poll: the current touch is sampled on the Kivy Clock and stamped with the time of the poll. The Clock asks for 1 ms,
+        but in practice only fires once per frame (here 60 fps). For reference, also a poll which does hold 1 kHz
+- events: a sample per touch event (here a 120 Hz touch screen), stamped with the event's own time
+Both are resampled to 1 kHz and compared with the true trajectory of the finger, which speeds up and slows down
+along a circle.
+Also checks that an event captured session, closed with its duration as the app keeps it (a String, i.e. "60"), is
+exported to csv at the legacy rate over the whole session.
+Run from the Tapper directory:
+    python -m Benchmarks.MotionCaptureBenchmark
+"""
+import math
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from util import CIRCLES
+from MotionRecorder import MotionRecorder, read_motion, resample, export_csv
+
+SECONDS = 60
+TOUCH_RATE = 120        # touch events per sec.
+FRAME_RATE = 60         # Kivy frames per sec.
+RESAMPLE_RATE = 1000
+EXPORT_RATE = 82        # Main.MOTION_RESAMPLE_RATE, the rate of the sessions polled by the Clock
+
+
+def position(t):
+    """The true position of the finger at time t (sec.)"""
+    phase = t * 4 + 1.5 * math.sin(t * 1.3)
+    return 0.5 + 0.3 * math.cos(phase), 0.5 + 0.3 * math.sin(phase)
+
+
+def events(rnd):
+    """(time, x, y) of the touch events"""
+    t, res = 0.0, []
+    while t < SECONDS:
+        res.append((t, *position(t)))
+        t += 1 / TOUCH_RATE * rnd.uniform(0.8, 1.2)
+    return res
+
+
+def capture_poll(path, touch_events, rnd, rate=FRAME_RATE):
+    recorder = MotionRecorder(path, "s01_bench_0", CIRCLES, capture="poll")
+    cpu = 0.0
+    i, frame_t = 0, 0.0
+    while frame_t < SECONDS:
+        while i + 1 < len(touch_events) and touch_events[i + 1][0] <= frame_t:
+            i += 1
+        t, x, y = touch_events[i]
+        start = time.perf_counter()
+        recorder.sample(1, x, y, frame_t * 1000)
+        cpu += time.perf_counter() - start
+        frame_t += 1 / rate * rnd.uniform(0.9, 1.3)
+    recorder.close(SECONDS)
+    return cpu
+
+
+def capture_events(path, touch_events, duration=SECONDS):
+    recorder = MotionRecorder(path, "s01_bench_0", CIRCLES, capture="events")
+    cpu = 0.0
+    for t, x, y in touch_events:
+        start = time.perf_counter()
+        recorder.sample(1, x, y, t * 1000)
+        cpu += time.perf_counter() - start
+    recorder.close(duration)
+    return cpu
+
+
+def check_export(path, touch_events):
+    """An event captured session closed by the app (TapperTask.write_perception): its duration is the String of
+    time_for_circles, i.e. '60'"""
+    capture_events(path, touch_events, duration=str(SECONDS))
+    header, _ = read_motion(path)
+    assert header["duration"] == SECONDS, header
+    with open(export_csv(path, rate=EXPORT_RATE)) as f:
+        rows = [line.split(",") for line in f.read().split("\n")[1:] if line.startswith("s01_bench_0")]
+    times = np.array([float(row[-1]) for row in rows])
+    assert times[0] == 0 and SECONDS * 1000 - 1000 / EXPORT_RATE < times[-1] <= SECONDS * 1000, times[[0, -1]]
+    print("Exported a session closed with the duration '%d' at %d Hz: %d rows, %.0f to %.0f ms" %
+          (SECONDS, EXPORT_RATE, len(times), times[0], times[-1]))
+
+
+def error(path):
+    header, samples = read_motion(path)
+    uniform = resample(samples, RESAMPLE_RATE)
+    valid = uniform["tapNum"] != -1
+    truth = np.array([position(t / 1000) for t in uniform["time"][valid]])
+    got = np.array([uniform["x"][valid], uniform["y"][valid]]).T
+    duplicates = np.count_nonzero((np.diff(samples["x"]) == 0) & (np.diff(samples["y"]) == 0))
+    return len(samples), duplicates, np.sqrt(np.mean(np.sum((got - truth) ** 2, axis=1)))
+
+
+def main():
+    rnd = random.Random(0)
+    touch_events = events(rnd)
+    print("%d s, touch events at %d Hz, frames at %d fps, resampled to %d Hz" %
+          (SECONDS, TOUCH_RATE, FRAME_RATE, RESAMPLE_RATE))
+    print("%-12s %10s %12s %16s %14s" % ("capture", "samples", "duplicates", "RMS pos. error", "CPU ms"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ["poll", "poll 1 kHz", "events"]:
+            path = os.path.join(tmp, "session.tmot")
+            if name == "events":
+                cpu = capture_events(path, touch_events)
+            else:
+                cpu = capture_poll(path, touch_events, rnd, rate=1000 if name == "poll 1 kHz" else FRAME_RATE)
+            n, duplicates, rms = error(path)
+            print("%-12s %10d %12d %16.5f %14.1f" % (name, n, duplicates, rms, cpu * 1e3))
+        check_export(os.path.join(tmp, "Circles_1.tmot"), touch_events)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Cost per sample, on the sampling thread, of recording a motion session: csv.writer.writerow (as before) against
+MotionRecorder.sample, the size of the files, and the time to export the motion file to csv.
+The exported csv is read back with Analyzer.extract_data, to check it matches the csv written directly, and the motion
+files (of the default ring, and of a ring of 2 small blocks, which the flushing thread falls behind of) are read back,
+to check they hold every sample.
+Run from the Tapper directory:
+    python -m Benchmarks.MotionRecorderBenchmark
+"""
+import math
+import os
+import tempfile
+import time
+from csv import writer
+
+import numpy as np
+
+from util import FREE_MOTION, CSV_COLS_PER_TASK
+from MotionRecorder import MotionRecorder, export_csv, read_motion, EXTENSION
+from Analyzer import extract_data
+
+SECONDS = 120
+RATE = 1000         # samples per sec.
+SUBJECT = "s01_bench_0"
+
+
+def session():
+    """A finger drawing circles, lifted for a while every 10 sec."""
+    for i in range(SECONDS * RATE):
+        t = i / RATE
+        if t % 10 > 9:
+            yield -1, -1, -1, t * 1000
+        else:
+            yield int(t // 10) + 1, 0.5 + 0.3 * math.cos(t * 3), 0.5 + 0.3 * math.sin(t * 3), t * 1000
+
+
+def with_csv(path, samples):
+    start = time.perf_counter()
+    with open(path, "w+", newline="") as f:
+        w = writer(f)
+        w.writerow(CSV_COLS_PER_TASK[FREE_MOTION])
+        for tap, x, y, t in samples:
+            w.writerow([SUBJECT, tap, x, y, t])
+        elapsed = time.perf_counter() - start
+        w.writerow([])
+        w.writerow([])
+        w.writerow(['Time elapsed (in seconds): ', SECONDS])
+        w.writerow(['Subject perception (in seconds): ', SECONDS])
+    return elapsed
+
+
+def with_recorder(path, samples, **ring):
+    recorder = MotionRecorder(path, SUBJECT, FREE_MOTION, **ring)
+    start = time.perf_counter()
+    for sample in samples:
+        recorder.sample(*sample)
+    elapsed = time.perf_counter() - start
+    recorder.close(SECONDS, str(SECONDS))
+    return elapsed
+
+
+def check_lossless(path, samples):
+    """The motion file holds every sample, in order, whether or not the ring had to grow"""
+    header, recorded = read_motion(path)
+    expected = np.array(samples, dtype=recorded.dtype)
+    assert header["n_samples"] == len(samples) and len(recorded) == len(samples), \
+        "%s holds %d of the %d samples" % (path, len(recorded), len(samples))
+    assert np.array_equal(recorded, expected), "%s does not hold the samples as they were taken" % path
+
+
+def main():
+    samples = list(session())
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "Motion_1.csv")
+        bin_path = os.path.join(tmp, "Motion_2" + EXTENSION)
+        csv_time = with_csv(csv_path, samples)
+        bin_time = with_recorder(bin_path, samples)
+        check_lossless(bin_path, samples)
+        small_path = os.path.join(tmp, "Motion_3" + EXTENSION)
+        with_recorder(small_path, samples, block=16, blocks=2)
+        check_lossless(small_path, samples)
+        print("Every sample recorded, by the default ring and by a ring of 2 blocks of 16 samples")
+        start = time.perf_counter()
+        exported = export_csv(bin_path)
+        export_time = time.perf_counter() - start
+
+        print("%d s at %d Hz: %d samples" % (SECONDS, RATE, len(samples)))
+        print("%-22s %14s %12s" % ("", "us per sample", "file KB"))
+        print("%-22s %14.2f %12.0f" % ("csv.writerow", csv_time / len(samples) * 1e6, os.path.getsize(csv_path) / 1024))
+        print("%-22s %14.2f %12.0f" % ("MotionRecorder", bin_time / len(samples) * 1e6,
+                                       os.path.getsize(bin_path) / 1024))
+        print("export to csv: %.3f s" % export_time)
+
+        # extract_data parses the file name out of a windows path, so the files are given by name
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            direct, roundtrip = extract_data(os.path.basename(csv_path)), extract_data(os.path.basename(exported))
+        finally:
+            os.chdir(cwd)
+        diff = np.abs(direct["data"].to_numpy(dtype=float) - roundtrip["data"].to_numpy(dtype=float)).max()
+        print("extract_data of the exported csv: %d samples, max difference from the direct csv %.2g" %
+              (roundtrip["n_samples"], diff))
+
+
+if __name__ == '__main__':
+    main()
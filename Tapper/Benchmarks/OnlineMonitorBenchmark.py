@@ -0,0 +1,61 @@
+"""Markers per second consumed by OnlineMonitor.TapperMonitor from the "Tapper markers" stream of TaskOutlets, over the
+local network (both ends in this process): SESSIONS Tapper sessions of TAPS taps each, of a subject whose name holds
+spaces, with a perception which holds spaces too.
+Also checks that every session is parsed whole: its subject, its name, its taps, its inter-tap intervals & its
+perception.
+Run from the Tapper directory:
+    python -m Benchmarks.OnlineMonitorBenchmark
+"""
+import time
+
+import numpy as np
+from pylsl import local_clock
+
+from OnlineMonitor import TapperMonitor
+from TaskOutlets import TaskOutlets, parse_marker
+
+SUBJECT = "first last_0"
+PERCEPTION = "about 30 sec."
+SESSIONS = 20
+TAPS = 500
+ITI = 0.5                   # sec., between the time stamps of the taps
+TIMEOUT = 10                # sec., to receive all the markers
+
+
+def push_sessions(outlets, t0):
+    t = t0
+    for k in range(SESSIONS):
+        session = "Tapper_%d" % (k + 1)
+        outlets.marker(session, "start", t)
+        for tap in range(1, TAPS + 1):
+            t += ITI
+            outlets.marker(session, "tap %d" % tap, t)
+        outlets.marker(session, "perception %s" % PERCEPTION, t)
+        outlets.marker(session, "end", t)
+
+
+def main():
+    assert parse_marker("%s|Tapper_1|perception %s" % (SUBJECT, PERCEPTION)) == \
+        (SUBJECT, "Tapper_1", "perception %s" % PERCEPTION)
+    outlets = TaskOutlets([SUBJECT])
+    monitor = TapperMonitor(timeout=5)
+    time.sleep(0.5)         # until the inlets are connected
+    start = time.perf_counter()
+    push_sessions(outlets, local_clock())
+    sessions = monitor.sessions
+    while time.perf_counter() - start < TIMEOUT and \
+            not (len(sessions) == SESSIONS and sessions[-1].perception is not None):
+        monitor.poll()
+    elapsed = time.perf_counter() - start
+
+    assert [s.name for s in sessions] == ["Tapper_%d" % (k + 1) for k in range(SESSIONS)], sessions
+    for session in sessions:
+        assert session.taps == TAPS and session.perception == PERCEPTION, session.summary()
+        assert np.isclose(session.rhythm.iti.mean, ITI * 1000) and session.rhythm.iti.n == TAPS - 1, session.summary()
+    print("Same %d sessions of %d taps, of subject '%s' and perception '%s'" % (SESSIONS, TAPS, SUBJECT, PERCEPTION))
+    markers = SESSIONS * (TAPS + 3)
+    print("%d markers in %.2fs: %.0f markers/s" % (markers, elapsed, markers / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Figures per second of the headless rendering of the figure of a trial (analyze_velocity_peaks of a single file) to
+PNG, on the motion files of the Data directory (analyses loaded from the cache, to measure the rendering only):
+- new: a new figure per trial, with a vertical line per peak, as analyze_velocity_peaks did before ReportRenderer.py
+- reused: the single figure of ReportRenderer.TrialFigure, with a collection of lines per kind of peaks
+- farm: ReportRenderer.render_reports on a pool of WORKERS processes (reused figures), to PNG and to PNG & PDF bundles
+Also checks that new & reused render the very same pixels.
+Run from the Tapper directory:
+    python -m Benchmarks.ReportRendererBenchmark
+"""
+import io
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+import Analyzer
+from BatchAnalysis import discover
+from ReportRenderer import TrialFigure, render_reports
+
+WORKERS = os.cpu_count()
+ROUNDS = 2                  # over all the files
+
+
+def plot_peaks_lines(data, ax):
+    """plot_peaks, as it was before the collections of lines"""
+    ax.set_yticks([])
+    ax.set_xticks([])
+    ax.set(ylabel="vel.")
+    ax.plot(data['vel'], alpha=1)
+    for x in data['high_peaks']:
+        ax.axvline(x, color='red', linestyle='--', linewidth=0.8)
+    for x in data['not_high_peaks']:
+        ax.axvline(x, color='Orange', linestyle='--', linewidth=0.8)
+    ax.scatter(data['not_high_peaks'], data['vel'][data['not_high_peaks']], marker="^", color='Orange', zorder=2,
+               linewidth=0.3, edgecolors='black', s=20)
+    ax.scatter(data['high_peaks'], data['vel'][data['high_peaks']], marker='o', color='red', zorder=2, linewidth=0.3,
+               edgecolors='black', s=20)
+
+
+def render_new(path, out):
+    """The figure of analyze_velocity_peaks([path]), without plt.show"""
+    fig, axs = plt.subplots(4, 2, figsize=(16, 9), dpi=100)
+    for ax, title in zip(axs[:, 0], ["Velocity:", "Smooth:", "Peaks:", "Intervals hist.:"]):
+        Analyzer.init_axis(ax, title)
+    data = Analyzer.load_analysis(path)
+    axs[0][0].set_title("SUBJECT: %s, TASK: %s, SCREEN SIZE: %s" % (data['name'], data['session'],
+                                                                    data['screen_type']))
+    Analyzer.plot_velocity_vector(data, axs[0][0])
+    Analyzer.plot_smooth_vec(data, axs[:, 0])
+    plot_peaks_lines(data, axs[2][0])
+    Analyzer.plot_interval_hist(data, axs[3][0])
+    gs = axs[1, 0].get_gridspec()
+    for ax in axs[0:, -1]:
+        ax.remove()
+    Analyzer.plot_peaks_map(data, fig.add_subplot(gs[0:, -1]))
+    fig.savefig(out, format="png")
+    plt.close(fig)
+
+
+def render_reused(figure, path, out):
+    figure.draw(path)
+    figure.fig.savefig(out, format="png")
+
+
+def pixels(render, *args):
+    buf = io.BytesIO()
+    render(*args, buf)
+    buf.seek(0)
+    return plt.imread(buf)
+
+
+def motion_files():
+    res = []
+    for path in discover():
+        try:
+            if len(Analyzer.load_analysis(path).get('intervals', [])):      # also fills the cache
+                res.append(path)
+        except Exception:
+            continue        # the broken files of the Data directory
+    return res
+
+
+def measure(fn, paths):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for path in paths:
+            fn(path)
+    return ROUNDS * len(paths) / (time.perf_counter() - start)
+
+
+def main():
+    paths = motion_files()
+    figure = TrialFigure()
+    different = [path for path in paths
+                 if not np.array_equal(pixels(render_new, path), pixels(render_reused, figure, path))]
+    assert not different, different
+    print("Same pixels of the figures of %d motion files of the Data directory" % len(paths))
+
+    new = measure(lambda path: render_new(path, io.BytesIO()), paths)
+    reused = measure(lambda path: render_reused(figure, path, io.BytesIO()), paths)
+    farm = {}
+    for formats in [["png"], ["png", "pdf"]]:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                render_reports(paths, tmp, WORKERS, formats)
+            farm[" & ".join(formats)] = ROUNDS * len(paths) / (time.perf_counter() - start)
+    print("%-40s %10s %8s" % ("rendering", "figures/s", "x"))
+    print("%-40s %10.2f %8.1f" % ("new figure per trial (png)", new, 1))
+    print("%-40s %10.2f %8.1f" % ("reused figure (png)", reused, reused / new))
+    for formats, rate in farm.items():
+        print("%-40s %10.2f %8.1f" % ("farm of %d processes (%s)" % (WORKERS, formats), rate, rate / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Welch's PSD of the velocity of many trials: scipy.signal.welch called trial by trial against SpectrumEngine.welch of
+Spectrum.py (the segments of all the trials stacked for a single FFT), on synthetic velocities of trials of 30 s to 3 min
+(resampled at Spectrum.SPECTRUM_RATE), for batches of increasing size.
+Also checks that both compute the same PSDs, on those and on the velocity of every motion file of the Data directory.
+Run from the Tapper directory:
+    python -m Benchmarks.SpectrumBenchmark
+"""
+import time
+
+import numpy as np
+from scipy import signal
+
+import Analyzer
+import Spectrum
+from BatchAnalysis import discover
+from Spectrum import SpectrumEngine, uniform_velocity
+
+BATCHES = [10, 100, 1000]       # trials
+REPEAT = 3
+
+
+def velocity(rate, rnd):
+    """The speed of a circle drawn at a drifting pace, with noise"""
+    t = np.arange(int(rnd.uniform(30, 180) * rate)) / rate
+    pace = rnd.uniform(0.5, 3)
+    return 1 + 0.5 * np.sin(2 * np.pi * pace * t * (1 + 0.05 * np.sin(t / 10))) + rnd.normal(0, 0.2, len(t))
+
+
+def welch_loop(engine, signals):
+    return np.array([signal.welch(x, fs=engine.rate, nperseg=engine.nperseg, noverlap=engine.nperseg - engine.step,
+                                  nfft=engine.nfft)[1] for x in signals])
+
+
+def check(engine, rnd):
+    signals = []
+    for path in discover():
+        try:
+            data = Analyzer.load_analysis(path, use_cache=False)
+        except Exception:
+            continue        # the broken files of the Data directory
+        signals.append(uniform_velocity(np.asarray(data['vel']), data['data']['time_stamp (in ms.)'].to_numpy()))
+    n_files = len(signals)
+    signals = [x for x in signals if len(x) >= engine.nperseg]      # welch shortens the segments of the others
+    signals += [velocity(engine.rate, rnd) for _ in range(100)]
+    expected = welch_loop(engine, signals)
+    assert np.allclose(engine.welch(signals), expected, rtol=1e-9, atol=1e-12 * expected.max())
+    return n_files, len(signals)
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    rnd = np.random.default_rng(0)
+    engine = SpectrumEngine()
+    print("FFT: %s, segments of %d samples zero-padded to %d" % ("pyFFTW" if Spectrum.HAS_FFTW else "numpy",
+                                                                 engine.nperseg, engine.nfft))
+    n_files, n_cases = check(engine, rnd)
+    print("Same PSDs on %d trials (%d motion files of the Data directory)" % (n_cases, n_files))
+    print("%-8s %10s %14s %12s %8s" % ("trials", "samples", "per trial ms", "batched ms", "x"))
+    for n in BATCHES:
+        signals = [velocity(engine.rate, rnd) for _ in range(n)]
+        loop = measure(welch_loop, engine, signals)
+        batched = measure(engine.welch, signals)
+        print("%-8d %10d %14.1f %12.1f %8.1f" % (n, sum(map(len, signals)), loop * 1e3, batched * 1e3,
+                                                 loop / batched))
+
+
+if __name__ == '__main__':
+    main()
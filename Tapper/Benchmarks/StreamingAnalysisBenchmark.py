@@ -0,0 +1,108 @@
+"""Time and peak memory of the velocity peaks analysis of a long motion recording: the whole-array analysis of
+Analyzer.py (extract_data + analyze_motion) against StreamingAnalysis.py (both passes), on synthetic Circles recordings
+of 10 min, 1 h and 3 h (80 Hz, as the app samples, with lifts of the finger). The peak memory is the peak RSS of a fresh
+process for each analysis.
+Also checks that both find the very same intervals, on those and on every motion file of the Data directory, with
+chunks of several sizes.
+Run from the Tapper directory:
+    python -m Benchmarks.StreamingAnalysisBenchmark
+"""
+import csv
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+import Analyzer
+from BatchAnalysis import discover
+from StreamingAnalysis import stream_intervals
+from util import CSV_COLS_PER_TASK, CIRCLES
+
+RATE = 80                       # samples per sec.
+DURATIONS = [600, 3600, 10800]  # sec.
+CHUNKS = [50, 1000, 10000]      # rows, for the check of the Data directory
+
+
+def write_recording(path, seconds, rnd):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(CSV_COLS_PER_TASK[CIRCLES])
+        t, phase, tap, lifted = 0.0, 0.0, 1, 0
+        for _ in range(seconds * RATE):
+            dt = 1000 / RATE * rnd.uniform(0.8, 1.2)
+            t += dt
+            phase += dt / 1000 * 2 * np.pi / 0.7 * (1 + 0.3 * np.sin(t / 2000))
+            if lifted == 0 and rnd.random() < 0.002:
+                lifted, tap = rnd.integers(5, 40), tap + 1
+            if lifted:
+                lifted -= 1
+                w.writerow(["s01_bench_0", -1, -1, -1, t])
+            else:
+                w.writerow(["s01_bench_0", tap, 0.5 + 0.3 * np.cos(phase) + rnd.normal(0, 0.002),
+                            0.5 + 0.3 * np.sin(phase) + rnd.normal(0, 0.002), t])
+        w.writerow([])
+        w.writerow([])
+        w.writerow(['Time elapsed (in seconds): ', seconds])
+        w.writerow(['Subject perception (in seconds): ', seconds])
+
+
+def whole(path):
+    return np.asarray(Analyzer.analyze_motion(Analyzer.extract_data(path))['intervals'], dtype=np.float64)
+
+
+def streaming(path, chunk_rows=None):
+    chunks = list(stream_intervals(path) if chunk_rows is None else stream_intervals(path, chunk_rows))
+    return np.concatenate(chunks) if chunks else np.zeros(0)
+
+
+def run(fn, path, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    intervals = fn(path)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024, intervals))
+
+
+def measure(fn, path):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(fn, path, queue))
+    process.start()
+    res = queue.get()
+    process.join()
+    return res
+
+
+def check():
+    n = 0
+    for path in discover():
+        try:
+            expected = whole(path)
+        except Exception:
+            continue        # the broken files of the Data directory
+        for chunk_rows in CHUNKS:
+            assert np.array_equal(streaming(path, chunk_rows), expected), (path, chunk_rows)
+        n += 1
+    return n
+
+
+def main():
+    print("Same intervals on the %d motion files of the Data directory, with chunks of %s rows" % (check(), CHUNKS))
+    print("%-10s %10s %10s %10s %8s %14s %8s" % ("recording", "samples", "intervals", "analysis", "s", "peak RSS MB",
+                                                "same"))
+    rnd = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in DURATIONS:
+            path = os.path.join(tmp, "Circles_1.csv")
+            write_recording(path, seconds, rnd)
+            results = [(name, measure(fn, path)) for name, fn in [("whole", whole), ("streaming", streaming)]]
+            same = np.array_equal(results[0][1][2], results[1][1][2])
+            for name, (elapsed, rss, intervals) in results:
+                print("%-10s %10d %10d %10s %8.2f %14.1f %8s" % ("%d s" % seconds, seconds * RATE, len(intervals),
+                                                                name, elapsed, rss / 2 ** 20, same))
+
+
+if __name__ == '__main__':
+    main()
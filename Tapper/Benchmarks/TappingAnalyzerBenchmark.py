@@ -0,0 +1,84 @@
+"""Batch analysis of archived Tapper sessions: the pandas way of Analyzer.py (read_csv of the whole file, then the
+inter-tap intervals with numpy) against OnlineAnalysis (a plain reader, then the TappingAnalyzer fed one tap at a
+time). The Tapper_<n>.csv files of the Data directory are copied until there are FILES of them.
+Also checks that the running statistics match numpy's, and reports the cost per tap of the analyzer.
+Run from the Tapper directory:
+    python -m Benchmarks.TappingAnalyzerBenchmark
+"""
+import os
+import shutil
+import tempfile
+import time
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+from OnlineAnalysis import TappingAnalyzer, analyze_tapper_tree, read_tapper_csv
+
+DATA = "Data"
+FILES = 2000
+TIME_COLUMN = "natRhythmTap (in ms.)"
+
+
+def replicate(tmp):
+    sources = sorted(glob(os.path.join(DATA, "*", "Tapper_*.csv")))
+    for i in range(FILES):
+        subject = os.path.join(tmp, "s%04d_bench_0" % (i // 2))
+        os.makedirs(subject, exist_ok=True)
+        shutil.copy(sources[i % len(sources)], os.path.join(subject, "Tapper_%d.csv" % (i % 2 + 1)))
+    return sorted(glob(os.path.join(tmp, "*", "Tapper_*.csv")))
+
+
+def with_pandas(paths):
+    res = []
+    for path in paths:
+        data = pd.read_csv(path, usecols=["subject", "tapNum", TIME_COLUMN])
+        iti = np.diff(data[TIME_COLUMN][:-2].to_numpy(dtype=np.float64))
+        res.append((iti.mean(), iti.std()))
+    return res
+
+
+def check(paths):
+    """The largest relative difference between the running statistics and numpy's"""
+    worst = 0.0
+    for path in paths:
+        times = read_tapper_csv(path)["times"]
+        analyzer = TappingAnalyzer().consume(times.tolist())
+        iti = np.diff(times)
+        slope = np.polyfit(np.arange(1, len(iti) + 1), iti, 1)[0]
+        for got, expected in [(analyzer.iti.mean, iti.mean()), (analyzer.iti.std(), iti.std()),
+                              (analyzer.drift(), slope)]:
+            worst = max(worst, abs(got - expected) / max(abs(expected), 1e-6))
+    return worst
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = replicate(tmp)
+        taps = sum(len(read_tapper_csv(path)["times"]) for path in paths[:14]) * len(paths) / 14
+        print("%d files, ~%d taps" % (len(paths), taps))
+        print("max. relative difference from numpy (mean, std, drift): %.2e" % check(paths[:14]))
+
+        start = time.perf_counter()
+        with_pandas(paths)
+        pandas_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyze_tapper_tree(tmp)
+        online_time = time.perf_counter() - start
+
+        times = [read_tapper_csv(path)["times"].tolist() for path in paths]
+        start = time.perf_counter()
+        for t in times:
+            TappingAnalyzer().consume(t)
+        analyzer_time = time.perf_counter() - start
+
+    print("%-36s %10s %12s" % ("", "total s", "ms per file"))
+    print("%-36s %10.2f %12.3f" % ("pandas read_csv + numpy (ITI only)", pandas_time, pandas_time / FILES * 1e3))
+    print("%-36s %10.2f %12.3f" % ("OnlineAnalysis (all the statistics)", online_time, online_time / FILES * 1e3))
+    print("TappingAnalyzer alone: %.2f us per tap" % (analyzer_time / taps * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Parse time and peak memory of extract_data: the former way (read_csv of the whole file, the footer read through
+iloc, then slicing, reset_index & drop) against the loader of TaskCsv.py, on synthetic Circles recordings of 60 s and
+of 10 min (80 Hz, as the app samples), written the way Task writes them.
+The peak memory is measured by tracemalloc (python & numpy allocations) and by the peak RSS of a fresh process (which
+also counts the buffers of the C tokenizer).
+Also checks that both give the same data on every motion file of the Data directory, and on a recording whose subject
+left the perception empty (the app writes 'N/A'), of which both also give the same footer, the perception as nan.
+Run from the Tapper directory:
+    python -m Benchmarks.TaskCsvBenchmark
+"""
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import Analyzer
+from util import CSV_COLS_PER_TASK, CIRCLES
+from BatchAnalysis import discover
+from StreamingAnalysis import trial_chunks
+from TaskCsv import count_rows
+
+RATE = 80               # samples per sec.
+DURATIONS = [60, 600]   # sec.
+REPEAT = 10
+
+
+def extract_data_read_csv(path):
+    """extract_data, as it was before TaskCsv.py"""
+    data = pd.read_csv(path, usecols=CSV_COLS_PER_TASK[CIRCLES])
+    time_length = data.iloc[-2]["tapNum"]
+    data = data.iloc[int(Analyzer.TRIM_SEC * len(data) / time_length):].reset_index()
+    data['time_stamp (in ms.)'] = data['time_stamp (in ms.)'] - data['time_stamp (in ms.)'][0]
+    return data.drop(['subject', 'index'], axis=1)[:-2]
+
+
+def extract_data_task_csv(path):
+    return Analyzer.extract_data(path)['data']
+
+
+def write_recording(path, seconds, rnd, perception=None):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(CSV_COLS_PER_TASK[CIRCLES])
+        t, tap = 0.0, 1
+        for i in range(seconds * RATE):
+            t += 1000 / RATE * rnd.uniform(0.8, 1.2)
+            if rnd.random() < 0.02:
+                tap += 1
+                w.writerow(["s01_bench_0", -1, -1, -1, t])
+            else:
+                w.writerow(["s01_bench_0", tap, rnd.random(), rnd.random(), t])
+        w.writerow([])
+        w.writerow([])
+        w.writerow(['Time elapsed (in seconds): ', seconds])
+        w.writerow(['Subject perception (in seconds): ', seconds - 5 if perception is None else perception])
+
+
+def peak_rss(fn, path, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fn(path)
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+
+
+def measure(fn, path):
+    fn(path)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(path)
+    elapsed = (time.perf_counter() - start) / REPEAT
+
+    tracemalloc.start()
+    fn(path)
+    traced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=peak_rss, args=(fn, path, queue))
+    process.start()
+    rss = queue.get()
+    process.join()
+    return elapsed, traced, rss * 1024
+
+
+def same_data(got, expected, path):
+    assert list(got.columns) == list(expected.columns), path
+    for col in got.columns:
+        assert np.array_equal(got[col].to_numpy(), expected[col].to_numpy()), (path, col)
+
+
+def check():
+    n = 0
+    for path in discover():
+        try:
+            expected = extract_data_read_csv(path)
+        except Exception:
+            continue        # the broken files of the Data directory
+        same_data(extract_data_task_csv(path), expected, path)
+        n += 1
+    return n
+
+
+def check_no_perception(tmp, seconds=3):
+    """A recording of a subject who left the perception empty, as Main.py writes it: 'N/A'"""
+    path = os.path.join(tmp, "Circles_1.csv")
+    write_recording(path, seconds, random.Random(0), perception="N/A")
+    expected = pd.read_csv(path, usecols=CSV_COLS_PER_TASK[CIRCLES])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        got = Analyzer.extract_data(path)
+        rows = count_rows(path)
+        chunks = sum(len(chunk[0]) for chunk in trial_chunks(path))
+    assert got["time_length"] == expected.iloc[-2]["tapNum"] - Analyzer.TRIM_SEC, got["time_length"]
+    assert np.isnan(got["time_prespective"]) and np.isnan(expected.iloc[-1]["tapNum"]), got["time_prespective"]
+    same_data(got["data"], extract_data_read_csv(path), path)
+    assert rows == len(expected) - 2 and chunks == got["n_samples"], (rows, chunks)
+    print("Same data & footer of a recording with the perception 'N/A': time elapsed %g s, perception %g" %
+          (got["time_length"] + Analyzer.TRIM_SEC, got["time_prespective"]))
+
+
+def main():
+    print("Same data on the %d motion files of the Data directory" % check())
+    with tempfile.TemporaryDirectory() as tmp:
+        check_no_perception(tmp)
+    print("%-10s %-12s %10s %16s %14s" % ("recording", "loader", "ms", "tracemalloc MB", "peak RSS MB"))
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in DURATIONS:
+            path = os.path.join(tmp, "Circles_1.csv")
+            write_recording(path, seconds, rnd)
+            for name, fn in [("read_csv", extract_data_read_csv), ("TaskCsv", extract_data_task_csv)]:
+                elapsed, traced, rss = measure(fn, path)
+                print("%-10s %-12s %10.2f %16.2f %14.2f" %
+                      ("%d s" % seconds, name, elapsed * 1e3, traced / 2 ** 20, rss / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Frames per second of the export of the animation of a motion trial to video: the former update of
+animate_free_movement (growing lists of the points, sliced for the tail) with the whole figure drawn & grabbed for
+every frame, as FuncAnimation.save does, against VideoExport.py (a ring buffer for the tail, precomputed colors, the
+tail blitted over the static figure and the raw frames piped to an encoder process). The encoder is a sink process
+(cat > /dev/null) here, to measure the frames only.
+On the trials of the Data directory, and on a synthetic Circles trial of 10 min (80 Hz), with and without decimation,
+as the speed relative to real time of the trial (the former export is timed on its first BASELINE_FRAMES frames).
+Also checks that both draw the very same frames.
+Run from the Tapper directory:
+    python -m Benchmarks.VideoExportBenchmark
+"""
+import io
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+import Analyzer
+from VideoExport import DPI, FIG_SIZE, export_video, frame_step, render_frames
+
+RATE = 80                   # samples per sec., of the synthetic trial
+LONG_SEC = 600
+BASELINE_FRAMES = 300       # frames of the former export which are timed
+CHECKED_FRAMES = [0, 1, 50, 89, 90, 91, 299]
+SINK = lambda path, width, height, fps: ["sh", "-c", "cat > /dev/null"]
+
+
+def frames_lists(data, n_frames):
+    """The frames of the former animate_free_movement, drawn whole and grabbed as FuncAnimation.save does"""
+    points = data['npdata'][1:]
+    cmap = Analyzer.velocity_colors(Analyzer.normalize_arr(data['vel']))
+    fig, ax = plt.subplots(figsize=FIG_SIZE, dpi=DPI)
+    ax.set_title("subject: %s, %s session number %d" % (data['name'], data['session'], int(data['trial']) + 1))
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+    ln, = ax.plot([], [], 'o')
+    xdata, ydata = [], []
+    try:
+        for i, point in enumerate(points[:n_frames]):
+            xdata.append(point[0])
+            ydata.append(point[1])
+            ln.set_data(xdata[-Analyzer.ANIMATION_TAIL:], ydata[-Analyzer.ANIMATION_TAIL:])
+            ln.set_color(cmap[i])
+            buf = io.BytesIO()
+            fig.savefig(buf, format="rgba", dpi=DPI)
+            yield buf.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def synthetic_trial(seconds, rnd):
+    t = np.arange(seconds * RATE) / RATE
+    phase = 2 * np.pi * np.cumsum(1 / 0.7 * (1 + 0.3 * np.sin(t / 2))) / RATE
+    npdata = np.array([0.5 + 0.3 * np.cos(phase), 0.5 + 0.3 * np.sin(phase)]).T + rnd.normal(0, 0.002, (len(t), 2))
+    vel = np.linalg.norm(np.diff(npdata, axis=0), axis=1) * RATE
+    return {'name': 'bench', 'session': Analyzer.CIRCLES, 'trial': '0', 'n_samples': len(t), 'time_length': seconds,
+            'npdata': npdata, 'vel': vel}
+
+
+def check(data):
+    blitted = render_frames(data, 1)
+    next(blitted)
+    expected = dict((i, frame) for i, frame in enumerate(frames_lists(data, max(CHECKED_FRAMES) + 1))
+                    if i in CHECKED_FRAMES)
+    for i, frame in enumerate(blitted):
+        if i in expected:
+            assert bytes(frame) == expected[i], i
+        if i == max(CHECKED_FRAMES):
+            blitted.close()
+            break
+
+
+def baseline_fps(data):
+    start = time.perf_counter()
+    n = sum(1 for _ in frames_lists(data, BASELINE_FRAMES))
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    rnd = np.random.default_rng(0)
+    trials = [("Data/s01_hg_0/Circles_1.csv", Analyzer.load_analysis("Data/s01_hg_0/Circles_1.csv")),
+              ("Data/s02_lg_0/Motion_1.csv", Analyzer.load_analysis("Data/s02_lg_0/Motion_1.csv")),
+              ("synthetic %d s" % LONG_SEC, synthetic_trial(LONG_SEC, rnd))]
+    for _, data in trials:
+        check(data)
+    print("Same frames (%s) of the former & the blitted export, on %d trials" % (CHECKED_FRAMES, len(trials)))
+    print("%-30s %8s %12s %8s %10s %10s %12s" % ("trial", "samples", "export", "frames", "fps", "s",
+                                                 "x real time"))
+    for name, data in trials:
+        duration = float(data['time_length'])
+        fps = baseline_fps(data)
+        n = len(data['npdata']) - 1
+        print("%-30s %8d %12s %8d %10.1f %10.1f %12.2f" % (name, n, "former", n, fps, n / fps, duration * fps / n))
+        for decimate in [1, frame_step(data)]:
+            start = time.perf_counter()
+            frames, _ = export_video(data, None, decimate=decimate, command=SINK)
+            elapsed = time.perf_counter() - start
+            print("%-30s %8d %12s %8d %10.1f %10.1f %12.2f" % (name, n, "decimate %d" % decimate, frames,
+                                                               frames / elapsed, elapsed, duration / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,6 @@ from csv import writer
 from re import compile
 from os import rmdir, listdir, mkdir, getcwd, chmod
 from os.path import isdir
-from time import time
 from kivy.app import App
 from kivy.clock import Clock, ClockEvent
 from kivy.uix.screenmanager import ScreenManager, Screen
@@ -15,9 +14,35 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.widget import Widget
 from kivy.uix.gridlayout import GridLayout
 from util import *
+from MotionRecorder import MotionRecorder, export_csv, EXTENSION
+from TaskClock import TaskClock
+from TaskOutlets import TaskOutlets
 
 TIMER = [0]
 
+# Record the Motion & Circles tasks into compact binary motion files (see MotionRecorder.py) instead of csv.
+# Off by default: the sessions are written as the legacy csv, polled every 1 ms. Set to True to record .tmot files
+# (which are exported to csv afterwards with EXPORT_MOTION_CSV, or by: python MotionRecorder.py Data/<subject>/*.tmot)
+BINARY_MOTION = False
+# Export every binary motion file to the csv layout when its session ends, as the analysis expects (requires
+# BINARY_MOTION). Off by default, set to True along with BINARY_MOTION
+EXPORT_MOTION_CSV = False
+# Capture a sample per touch event of the Motion & Circles tasks, stamped with the event's own time, instead of
+# polling the touch every 1 ms (requires BINARY_MOTION, unless WRITE_FILES is off).
+# Off by default, so the data in Data/ stays as the legacy sessions. Set to True along with BINARY_MOTION (and
+# EXPORT_MOTION_CSV, for the csv of every session, resampled to MOTION_RESAMPLE_RATE)
+EVENT_MOTION = False
+# The csv of an event captured session is resampled to this rate, in samples per sec. (None for the events as is).
+# The parameters of Analyzer.py are counted in samples, and were tuned on sessions polled by the Clock (81.7 Hz, the
+# median over Data)
+MOTION_RESAMPLE_RATE = 82
+# Time the tasks with the clock of LSL (local_clock) instead of perf_counter. Both are monotonic & high resolution
+LSL_CLOCK = False
+# Publish the taps & the motion samples as LSL streams (see TaskOutlets.py), i.e. to be recorded by LabRecorder
+PUBLISH_TO_LSL = False
+# Write the sessions into files in Data/<subject>. Turn off to only stream them to LSL (requires PUBLISH_TO_LSL)
+WRITE_FILES = True
+
 # python list are accessible to use and change at any time
 # that is why some of the variable are as lists
 # these to be change in the WelcomeScreen and used in Recorders objects, which write the files
@@ -156,6 +181,9 @@ class Task(Widget):
     """An abstract object which represents a single task,
     i.e TapperTask, MotionTask etc..."""
 
+    clock = TaskClock(lsl=LSL_CLOCK)
+    outlets = None          # TaskOutlets, when publishing to LSL
+
     def __init__(self, dir, **kwargs):
         """
         :param dir: <List> contains a single String represents the name of the
@@ -165,22 +193,44 @@ class Task(Widget):
         super().__init__(**kwargs)
         self.dir = dir        # this is a list in length 1
 
+    def _path(self, file_name, counter, extension=".csv"):
+        return getcwd() + '\Data\%s\%s%s' % (self.dir[0], file_name + "_" + str(counter), extension)
+
     def _start(self, file_name, counter, first_row):
         self.tapNum = 0
-        path = getcwd() + '\Data\%s\%s.csv' % (self.dir[0], file_name + "_" + str(counter))
-        chmod(getcwd(), 0o777)
-        self.file = open(path, 'w+', newline='')
-        self.writer = writer(self.file)
-        self.writer.writerow(first_row)
-        self.start_t = time()
+        if WRITE_FILES:
+            path = self._path(file_name, counter)
+            chmod(getcwd(), 0o777)
+            self.file = open(path, 'w+', newline='')
+            self.writer = writer(self.file)
+            self.writer.writerow(first_row)
+        else:
+            self.file = self.writer = None
+        self.begin(file_name, counter)
+
+    def begin(self, file_name, counter):
+        """Start the clock of the session"""
+        self.session = "%s_%d" % (file_name, counter)
+        self.start_t = self.clock.now()
+        self.marker("start", self.start_t)
+
+    def marker(self, text, t):
+        """Publish a marker of the session at time t (of self.clock)"""
+        if self.outlets is not None:
+            self.outlets.marker(self.session, text, self.clock.to_lsl(t))
 
     def stop(self):
-        pass
+        self.marker("end", self.clock.now())
+        if self.outlets is not None:
+            self.outlets.flush()
 
     def on_touch_down(self, touch):
         pass
 
     def write_perception(self, real_time, subject_perception):
+        self.marker("perception %s" % subject_perception, self.clock.now())
+        if self.file is None:
+            return
         self.writer.writerow([])
         self.writer.writerow([])
         self.writer.writerow(['Time elapsed (in seconds): ', real_time])
@@ -204,7 +254,10 @@ class TapperTask(Task):
 
     def on_touch_down(self, touch):
         self.tapNum += 1
-        self.writer.writerow([self.dir[0], self.tapNum, (time() - self.start_t) * 1000])
+        t = self.clock.from_wall(touch.time_start)
+        if self.writer is not None:
+            self.writer.writerow([self.dir[0], self.tapNum, (t - self.start_t) * 1000])
+        self.marker("tap %d" % self.tapNum, t)
 
 
 class FreeMotionWrapper(Task):
@@ -225,29 +278,80 @@ class FreeMotionWrapper(Task):
     def start(self):
         self.touch = None
         self.counter += 1
-        super()._start(self.file_name, self.counter, self.first_row)
-        self.event = Clock.schedule_interval(self.write, 0.001)
+        self.events = EVENT_MOTION and (BINARY_MOTION or not WRITE_FILES)
+        if not WRITE_FILES:
+            self.recorder = None
+            super()._start(self.file_name, self.counter, self.first_row)
+        elif BINARY_MOTION:
+            self.tapNum = 0
+            self.begin(self.file_name, self.counter)
+            self.recorder = MotionRecorder(self._path(self.file_name, self.counter, EXTENSION), self.dir[0],
+                                           self.file_name, self.counter, capture="events" if self.events else "poll",
+                                           clock=self.clock.name, start=self.start_t)
+        else:
+            self.recorder = None
+            super()._start(self.file_name, self.counter, self.first_row)
+        self.event = None if self.events else Clock.schedule_interval(self.write, 0.001)
+        self.recording = True
 
     def on_touch_down(self, touch):
         self.tapNum += 1
         self.touch = touch
+        if self.events and self.recording:
+            self.sample(touch, self.clock.from_wall(touch.time_start))
 
     def on_touch_move(self, touch):
         if self.tapNum == 0:
             self.tapNum = 1
             self.touch = touch
+        if self.events and self.recording and touch is self.touch:
+            self.sample(touch, self.clock.from_wall(touch.time_update))
 
     def on_touch_up(self, touch):
         self.touch = None
+        if self.events and self.recording:
+            self.sample(None, self.clock.from_wall(touch.time_end) if touch.time_end > 0 else self.clock.now())
 
     def write(self, *args):
-        if self.touch:
-            self.writer.writerow([self.dir[0], self.tapNum, self.touch.sx, self.touch.sy, (time() - self.start_t) * 1000])
+        """Poll the current touch"""
+        self.sample(self.touch, self.clock.now())
+
+    def sample(self, touch, t):
+        """
+        :param touch: <MotionEvent> or None if there is no touch
+        :param t: <float> time of the sample, in sec. (of self.clock)
+        """
+        if self.outlets is not None:
+            if touch:
+                self.outlets.sample(self.tapNum, touch.sx, touch.sy, self.clock.to_lsl(t))
+            else:
+                self.outlets.sample(-1, -1, -1, self.clock.to_lsl(t))
+        if self.recorder is not None:
+            if touch:
+                self.recorder.sample(self.tapNum, touch.sx, touch.sy, (t - self.start_t) * 1000)
+            else:
+                self.recorder.sample(-1, -1, -1, (t - self.start_t) * 1000)
+        elif self.writer is None:
+            return
+        elif touch:
+            self.writer.writerow([self.dir[0], self.tapNum, touch.sx, touch.sy, (t - self.start_t) * 1000])
         else:
-            self.writer.writerow([self.dir[0], -1, -1, -1, (time() - self.start_t) * 1000])
+            self.writer.writerow([self.dir[0], -1, -1, -1, (t - self.start_t) * 1000])
 
     def stop(self):
-        ClockEvent.cancel(self.event)
+        self.recording = False
+        if self.event is not None:
+            ClockEvent.cancel(self.event)
+        super().stop()
+
+    def write_perception(self, real_time, subject_perception):
+        if self.recorder is None:
+            super().write_perception(real_time, subject_perception)
+            return
+        self.marker("perception %s" % subject_perception, self.clock.now())
+        self.recorder.close(real_time, subject_perception)
+        if EXPORT_MOTION_CSV:
+            export_csv(self.recorder.path, rate=MOTION_RESAMPLE_RATE if self.events else None)
 
 
 class MotionTask(FreeMotionWrapper):
@@ -316,6 +420,8 @@ class TaskScreenWrapper(Screen):
 
 class MyApp(App):
     def build(self):
+        if PUBLISH_TO_LSL:
+            Task.outlets = TaskOutlets(subject)
         sm = ScreenManager()
         sm.add_widget(Screen(name='settings'))
         setting_scr = sm.get_screen('settings')
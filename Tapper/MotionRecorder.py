@@ -0,0 +1,210 @@
+import json
+import struct
+import sys
+import threading
+import numpy as np
+from util import CSV_COLS_PER_TASK
+
+# A motion file is a fixed size header followed by fixed size little-endian samples.
+# The header is a JSON object (subject, task, duration etc.), padded with spaces to HEADER_SIZE, so it can be
+# rewritten in place when the session ends.
+MAGIC = b"TMOT"
+VERSION = 1
+PREFIX = struct.Struct("<4sHI")          # magic, version, length of the JSON
+HEADER_SIZE = 1024
+# tapNum is -1 (and so are x & y) while there is no touch on the screen. time is in ms. since the start of the session
+SAMPLE = np.dtype([("tapNum", "<i4"), ("x", "<f4"), ("y", "<f4"), ("time", "<f8")])
+EXTENSION = ".tmot"
+
+
+class MotionRecorder:
+    """
+    Records the samples of a motion session (Motion & Circles tasks) into a motion file.
+    Samples are written into a preallocated numpy ring of 'blocks' blocks, and every completed block is written to
+    the file by a background thread, so the thread which samples never formats or writes anything.
+    The sampling thread is the only writer of the ring and of 'n', and the flushing thread the only writer of
+    'flushed', so the two never need a lock. If the flushing thread falls behind by the whole ring, the ring is
+    doubled rather than overwrite samples which were not written yet, so no sample is ever lost.
+    """
+
+    def __init__(self, path, subject, task, counter=1, capture="poll", clock=None, start=None, block=1024, blocks=16):
+        """
+        :param path: <String> path of the motion file to create
+        :param subject: <String> the subject's directory name, i.e. 'name_0'
+        :param task: <String> one of FREE_MOTION, CIRCLES
+        :param counter: <int> number of the session of this task
+        :param capture: <String> 'poll' for samples taken on a timer, 'events' for a sample per touch event
+        :param clock: <String> name of the clock the session is timed with (see TaskClock)
+        :param start: <float> time of the start of the session on that clock, in sec.
+        :param block: <int> number of samples written to the file at once
+        :param blocks: <int> number of blocks in the ring
+        """
+        self.path = path
+        self.header = {"subject": subject, "task": task, "counter": counter, "capture": capture,
+                       "clock": clock, "start_time": start, "columns": CSV_COLS_PER_TASK[task],
+                       "duration": None, "perception": None, "n_samples": 0}
+        self.block = block
+        self.ring = np.zeros(block * blocks, dtype=SAMPLE)
+        self.n = 0                  # samples taken
+        self.flushed = 0            # samples written to the file
+        self.grown = 0              # times the ring was doubled
+        self.file = open(path, "wb")
+        self.write_header()
+        self.file.seek(HEADER_SIZE)
+
+        self._block_ready = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="MotionRecorder", daemon=True)
+        self._thread.start()
+
+    def write_header(self):
+        header = json.dumps(self.header).encode()
+        if PREFIX.size + len(header) > HEADER_SIZE:
+            raise ValueError("The header of %s is longer than %d bytes" % (self.path, HEADER_SIZE))
+        self.file.seek(0)
+        self.file.write(PREFIX.pack(MAGIC, VERSION, len(header)) + header.ljust(HEADER_SIZE - PREFIX.size))
+
+    def sample(self, tap_num, x, y, t):
+        """
+        :param tap_num: <int> number of the touch in the session, -1 if there is no touch
+        :param x: <float> x position, -1 if there is no touch
+        :param y: <float> y position, -1 if there is no touch
+        :param t: <float> time since the start of the session, in ms.
+        """
+        n = self.n
+        if n - self.flushed >= len(self.ring):
+            self._grow()
+        self.ring[n % len(self.ring)] = (tap_num, x, y, t)
+        self.n = n + 1
+        if (n + 1) % self.block == 0:
+            self._block_ready.set()
+
+    def _grow(self):
+        """
+        Double the ring, keeping every sample number k at index k % len(ring). The samples which were not written
+        yet are copied before the new ring replaces the old one, and the old one is left untouched, so the flushing
+        thread may go on writing from either
+        """
+        old, size = self.ring, len(self.ring)
+        ring = np.zeros(2 * size, dtype=SAMPLE)
+        k = np.arange(self.flushed, self.n)
+        ring[k % (2 * size)] = old[k % size]
+        self.ring = ring
+        self.grown += 1
+
+    def _run(self):
+        while not self._stop:
+            self._block_ready.wait(0.5)
+            self._block_ready.clear()
+            self._flush(self.n - self.n % self.block)
+
+    def _flush(self, until):
+        """Write the samples up to (not including) sample number 'until' to the file"""
+        while self.flushed < until:
+            ring = self.ring
+            start = self.flushed % len(ring)
+            end = min(len(ring), start + until - self.flushed)
+            self.file.write(ring[start:end].tobytes())
+            self.flushed += end - start
+
+    def close(self, duration=None, perception=None):
+        """
+        Write the rest of the samples, and complete the header
+        :param duration: <float> time elapsed, in sec. (or a String of it, as the tasks' durations are kept)
+        :param perception: <String> the time the subject thinks had passed, in sec.
+        """
+        if self.file.closed:
+            return
+        self._stop = True
+        self._block_ready.set()
+        self._thread.join()
+        self._flush(self.n)
+        self.header.update(duration=None if duration is None else float(duration), perception=perception,
+                           n_samples=self.flushed)
+        self.write_header()
+        self.file.close()
+        if self.grown:
+            print("MotionRecorder: the ring was doubled %d times for %s, to %d samples" %
+                  (self.grown, self.path, len(self.ring)))
+
+
+def read_motion(path):
+    """Read a motion file. Returns its header (as a dictionary) and its samples (a numpy structured array of SAMPLE)"""
+    with open(path, "rb") as f:
+        magic, version, length = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a motion file of version %d" % (path, VERSION))
+        header = json.loads(f.read(length).decode())
+        f.seek(HEADER_SIZE)
+        return header, np.fromfile(f, dtype=SAMPLE)
+
+
+def resample(samples, rate, end=None):
+    """
+    Resample motion samples (i.e. captured per touch event, at irregular times) to a uniform rate.
+    Between two samples of the same touch, the position is interpolated linearly. Anywhere else (before the first
+    sample of a touch, after its last one, and between touches) there is no touch, i.e. tapNum, x & y are -1.
+    :param samples: <np.ndarray> of SAMPLE, ordered by time (in ms. since the start of the session)
+    :param rate: <float> samples per sec.
+    :param end: <float> time of the end of the session, in ms. None for the time of the last sample
+    :return: <np.ndarray> of SAMPLE, every 1000 / rate ms. from the start of the session (time 0), as the rows of a
+             session polled on a timer
+    """
+    times = samples["time"]
+    stop = max(times[-1] if len(samples) else 0.0, 0.0 if end is None else end)
+    grid = np.arange(0.0, stop + 1e-9, 1000 / rate)
+    out = np.empty(len(grid), dtype=SAMPLE)
+    out["time"] = grid
+    if len(samples) == 0:
+        out["tapNum"], out["x"], out["y"] = -1, -1, -1
+        return out
+    taps = samples["tapNum"]
+
+    # the last sample at or before every grid point (none before the first sample), and the one after it
+    prev = np.searchsorted(times, grid, side="right") - 1
+    before = prev < 0
+    prev = np.maximum(prev, 0)
+    nxt = np.minimum(prev + 1, len(samples) - 1)
+    touching = ~before & (taps[prev] != -1) & ((taps[nxt] == taps[prev]) & (nxt > prev) | (times[prev] == grid))
+    span = times[nxt] - times[prev]
+    w = np.divide(grid - times[prev], span, out=np.zeros(len(grid)), where=span > 0)
+    for axis in ("x", "y"):
+        values = samples[axis].astype(np.float64)
+        out[axis] = np.where(touching, values[prev] + w * (values[nxt] - values[prev]), -1)
+    out["tapNum"] = np.where(touching, taps[prev], -1)
+    return out
+
+
+def export_csv(path, csv_path=None, rate=None):
+    """
+    Write a motion file in the csv layout of the Tapper (CSV_COLS_PER_TASK), which Analyzer.py reads
+    :param path: <String> path of the motion file
+    :param csv_path: <String> path of the csv file. Default is the path of the motion file, with a .csv extension
+    :param rate: <float> resample the samples to this rate (samples per sec.) first. None for the samples as they are
+    """
+    header, samples = read_motion(path)
+    if rate is not None:
+        samples = resample(samples, rate, None if header["duration"] is None else header["duration"] * 1000)
+    if csv_path is None:
+        csv_path = path[:-len(EXTENSION)] + ".csv" if path.endswith(EXTENSION) else path + ".csv"
+    subject = header["subject"]
+    rows = ["%s,%d,%.9g,%.9g,%r" % (subject, tap, x, y, t) for tap, x, y, t in samples.tolist()]
+    with open(csv_path, "w", newline="") as f:
+        f.write(",".join(header["columns"]) + "\r\n")
+        f.write("\r\n".join(rows))
+        f.write("\r\n" if rows else "")
+        f.write("\r\n\r\n")
+        f.write("Time elapsed (in seconds): ,%s\r\n" % ("" if header["duration"] is None else header["duration"]))
+        f.write("Subject perception (in seconds): ,%s\r\n" %
+                ("" if header["perception"] is None else header["perception"]))
+    return csv_path
+
+
+if __name__ == "__main__":
+    # Export motion files to csv: python MotionRecorder.py [--rate Hz] Data/name_0/Motion_1.tmot [...]
+    args = sys.argv[1:]
+    rate = None
+    if args[:1] == ["--rate"]:
+        rate, args = float(args[1]), args[2:]
+    for path in args:
+        print("%s -> %s" % (path, export_csv(path, rate=rate)))
@@ -0,0 +1,238 @@
+import sys
+from collections import deque
+from csv import writer
+from glob import glob
+from math import sqrt
+from os.path import join, basename
+from re import match
+import numpy as np
+
+
+class RunningStats:
+    """Running count, mean, variance, min & max of a series, updated in O(1) per value (Welford's algorithm), or per
+    batch of values (merged with Chan's formula)"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def update_batch(self, xs):
+        """:param xs: <np.ndarray> of values"""
+        k = len(xs)
+        if k == 0:
+            return
+        mean = float(np.mean(xs))
+        m2 = float(np.sum((xs - mean) ** 2))
+        n = self.n + k
+        delta = mean - self.mean
+        self.mean += delta * k / n
+        self.m2 += m2 + delta * delta * self.n * k / n
+        self.n = n
+        self.min = min(self.min, float(np.min(xs)))
+        self.max = max(self.max, float(np.max(xs)))
+
+    def var(self):
+        """Population variance, as np.var"""
+        return self.m2 / self.n if self.n else 0.0
+
+    def std(self):
+        return sqrt(self.var())
+
+    def cv(self):
+        """Coefficient of variation"""
+        return self.std() / self.mean if self.mean else 0.0
+
+
+class SlidingStats:
+    """Mean, variance & coefficient of variation of the last 'window' values of a series, in O(1) per value.
+    The sums are kept relative to the first value, to avoid the cancellation of large sums of squares"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.shift = None
+        self.sum = 0.0
+        self.sum2 = 0.0
+
+    def update(self, x):
+        if self.shift is None:
+            self.shift = x
+        d = x - self.shift
+        self.values.append(d)
+        self.sum += d
+        self.sum2 += d * d
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.sum -= old
+            self.sum2 -= old * old
+
+    def __len__(self):
+        return len(self.values)
+
+    def mean(self):
+        return self.shift + self.sum / len(self.values) if self.values else 0.0
+
+    def var(self):
+        """Population variance of the window"""
+        n = len(self.values)
+        if n == 0:
+            return 0.0
+        return max(0.0, self.sum2 / n - (self.sum / n) ** 2)
+
+    def std(self):
+        return sqrt(self.var())
+
+    def cv(self):
+        mean = self.mean()
+        return self.std() / mean if mean else 0.0
+
+
+class TappingAnalyzer:
+    """
+    Online analysis of the rhythm of a tapping session, which consumes the taps one at a time (from the live app,
+    see OnlineMonitor.py, or from a file, see analyze_tapper_file), in O(1) per tap:
+    - the running mean & variance of the inter-tap intervals (ITI), with Welford's updates
+    - the coefficient of variation of the last 'window' ITIs
+    - the drift: the slope of the linear regression of the ITIs on the tap number, in ms. per tap (a positive drift
+      means the rhythm slows down)
+    - the outliers: ITIs further than 'outlier_sd' standard deviations from the mean of the window, i.e. missed or
+      double taps. Outliers are counted and included in the running statistics, but kept out of the window, so one
+      missed tap does not hide the next ones
+    """
+
+    def __init__(self, window=10, outlier_sd=3.0, min_window=5):
+        """
+        :param window: <int> number of the last ITIs of the sliding statistics
+        :param outlier_sd: <float> distance from the mean of the window, in its standard deviations, of an outlier
+        :param min_window: <int> number of ITIs in the window before outliers are detected
+        """
+        self.iti = RunningStats()
+        self.sliding = SlidingStats(window)
+        self.outlier_sd = outlier_sd
+        self.min_window = min_window
+        self.taps = 0
+        self.outliers = 0
+        self.last_tap = None
+        # running co-moment of the ITIs with their number, for the drift
+        self.index_mean = 0.0
+        self.index_m2 = 0.0
+        self.co_moment = 0.0
+
+    def tap(self, t):
+        """
+        :param t: <float> time of the tap, in ms.
+        :return: <float> the ITI which ended with this tap, None for the first tap
+        """
+        self.taps += 1
+        last, self.last_tap = self.last_tap, t
+        if last is None:
+            return None
+        iti = t - last
+
+        sliding = self.sliding
+        if len(sliding) >= self.min_window and abs(iti - sliding.mean()) > self.outlier_sd * sliding.std():
+            self.outliers += 1
+        else:
+            sliding.update(iti)
+
+        # the ITI is the i-th one: Welford's update of the ITIs, the indices and their co-moment
+        i = self.iti.n + 1
+        d_index = i - self.index_mean
+        self.index_mean += d_index / i
+        self.index_m2 += d_index * (i - self.index_mean)
+        self.iti.update(iti)
+        self.co_moment += d_index * (iti - self.iti.mean)
+        return iti
+
+    def consume(self, times):
+        """:param times: iterable of the times of the taps, in ms."""
+        for t in times:
+            self.tap(t)
+        return self
+
+    def drift(self):
+        """Slope of the ITIs over the tap number, in ms. per tap"""
+        return self.co_moment / self.index_m2 if self.index_m2 else 0.0
+
+    def summary(self):
+        return {"taps": self.taps, "iti_mean": self.iti.mean, "iti_std": self.iti.std(), "iti_cv": self.iti.cv(),
+                "window_cv": self.sliding.cv(), "drift": self.drift(), "outliers": self.outliers}
+
+
+def read_tapper_csv(path):
+    """
+    Read a Tapper_<n>.csv file, without pandas
+    :return: <dict> with subject, times (np.ndarray of the times of the taps, in ms.), time_length & time_perspective
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    times = []
+    subject = ""
+    res = {"time_length": None, "time_perspective": None}
+    for line in lines[1:]:
+        if not line:
+            continue
+        cells = line.split(",")
+        if line.startswith("Time elapsed"):
+            res["time_length"] = cells[-1]
+        elif line.startswith("Subject perception"):
+            res["time_perspective"] = cells[-1]
+        else:
+            subject = cells[0]
+            times.append(cells[2])
+    res["subject"] = subject
+    res["times"] = np.array(times, dtype=np.float64)
+    return res
+
+
+def analyze_tapper_file(path, **kwargs):
+    """The TappingAnalyzer summary of a Tapper_<n>.csv file, together with its path, subject & the durations"""
+    data = read_tapper_csv(path)
+    res = {"path": path, "subject": data["subject"], "time_length": data["time_length"],
+           "time_perspective": data["time_perspective"]}
+    res.update(TappingAnalyzer(**kwargs).consume(data["times"].tolist()).summary())
+    return res
+
+
+SUMMARY_COLUMNS = ["path", "subject", "time_length", "time_perspective", "taps", "iti_mean", "iti_std", "iti_cv",
+                   "window_cv", "drift", "outliers"]
+
+
+def analyze_tapper_tree(root="Data", out=None):
+    """
+    Analyze every Data/<subject>/Tapper_<n>.csv file
+    :param root: <String> the Data directory
+    :param out: <String> path of a csv file for the summaries, one row per file. None for no file
+    :return: <List> of the summaries
+    """
+    paths = sorted(glob(join(root, "*", "Tapper_*.csv")))
+    summaries = [analyze_tapper_file(path) for path in paths if match(r"Tapper_\d+\.csv$", basename(path))]
+    if out is not None:
+        with open(out, "w", newline="") as f:
+            w = writer(f)
+            w.writerow(SUMMARY_COLUMNS)
+            for s in summaries:
+                w.writerow([s[col] for col in SUMMARY_COLUMNS])
+    return summaries
+
+
+if __name__ == "__main__":
+    # Batch analysis of the tapping sessions: python OnlineAnalysis.py [Data directory] [summary csv]
+    root = sys.argv[1] if len(sys.argv) > 1 else "Data"
+    out = sys.argv[2] if len(sys.argv) > 2 else None
+    for s in analyze_tapper_tree(root, out):
+        print("%-40s %4d taps, ITI %7.1f +- %6.1f ms, window CV %5.1f%%, drift %+6.2f ms/tap, %d outliers" %
+              (s["path"], s["taps"], s["iti_mean"], s["iti_std"], s["window_cv"] * 100, s["drift"], s["outliers"]))
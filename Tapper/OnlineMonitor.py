@@ -0,0 +1,143 @@
+"""Live statistics of the Tapper sessions, from the LSL streams of the app (see TaskOutlets.py, PUBLISH_TO_LSL in
+Main.py): the inter-tap intervals of the Tapper task, and the velocity of the Motion & Circles tasks, updated
+incrementally as the samples arrive, so the experimenter can watch the stability of the rhythm during the trial.
+Run from the Tapper directory, on any machine of the network of the app:
+    python OnlineMonitor.py [report every N sec.]
+"""
+import sys
+import time
+import numpy as np
+from pylsl import StreamInlet, resolve_byprop
+from TaskOutlets import MARKERS_STREAM, MOTION_STREAM, parse_marker
+from OnlineAnalysis import RunningStats, TappingAnalyzer
+
+REPORT_EVERY = 1.0      # sec.
+POLL_EVERY = 0.02       # sec.
+MAX_CHUNK = 1024        # motion samples pulled at once
+VELOCITY_FACTOR = 1000  # as MULTIPY_FACTOR of Analyzer.py, to get the same velocity values
+
+
+class SessionStats:
+    """The statistics of a single session, i.e. 'Tapper_1'"""
+
+    def __init__(self, name, start):
+        """
+        :param name: <String> the session, i.e. 'Tapper_1'
+        :param start: <float> LSL time stamp of the start of the session
+        """
+        self.name = name
+        self.start = start
+        self.taps = 0
+        self.rhythm = TappingAnalyzer()     # inter-tap intervals, in ms.
+        self.velocity = RunningStats()
+        self.last_sample = None             # (tapNum, x, y, time) of the last motion sample
+        self.perception = None
+
+    def tap(self, t):
+        self.rhythm.tap(t * 1000)
+        self.taps = self.rhythm.taps
+
+    def motion(self, samples, stamps):
+        """
+        :param samples: <np.ndarray> (n, 3) of [tapNum, x, y]
+        :param stamps: <np.ndarray> (n,) LSL time stamps, in sec.
+        """
+        keep = stamps >= self.start
+        samples, stamps = samples[keep], stamps[keep]
+        if len(samples) == 0:
+            return
+        self.taps = max(self.taps, int(samples[:, 0].max()))
+        if self.last_sample is not None:
+            samples = np.vstack([self.last_sample[:3], samples])
+            stamps = np.concatenate([[self.last_sample[3]], stamps])
+        self.last_sample = (*samples[-1], stamps[-1])
+
+        # velocity between consecutive samples of the same touch
+        dt = np.diff(stamps) * 1000
+        same = (samples[1:, 0] == samples[:-1, 0]) & (samples[1:, 0] != -1) & (dt > 0)
+        dist = np.hypot(*(samples[1:, 1:] - samples[:-1, 1:]).T)
+        self.velocity.update_batch(dist[same] / dt[same] * VELOCITY_FACTOR)
+
+    def summary(self):
+        if self.name.startswith("Tapper"):
+            rhythm = self.rhythm
+            return "%s: %d taps, ITI %.1f +- %.1f ms (CV %.1f%%, last %d %.1f%%), drift %+.2f ms/tap, %d outliers" % \
+                   (self.name, self.taps, rhythm.iti.mean, rhythm.iti.std(), rhythm.iti.cv() * 100,
+                    rhythm.sliding.window, rhythm.sliding.cv() * 100, rhythm.drift(), rhythm.outliers)
+        return "%s: %d touches, velocity %.3f +- %.3f (%d samples)" % \
+               (self.name, self.taps, self.velocity.mean, self.velocity.std(), self.velocity.n)
+
+
+class TapperMonitor:
+    """Consumes the LSL streams of the Tapper app"""
+
+    def __init__(self, timeout=10):
+        """:param timeout: <float> time to wait for the streams of the app, in sec."""
+        self.markers = StreamInlet(self.resolve(MARKERS_STREAM, timeout))
+        self.motion = StreamInlet(self.resolve(MOTION_STREAM, timeout))
+        # samples pushed before an inlet is connected are not delivered to it
+        self.markers.open_stream()
+        self.motion.open_stream()
+        self.buffer = np.zeros((MAX_CHUNK, 3), dtype=np.float32)
+        self.sessions = []
+        self.current = None
+        self.ended = []             # sessions which ended since the last poll
+
+    @staticmethod
+    def resolve(name, timeout):
+        streams = resolve_byprop("name", name, timeout=timeout)
+        if not streams:
+            raise RuntimeError("The LSL stream '%s' was not found. Is the Tapper app running with PUBLISH_TO_LSL?"
+                               % name)
+        return streams[0]
+
+    def on_marker(self, text, t):
+        """:param text: <String> '<subject>|<session>|<event>', i.e. 'name_0|Tapper_1|tap 3'"""
+        subject, session, event = parse_marker(text)
+        if event == "start":
+            self.current = SessionStats(session, t)
+            self.sessions.append(self.current)
+            print("-------------%s: %s started------------" % (subject, session))
+        elif self.current is None or self.current.name != session:
+            return
+        elif event.startswith("tap"):
+            self.current.tap(t)
+        elif event.startswith("perception"):
+            self.current.perception = event.split(" ", 1)[1]
+        elif event == "end":
+            self.ended.append(self.current)
+
+    def poll(self):
+        """Consume whatever arrived since the last poll"""
+        markers, stamps = self.markers.pull_chunk(timeout=0.0)
+        for (text,), t in zip(markers, stamps):
+            self.on_marker(text, t)
+        while True:
+            _, stamps = self.motion.pull_chunk(timeout=0.0, max_samples=MAX_CHUNK, dest_obj=self.buffer)
+            if self.current is not None and len(stamps):
+                self.current.motion(self.buffer[:len(stamps)], np.asarray(stamps))
+            if len(stamps) < MAX_CHUNK:
+                break
+        # the last motion samples of a session are pushed right after its end marker
+        for session in self.ended:
+            print("-------------%s ended. %s------------" % (session.name, session.summary()))
+        self.ended = []
+
+    def run(self, report_every=REPORT_EVERY):
+        next_report = time.perf_counter() + report_every
+        while True:
+            self.poll()
+            if time.perf_counter() >= next_report:
+                next_report += report_every
+                if self.current is not None:
+                    print(self.current.summary())
+            time.sleep(POLL_EVERY)
+
+
+if __name__ == "__main__":
+    monitor = TapperMonitor()
+    try:
+        monitor.run(float(sys.argv[1]) if len(sys.argv) > 1 else REPORT_EVERY)
+    except KeyboardInterrupt:
+        for session in monitor.sessions:
+            print(session.summary())
@@ -0,0 +1,164 @@
+"""
+Headless rendering of the figures of Analyzer.py for a whole Data directory: the figure of analyze_velocity_peaks of a
+single trial (velocity, smooth velocity, peaks & histogram of the intervals, beside the map of the peaks along the
+move) for every motion trial, on the Agg backend and on a pool of processes, without any window.
+Every process builds a single figure and draws its axes again for every trial, instead of building a figure per
+trial. The trials of a subject are rendered by the same process, into a report bundle per subject:
+- <subject>/<Task>_<n>.png: the figure of every trial
+- <subject>.pdf: the figures of all the trials of the subject, a page each
+Run from the Tapper directory:
+    python ReportRenderer.py [--data Data] [--out Anlyzes/reports] [--workers N] [--tasks Motion Circles]
+                             [--formats png pdf] [--no-cache]
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")       # no window, neither in the workers nor in this process
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from Analyzer import init_axis, plot_analyze, plot_peaks_map
+from BatchAnalysis import DATA_DIR, TASKS, discover
+
+OUT_DIR = os.path.join("Anlyzes", "reports")
+WORKERS = None              # processes of the pool. None for one per CPU, 0 to render in this process
+FORMATS = ["png", "pdf"]
+FIG_SIZE = (16, 9)          # in inches
+DPI = 100
+
+_figure = None              # the figure of the process, see get_figure
+
+
+class TrialFigure:
+    """
+    The figure of a single trial, built once and drawn again for every trial: only the artists of the previous trial
+    are removed from the axes (clearing the axes builds their ticks & spines again, which takes longer than drawing)
+    """
+
+    def __init__(self, fig_size=FIG_SIZE, dpi=DPI):
+        self.fig = plt.figure(figsize=fig_size, dpi=dpi)
+        gs = self.fig.add_gridspec(4, 2)
+        self.axs = [self.fig.add_subplot(gs[i, 0]) for i in range(4)]
+        self.map = self.fig.add_subplot(gs[0:, 1])
+        for ax, title in zip(self.axs, ["Velocity:", "Smooth:", "Peaks:", "Intervals hist.:"]):
+            init_axis(ax, title)
+
+    def reset(self):
+        """Remove the artists of the previous trial, and let the axes fit the next one"""
+        for ax in self.axs + [self.map]:
+            for artist in ax.lines[:] + ax.collections[:] + ax.patches[:]:
+                artist.remove()
+            if ax.get_legend() is not None:
+                ax.get_legend().remove()
+            ax.set_title("")
+            ax.set_prop_cycle(None)     # the default colors start over
+            ax.relim()
+            ax.set_autoscale_on(True)
+
+    def draw(self, path, use_cache=None):
+        """
+        Draw the trial of path, as analyze_velocity_peaks([path])
+        :return: <dict> the data of the trial, see Analyzer.plot_analyze
+        """
+        self.reset()
+        data = plot_analyze(path, self.axs, use_cache=use_cache)
+        if 'intervals' not in data:
+            raise ValueError("not a motion session")
+        plot_peaks_map(data, self.map)
+        return data
+
+
+def get_figure():
+    """The figure of this process, shared by all the trials it renders"""
+    global _figure
+    if _figure is None:
+        _figure = TrialFigure()
+    return _figure
+
+
+def render_subject(subject, paths, out_dir=OUT_DIR, formats=FORMATS, use_cache=None):
+    """
+    Render the report bundle of a subject. Runs in a worker process, so it never raises: a trial which fails is
+    reported by its status, and is left out of the bundle
+    :param paths: <List> of the paths of the trials of the subject
+    :param formats: <List> of "png" (a file per trial) and/or "pdf" (a file per subject)
+    :return: <List> of (<String> path, <String> status, <float> seconds) per trial
+    """
+    figure = get_figure()
+    os.makedirs(out_dir, exist_ok=True)
+    pdf = PdfPages(os.path.join(out_dir, subject + ".pdf")) if "pdf" in formats else None
+    res = []
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                figure.draw(path, use_cache)
+                if "png" in formats:
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    os.makedirs(os.path.join(out_dir, subject), exist_ok=True)
+                    figure.fig.savefig(os.path.join(out_dir, subject, name + ".png"))
+                if pdf is not None:
+                    pdf.savefig(figure.fig)
+                status = "ok"
+            except Exception as e:
+                status = "error: %s: %s" % (type(e).__name__, " ".join(str(e).split()))
+            res.append((path, status, round(time.perf_counter() - start, 3)))
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return res
+
+
+def render_reports(paths, out_dir=OUT_DIR, workers=WORKERS, formats=FORMATS, use_cache=None):
+    """
+    Render the report bundles of the given trials, a bundle per subject
+    :param paths: <List> of the paths of the trials, as found by BatchAnalysis.discover
+    :param workers: <int> processes of the pool. None for one per CPU, 0 to render in this process
+    :return: <List> of (<String> path, <String> status, <float> seconds) per trial, by subject
+    """
+    subjects = defaultdict(list)
+    for path in paths:
+        subjects[os.path.basename(os.path.dirname(path))].append(path)
+    res = []
+    start = time.perf_counter()
+
+    def done(subject, trials):
+        res.extend(trials)
+        failed = sum(status != "ok" for _, status, _ in trials)
+        print("[%d/%d] %.1fs %s: %d figures, %d failed" % (len(res), len(paths), time.perf_counter() - start,
+                                                            subject, len(trials) - failed, failed))
+
+    if workers == 0:
+        for subject, trials in subjects.items():
+            done(subject, render_subject(subject, trials, out_dir, formats, use_cache))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_subject, subject, trials, out_dir, formats, use_cache): subject
+                       for subject, trials in subjects.items()}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Figures of every motion trial of a Data directory, headless")
+    parser.add_argument("--data", default=DATA_DIR, help="the Data directory")
+    parser.add_argument("--out", default=OUT_DIR, help="output directory")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="processes of the pool (default: one per CPU, 0: no pool)")
+    parser.add_argument("--tasks", nargs="+", default=TASKS, help="tasks to render")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS, help="formats of the reports")
+    parser.add_argument("--no-cache", action="store_true", help="analyze every file again, see Analyzer.USE_CACHE")
+    args = parser.parse_args()
+
+    paths = discover(args.data, args.tasks)
+    print("-------------Rendering %d trials of %s------------" % (len(paths), args.data))
+    start = time.perf_counter()
+    res = render_reports(paths, args.out, args.workers, args.formats, use_cache=False if args.no_cache else None)
+    ok = sum(status == "ok" for _, status, _ in res)
+    print("-------------%d figures rendered in %.1fs (%d failed). Reports in %s------------" %
+          (ok, time.perf_counter() - start, len(res) - ok, args.out))
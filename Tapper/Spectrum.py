@@ -0,0 +1,103 @@
+"""
+Spectral analysis of the velocity of the motion trials: Welch's power spectral density of many trials at once, and
+the dominant movement frequency of every trial, to compare with the intervals of its peaks and with the tapping
+intervals of the subject.
+The velocity of every trial is resampled uniformly, cut into overlapping windowed segments, and the segments of all
+the trials are stacked into a single 2-D array, for a single real FFT (zero-padded to a fast length) over all of them.
+The FFT is pyFFTW's when available, with its plans kept across calls, and numpy's otherwise.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import next_fast_len
+from scipy.signal import get_window
+
+try:
+    import pyfftw
+    import pyfftw.builders      # Performs much better than numpy's fft, see LSLexamples/PerformanceTest.py
+    HAS_FFTW = True
+except ImportError:
+    HAS_FFTW = False
+
+SPECTRUM_RATE = 50          # Hz, the velocity is resampled uniformly at this rate
+SEGMENT_SEC = 8             # sec., length of the segments of Welch's method
+OVERLAP = 0.5               # of the segments
+PAD_FACTOR = 4              # the segments are zero-padded to this factor (at least) of their length, for finer bins
+BAND = (0.2, 5.0)           # Hz, where the dominant movement frequency is looked for
+FFTW_THREADS = 1
+
+
+def uniform_velocity(vel, time_stamp, rate=SPECTRUM_RATE):
+    """
+    :param vel: <np.ndarray> the velocity between every sample and the next one (see Analyzer.get_velocity_vector)
+    :param time_stamp: <np.ndarray> the time stamps of the samples, in ms.
+    :return: <np.ndarray> the velocity resampled at rate (stamped at the middle of its samples), without its
+             non-finite values (i.e. of repeated time stamps)
+    """
+    t = (time_stamp[1:] + time_stamp[:-1]) / 2000
+    finite = np.isfinite(vel) & np.isfinite(t)
+    t, vel = t[finite], vel[finite]
+    return np.interp(np.arange(t[0], t[-1], 1 / rate), t, vel) if len(t) else np.zeros(0)
+
+
+class SpectrumEngine:
+    """Welch's PSD (as scipy.signal.welch, with the defaults of its window, detrending & scaling) of many signals"""
+
+    def __init__(self, rate=SPECTRUM_RATE, segment_sec=SEGMENT_SEC, overlap=OVERLAP, pad_factor=PAD_FACTOR):
+        self.rate = rate
+        self.nperseg = int(segment_sec * rate)
+        self.step = self.nperseg - int(self.nperseg * overlap)
+        self.nfft = next_fast_len(self.nperseg * pad_factor, real=True)
+        self.window = get_window("hann", self.nperseg)
+        self.scale = 1 / (rate * np.sum(self.window ** 2))
+        self.freqs = np.fft.rfftfreq(self.nfft, 1 / rate)
+        self.plans = {}             # pyFFTW plans, by the number of segments
+
+    def rfft(self, segments):
+        """:param segments: <np.ndarray> (n, nperseg), the FFT is taken along the rows"""
+        if not HAS_FFTW:
+            return np.fft.rfft(segments, n=self.nfft, axis=-1)
+        # a plan per power of 2 of rows (the extra rows are zeros), so that few plans serve any number of trials
+        rows = 1 << max(0, len(segments) - 1).bit_length()
+        plan = self.plans.get(rows)
+        if plan is None:
+            plan = pyfftw.builders.rfft(pyfftw.empty_aligned((rows, self.nperseg)), n=self.nfft, axis=-1,
+                                        threads=FFTW_THREADS, planner_effort="FFTW_MEASURE")
+            self.plans[rows] = plan
+        plan.input_array[:len(segments)] = segments
+        plan.input_array[len(segments):] = 0
+        return plan()[:len(segments)].copy()
+
+    def segments(self, x):
+        """The segments of a signal, as welch's: the last incomplete one is dropped, a too short signal is padded"""
+        if len(x) < self.nperseg:
+            x = np.concatenate([x, np.zeros(self.nperseg - len(x))])
+        return sliding_window_view(x, self.nperseg)[::self.step]
+
+    def welch(self, signals):
+        """
+        :param signals: <List> of 1-D <np.ndarray>s, sampled at rate, of any lengths
+        :return: <np.ndarray> (len(signals), len(freqs)) their PSDs
+        """
+        segments = [self.segments(np.asarray(x, dtype=np.float64)) for x in signals]
+        counts = np.array([len(seg) for seg in segments])
+        stacked = np.concatenate(segments)
+        stacked = (stacked - stacked.mean(axis=1, keepdims=True)) * self.window
+        power = np.abs(self.rfft(stacked)) ** 2 * self.scale
+        # one-sided: the power of the negative frequencies is added (but for DC and the Nyquist bin)
+        power[:, 1:self.nfft // 2 + self.nfft % 2] *= 2
+        return np.add.reduceat(power, np.concatenate([[0], np.cumsum(counts)[:-1]]), axis=0) / counts[:, None]
+
+    def dominant(self, psd, band=BAND):
+        """
+        :param psd: <np.ndarray> (n, len(freqs)) as welch's
+        :return: <np.ndarray> the frequency of the highest power within band of every PSD, in Hz, refined between
+                 the bins by a parabola through the 3 bins around it
+        """
+        psd = np.atleast_2d(psd)
+        lo, hi = np.searchsorted(self.freqs, band)
+        i = lo + np.argmax(psd[:, lo:hi], axis=1)
+        rows = np.arange(len(psd))
+        a, b, c = (psd[rows, np.clip(i + d, 0, len(self.freqs) - 1)] for d in (-1, 0, 1))
+        denominator = a - 2 * b + c
+        delta = np.divide(0.5 * (a - c), denominator, out=np.zeros(len(psd)), where=denominator != 0)
+        return self.freqs[i] + np.clip(delta, -0.5, 0.5) * (self.freqs[1] - self.freqs[0])
@@ -0,0 +1,295 @@
+"""
+The velocity peaks analysis of Analyzer.py (preprocess -> velocity -> Gaussian smoothing -> minima -> high peaks ->
+intervals) as a chain of streams, which consume the samples in chunks and emit the intervals as soon as they are
+known, so recordings of any length are analyzed in bounded memory: the chunk, the support of the Gaussian kernel,
+and the samples since the last peak.
+Every stage handles its boundaries explicitly, to give the very same intervals as analyze_motion:
+- interpolation: a gap of missing samples (-1) is held until the next valid sample. Gaps at the beginning stay nan,
+                 and at the end are filled with the last valid sample, as pandas' interpolate
+- smoothing: overlap-save. The output at i is only emitted once the samples up to i + radius of the kernel arrived,
+             the filter runs over the kept overlap, and the reflection of gaussian_filter1d applies at the true ends
+- minima: a plateau which reaches the end of a chunk is held until a different value arrives
+- high peaks: a peak is decided once the next peak is found (the average of y between them), the last one at the end
+Two values of analyze_motion depend on the whole recording: the filter size (from the mean velocity) and the center
+of the y axis. A file is therefore read twice, first for these (see trial_stats), which are then accumulated in
+chunks and may differ from np.mean in the last bit (only a tie could change the analysis).
+Run from the Tapper directory:
+    python StreamingAnalysis.py Data/<subject>/<Task>_<n>.csv [...]
+"""
+import math
+import sys
+
+import numpy as np
+from scipy import signal
+from scipy.ndimage import gaussian_filter1d
+
+import Analyzer
+from TaskCsv import count_rows, iter_task_csv, read_footer
+from util import CSV_COLS_PER_TASK
+
+CHUNK_ROWS = 10000          # rows of the csv file read at once
+TRUNCATE = 4.0              # as gaussian_filter1d's default
+
+
+class InterpolateStream:
+    """preprocess_motion: the -1 positions (of samples without a touch) are interpolated linearly between the valid
+    samples around them"""
+
+    def __init__(self):
+        self.index = 0              # index of the first pending sample
+        self.last = None            # (index, x, y) of the last valid sample
+        self.pending = [np.zeros(0)] * 4    # tapNum, x, y & t of the samples after it, which are not valid
+
+    def push(self, tap, x, y, t):
+        """:return: (tapNum, x, y, t) of the samples which are known so far"""
+        cols = [np.concatenate([pending, np.asarray(new, dtype=np.float64)])
+                for pending, new in zip(self.pending, (tap, x, y, t))]
+        valid = np.flatnonzero(cols[1] != -1)
+        if len(valid) == 0:
+            self.pending = cols
+            return tuple(np.zeros(0) for _ in range(4))
+        # the samples up to the last valid one are known
+        emit = valid[-1] + 1
+        tap, x, y, t = (col[:emit] for col in cols)
+        self.pending = [col[emit:] for col in cols]
+        index = self.index + np.arange(emit, dtype=np.float64)
+        self.index += emit
+
+        tap[tap == -1] = np.nan
+        missing = x == -1
+        if missing.any():
+            xp, fx, fy = index[~missing], x[~missing], y[~missing]
+            if self.last is not None:
+                xp, fx, fy = (np.concatenate([[prev], arr]) for prev, arr in zip(self.last, (xp, fx, fy)))
+            x[missing] = np.interp(index[missing], xp, fx)
+            y[missing] = np.interp(index[missing], xp, fy)
+            # nothing to interpolate from, before the first valid sample
+            x[missing & (index < xp[0])] = np.nan
+            y[missing & (index < xp[0])] = np.nan
+        self.last = (index[-1], x[-1], y[-1])
+        return tap, x, y, t
+
+    def close(self):
+        """The pending samples at the end, filled with the last valid sample"""
+        tap, x, y, t = self.pending
+        self.pending = [np.zeros(0)] * 4
+        tap[tap == -1] = np.nan
+        fill = (np.nan, np.nan) if self.last is None else self.last[1:]
+        return tap, np.full(len(t), fill[0]), np.full(len(t), fill[1]), t
+
+
+class VelocityStream:
+    """get_velocity_vector: the velocity between every sample and the next one"""
+
+    def __init__(self):
+        self.last = None            # x, y & t of the last sample
+
+    def push(self, x, y, t):
+        if len(t) == 0:
+            return np.zeros(0)
+        if self.last is not None:
+            x, y, t = (np.concatenate([[prev], arr]) for prev, arr in zip(self.last, (x, y, t)))
+        self.last = (x[-1], y[-1], t[-1])
+        dist = np.linalg.norm(np.diff(np.array([x, y]).T, axis=0), axis=1)
+        return dist / np.diff(t) * Analyzer.MULTIPY_FACTOR
+
+
+class GaussianStream:
+    """gaussian_filter1d, with overlap-save"""
+
+    def __init__(self, sigma):
+        self.sigma = sigma
+        self.radius = int(TRUNCATE * sigma + 0.5)
+        self.buffer = np.zeros(0)
+        self.start = 0              # index of buffer[0]
+        self.next = 0               # index of the next output
+
+    def push(self, x):
+        self.buffer = np.concatenate([self.buffer, x])
+        end = self.start + len(self.buffer) - self.radius      # the outputs before end have their whole support
+        if end <= self.next:
+            return np.zeros(0)
+        # the outputs are taken at least radius samples from the left end of the buffer, but at the true beginning
+        out = gaussian_filter1d(self.buffer, self.sigma, truncate=TRUNCATE)[self.next - self.start:end - self.start]
+        self.next = end
+        keep = max(self.next - self.radius, self.start)
+        self.buffer = self.buffer[keep - self.start:]
+        self.start = keep
+        return out
+
+    def close(self):
+        if len(self.buffer) == 0 or self.next >= self.start + len(self.buffer):
+            return np.zeros(0)
+        out = gaussian_filter1d(self.buffer, self.sigma, truncate=TRUNCATE)[self.next - self.start:]
+        self.next = self.start + len(self.buffer)
+        return out
+
+
+class PeaksStream:
+    """signal.find_peaks, as analyze_motion calls it (no condition but being a local maximum)"""
+
+    def __init__(self):
+        self.carry = np.zeros(0)    # the samples which may still be part of a peak
+        self.start = 0              # index of carry[0]
+
+    def push(self, x):
+        buffer = np.concatenate([self.carry, x])
+        if len(buffer) == 0:
+            return np.zeros(0, dtype=np.intp)
+        peaks, _ = signal.find_peaks(buffer)
+        # the last run of equal values may be the plateau of a peak, which the next values decide. It is kept,
+        # with the value before it (to tell whether the run rises from it)
+        i = len(buffer) - 1
+        while i > 0 and buffer[i - 1] == buffer[i]:
+            i -= 1
+        keep = max(i - 1, 0)
+        res = peaks + self.start
+        self.carry = buffer[keep:]
+        self.start += keep
+        return res
+
+
+class StreamingAnalyzer:
+    """
+    The chain of streams of a motion session. Push the preprocessed columns of the samples (after the trim of
+    extract_data) as they come, get the intervals between the high peaks, in ms.
+    """
+
+    def __init__(self, filter_size, center_y):
+        """
+        :param filter_size: <int> sigma of the Gaussian filter of the velocity, see Analyzer.smooth_velocity
+        :param center_y: <float> the mean of the y positions, see Analyzer.separate_high_peaks
+        """
+        self.center_y = center_y
+        self.interpolate = InterpolateStream()
+        self.velocity = VelocityStream()
+        self.gaussian = GaussianStream(filter_size)
+        self.peaks = PeaksStream()
+        self.y = np.zeros(0)            # y & t of the samples since the current peak (or since the carry of peaks)
+        self.t = np.zeros(0)
+        self.start = 0                  # index of self.y[0]
+        self.peak = None                # index of the current peak, not decided yet
+        self.last_high = None           # time of the last high peak
+        self.n_peaks = 0
+        self.n_high = 0
+
+    def push(self, tap, x, y, t):
+        """:return: <np.ndarray> the intervals which ended in these samples"""
+        _, x, y, t = self.interpolate.push(tap, x, y, t)
+        return self._samples(x, y, t, self.gaussian.push(self.velocity.push(x, y, t)))
+
+    def close(self):
+        """:return: <np.ndarray> the last intervals"""
+        _, x, y, t = self.interpolate.close()
+        intervals = self._samples(x, y, t, self.gaussian.push(self.velocity.push(x, y, t)))
+        intervals = np.concatenate([intervals, self._samples(*(np.zeros(0),) * 3, self.gaussian.close())])
+        if self.peak is not None:
+            y = self.y[self.peak - self.start:]
+            intervals = np.concatenate([intervals, self._decide(self.y[self.peak - self.start] > np.average(y))])
+            self.peak = None
+        return intervals
+
+    def _samples(self, x, y, t, vel_filtered):
+        self.y = np.concatenate([self.y, y])
+        self.t = np.concatenate([self.t, t])
+        res = []
+        for p in self.peaks.push(Analyzer.PEAKS_SGN * vel_filtered):
+            self.n_peaks += 1
+            if self.peak is not None:
+                y_cur = self.y[self.peak - self.start]
+                segment = self.y[self.peak - self.start:p - self.start]
+                res.append(self._decide(y_cur > np.average(segment) and y_cur > self.center_y))
+            self.peak = p
+        # y & t are only needed from the current peak on (or from the first sample a peak may yet be found at)
+        keep = self.peak if self.peak is not None else self.peaks.start
+        self.y, self.t = self.y[keep - self.start:], self.t[keep - self.start:]
+        self.start = keep
+        return np.concatenate(res) if res else np.zeros(0)
+
+    def _decide(self, high):
+        """:return: <np.ndarray> the interval which ends at the current peak, if it is high"""
+        if not high:
+            return np.zeros(0)
+        self.n_high += 1
+        t = self.t[self.peak - self.start]
+        interval, self.last_high = ([] if self.last_high is None else [t - self.last_high]), t
+        return np.array(interval)
+
+
+def trial_chunks(path, chunk_rows=CHUNK_ROWS):
+    """
+    The chunks of the columns of a trial, trimmed and normalized as extract_data, then decimated as
+    preprocess_motion
+    :return: generator of (tapNum, x, y, t) of <np.ndarray>s
+    """
+    session = path.replace("\\", "/").split("/")[-1].split("_")[0]
+    time_length = read_footer(path)[0]
+    if time_length is None:
+        raise ValueError("%s has no footer (time elapsed & subject perception)" % path)
+    n_rows = count_rows(path)
+    start = int(Analyzer.TRIM_SEC * (n_rows + 2) / time_length)
+    row, t0 = 0, None
+    for chunk in iter_task_csv(path, CSV_COLS_PER_TASK[session], chunk_rows, n_rows):
+        n = len(chunk['tapNum'])
+        # the rows of this chunk, from the trim on, one every CHUNK_SAMPLES
+        first = max(start, row)
+        first += (-(first - start)) % Analyzer.CHUNK_SAMPLES
+        take = slice(first - row, n, Analyzer.CHUNK_SAMPLES)
+        row += n
+        if take.start >= n:
+            continue
+        t = chunk['time_stamp (in ms.)'][take]
+        t0 = t[0] if t0 is None else t0
+        yield chunk['tapNum'][take], chunk['x_pos'][take], chunk['y_pos'][take], t - t0
+
+
+def trial_stats(path, chunk_rows=CHUNK_ROWS):
+    """
+    The first pass over a trial, for the values of the analysis which depend on all of it
+    :return: <int> the filter size of the velocity, <float> the mean of the y positions
+    """
+    interpolate, velocity = InterpolateStream(), VelocityStream()
+    vel_sums, y_sums, n_vel, n_y = [], [], 0, 0
+    chunks = trial_chunks(path, chunk_rows)
+    for _, x, y, t in (interpolate.push(*chunk) for chunk in chunks):
+        vel = velocity.push(x, y, t)
+        vel_sums.append(np.sum(vel))
+        y_sums.append(np.sum(y))
+        n_vel, n_y = n_vel + len(vel), n_y + len(y)
+    _, x, y, t = interpolate.close()
+    vel = velocity.push(x, y, t)
+    vel_sums.append(np.sum(vel))
+    y_sums.append(np.sum(y))
+    n_vel, n_y = n_vel + len(vel), n_y + len(y)
+
+    # math.fsum propagates nan & inf as np.mean does
+    mean = math.fsum(vel_sums) / n_vel
+    filter_size = int(Analyzer.VELOCITY_FILTER_SIZE + (0 if mean > Analyzer.DEFAULT_VEL_MEAN else
+                                                       14 * np.abs(mean - Analyzer.DEFAULT_VEL_MEAN)))
+    return filter_size, math.fsum(y_sums) / n_y
+
+
+def stream_intervals(path, chunk_rows=CHUNK_ROWS, filter_size=None, center_y=None):
+    """
+    The intervals of a motion trial, as analyze_motion's, in bounded memory
+    :param filter_size: <int> the filter size of the velocity. None (as center_y) for a first pass over the file
+    :param center_y: <float> the mean of the y positions
+    :return: generator of <np.ndarray>s of intervals, in ms., as they are found
+    """
+    if filter_size is None or center_y is None:
+        filter_size, center_y = trial_stats(path, chunk_rows)
+    analyzer = StreamingAnalyzer(filter_size, center_y)
+    for chunk in trial_chunks(path, chunk_rows):
+        intervals = analyzer.push(*chunk)
+        if len(intervals):
+            yield intervals
+    intervals = analyzer.close()
+    if len(intervals):
+        yield intervals
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        intervals = np.concatenate(list(stream_intervals(path)) or [np.zeros(0)])
+        print("%s: %d intervals, %.1f +- %.1f ms" % (path, len(intervals), np.mean(intervals) if len(intervals) else 0,
+                                                     np.std(intervals) if len(intervals) else 0))
@@ -0,0 +1,27 @@
+from time import perf_counter, time
+from pylsl import local_clock
+
+
+class TaskClock:
+    """
+    The clock the tasks are timed with: a monotonic high resolution clock, which is not affected by changes or slews
+    of the wall clock. Either perf_counter, or the clock of LSL (local_clock), in which case the time stamps are on
+    the same clock as the streams recorded by LabRecorder.
+    Kivy stamps the MotionEvents with the wall clock, so these are converted by their age.
+    """
+
+    def __init__(self, lsl=False):
+        """:param lsl: <bool> use the clock of LSL instead of perf_counter"""
+        self.lsl = lsl
+        self.now = local_clock if lsl else perf_counter
+        self.name = "lsl" if lsl else "monotonic"
+
+    def from_wall(self, t):
+        """The time on this clock of an instant which was stamped by the wall clock (i.e. by time())"""
+        return self.now() - (time() - t)
+
+    def to_lsl(self, t):
+        """The time on the LSL clock of an instant of this clock"""
+        if self.lsl:
+            return t
+        return local_clock() - (self.now() - t)
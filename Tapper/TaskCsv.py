@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+FOOTER_BYTES = 512          # the footer of Task.write_perception is well within the last bytes of the file
+BLOCK_BYTES = 1 << 20       # bytes read at once while counting the rows
+INT_COLUMNS = ["tapNum"]
+# the rows of the footer start with these
+TIME_ELAPSED = b"Time elapsed"
+PERCEPTION = b"Subject perception"
+
+
+def read_footer(path):
+    """
+    :return: <float> the time elapsed & <float> the subject's perception of it (in sec.), from the two last rows of
+             the file (see Task.write_perception). None for both if the file has no footer, i.e. if the app crashed.
+             The perception is nan if it is not a number, i.e. 'N/A' when the subject left it empty
+    """
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - FOOTER_BYTES))
+        lines = [line for line in f.read().splitlines() if line.strip()][-2:]
+    if len(lines) != 2 or not lines[0].startswith(TIME_ELAPSED) or not lines[1].startswith(PERCEPTION):
+        return None, None
+    try:
+        time_length = float(lines[0].split(b",")[-1])
+    except ValueError:
+        return None, None
+    try:
+        time_perspective = float(lines[1].split(b",")[-1])
+    except ValueError:
+        time_perspective = np.nan
+    return time_length, time_perspective
+
+
+def count_rows(path):
+    """
+    The number of rows of the data of a file, without its header & footer, as read_task_csv's n_rows, counted in
+    blocks of bytes (the file is not parsed)
+    """
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_BYTES), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+        lines += last != b"\n"
+        # the blank lines, which read_csv skips, are those before the footer
+        f.seek(max(0, f.tell() - FOOTER_BYTES))
+        tail = f.read().splitlines()[1:]
+    blank = sum(1 for line in tail if not line.strip())
+    footer = 2 if read_footer(path)[0] is not None else 0
+    return lines - blank - 1 - footer
+
+
+def iter_task_csv(path, columns, chunk_rows, n_rows=None):
+    """
+    Load the data of a file in chunks of rows, as read_task_csv's columns, for files too long to be held at once
+    :param chunk_rows: <int> number of rows per chunk
+    :param n_rows: <int> number of rows of the data, as count_rows. None to count them
+    :return: generator of <dict>s of <np.ndarray> per column
+    """
+    with open(path) as f:
+        header = f.readline().rstrip("\n").split(",")
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise ValueError("Usecols do not match columns, columns expected but not found: %s" % missing)
+    n_rows = count_rows(path) if n_rows is None else n_rows
+
+    numeric = [i for i, col in enumerate(header) if col in columns and col != "subject"]
+    read = 0
+    with pd.read_csv(path, usecols=numeric, chunksize=chunk_rows) as reader:
+        for frame in reader:
+            n = min(len(frame), n_rows - read)
+            if n <= 0:
+                break
+            read += n
+            yield {col: frame[col].to_numpy()[:n].astype(np.int64 if col in INT_COLUMNS else np.float64, copy=False)
+                   for col in frame.columns}
+
+
+def read_task_csv(path, columns):
+    """
+    Load the csv file of a task into typed numpy arrays, without the object columns read_csv makes of the subject
+    column and of the footer rows.
+    The numeric columns are parsed by the C tokenizer of pandas (still the fastest parser of decimal floats in the
+    environment), the subject is taken from the first row only and the footer is parsed separately, from the tail of
+    the file.
+    :param path: <String> a Data/<subject>/<Task>_<n>.csv file
+    :param columns: <List> the columns to load, i.e. CSV_COLS_PER_TASK[task]
+    :return: <dict> with:
+        subject          : <String>; the subject's directory name, i.e. 's01_hg_0'
+        columns          : <dict>; <np.ndarray> per column (other than the subject), in the order of the file. The
+                           int columns are int64 and the rest float64
+        n_rows           : <int>; number of rows of the data, without the footer
+        time_length      : <float>; time elapsed, in sec.
+        time_perspective : <float>; time the subject thought that passed, in sec.
+    """
+    with open(path) as f:
+        header = f.readline().rstrip("\n").split(",")
+        subject = f.readline().split(",", 1)[0]
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise ValueError("Usecols do not match columns, columns expected but not found: %s" % missing)
+
+    numeric = [i for i, col in enumerate(header) if col in columns and col != "subject"]
+    # without the subject column, the rows of the footer are parsed as numbers too (its values in the 2nd column)
+    frame = pd.read_csv(path, usecols=numeric, low_memory=False)
+    time_length, time_perspective = read_footer(path)
+    n_rows = len(frame) - (2 if time_length is not None else 0)
+
+    res = {}
+    for col in frame.columns:
+        arr = frame[col].to_numpy()[:n_rows]
+        res[col] = arr.astype(np.int64) if col in INT_COLUMNS and arr.dtype != np.int64 else arr
+    return {"subject": subject, "columns": res, "n_rows": n_rows, "time_length": time_length,
+            "time_perspective": time_perspective}
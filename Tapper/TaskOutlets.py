@@ -0,0 +1,96 @@
+import numpy as np
+import pylsl
+from pylsl import StreamInfo, StreamOutlet, IRREGULAR_RATE, cf_float32, cf_string
+
+MARKERS_STREAM = "Tapper markers"
+MOTION_STREAM = "Tapper motion"
+# between the fields of a marker, '<subject>|<session>|<event>': a subject is a directory name, which may hold spaces but
+# not this (on Windows), and the event, which may hold anything (the subject's perception), is the last field
+MARKER_SEPARATOR = "|"
+
+
+def push_chunk_stamps():
+    """
+    push_chunk_stamps of the Main.py at the root of the repository, of which the Tapper (run & packaged from its own
+    directory) can not import
+    """
+    version = getattr(pylsl, "__version__", "")
+    try:
+        return tuple(int(part) for part in version.split(".")[:2]) >= (1, 16)
+    except ValueError:
+        return False
+
+
+def parse_marker(text):
+    """
+    :param text: <String> a marker of the "Tapper markers" stream, i.e. 'name_0|Tapper_1|tap 3'
+    :return: <String> subject, <String> session, <String> event
+    """
+    subject, session, event = text.split(MARKER_SEPARATOR, 2)
+    return subject, session, event
+
+
+class TaskOutlets:
+    """
+    LSL streams of the tasks, so an XDF recording holds the taps & motion on the same clock as the other modalities,
+    and the sessions can be watched live (see OnlineMonitor.py):
+    - "Tapper markers": a string marker for every tap, for the start & end of every session and for the subject's
+                        perception of its duration, i.e. 'name_0|Tapper_1|tap 3'
+    - "Tapper motion": a [tapNum, x, y] sample for every motion sample (-1 while there is no touch)
+    Both are irregular streams, and every sample is pushed with its own time stamp (on the LSL clock).
+    The motion samples are collected into a preallocated float32 buffer, which is pushed as one chunk once it is full
+    (and at the end of every session).
+    """
+
+    def __init__(self, subject, chunk=16):
+        """
+        :param subject: <List> contains a single String: the subject's directory name
+        :param chunk: <int> number of motion samples pushed at once
+        """
+        self.subject = subject
+
+        info = StreamInfo(name=MARKERS_STREAM, type="Markers", channel_count=1, nominal_srate=IRREGULAR_RATE,
+                          channel_format=cf_string, source_id="tapper_markers")
+        self.markers = StreamOutlet(info)
+
+        info = StreamInfo(name=MOTION_STREAM, type="Touch", channel_count=3, nominal_srate=IRREGULAR_RATE,
+                          channel_format=cf_float32, source_id="tapper_motion")
+        chns = info.desc().append_child("channels")
+        for label, unit in [("tapNum", "index"), ("x_pos", "normalized"), ("y_pos", "normalized")]:
+            chn = chns.append_child("channel")
+            chn.append_child_value("label", label)
+            chn.append_child_value("unit", unit)
+            chn.append_child_value("type", "Touch")
+        self.motion = StreamOutlet(info, chunk_size=chunk)
+        self.chunk = chunk
+        self.chunk_stamps = push_chunk_stamps()
+        self.samples = np.zeros((chunk, 3), dtype=np.float32)
+        self.stamps = np.zeros(chunk)
+        self.n = 0
+        print("-------------Tapper LSL outlets were created------------")
+
+    def marker(self, session, event, t):
+        """
+        :param session: <String> i.e. 'Tapper_1'
+        :param event: <String> i.e. 'tap 3'
+        :param t: <float> time stamp, on the LSL clock
+        """
+        self.markers.push_sample([MARKER_SEPARATOR.join((self.subject[0], session, event))], t)
+
+    def sample(self, tap_num, x, y, t):
+        self.samples[self.n] = (tap_num, x, y)
+        self.stamps[self.n] = t
+        self.n += 1
+        if self.n == self.chunk:
+            self.flush()
+
+    def flush(self):
+        """Push the motion samples collected so far"""
+        if self.n > 0:
+            if self.chunk_stamps:
+                self.motion.push_chunk(self.samples[:self.n], self.stamps[:self.n].tolist())
+            else:
+                # a push per sample, to keep their time stamps
+                for sample, stamp in zip(self.samples[:self.n], self.stamps[:self.n].tolist()):
+                    self.motion.push_sample(sample, stamp)
+            self.n = 0
@@ -0,0 +1,130 @@
+"""
+Export the animation of Analyzer.animate_free_movement (the trajectory of a motion trial, with a tail in the color of
+the velocity) to a video file, instead of watching it live.
+The frames are drawn headlessly (Agg) by blitting: the static part of the figure is drawn once, and for every frame
+only the tail is drawn over it. The tail is kept in a ring buffer of fixed size and the colors are computed once, and
+every frame is piped raw (RGBA) to an encoder process, ffmpeg by default (see matplotlib's animation.ffmpeg_path).
+A frame may advance several samples (decimation), and the frame rate follows, so that the video plays at the given
+speed of the trial.
+Run from the Tapper directory:
+    python VideoExport.py Data/<subject>/<Task>_<n>.csv [--out video.mp4] [--speed 1] [--decimate N]
+"""
+import argparse
+import os
+import subprocess
+import time
+
+import matplotlib
+matplotlib.use("Agg")       # no window
+import matplotlib.pyplot as plt
+
+from util import CIRCLES, FREE_MOTION
+from Analyzer import ANIMATION_TAIL, TailBuffer, load_analysis, normalize_arr, velocity_colors
+
+VIDEO_DIR = os.path.join("Anlyzes", "videos")
+FPS = 30                    # frame rate of the video, when the decimation is not given
+SPEED = 1.0                 # of the video, relative to the trial. 1 for real time
+FIG_SIZE = (16, 9)          # in inches
+DPI = 80                    # 1280x720 pixels, encoders require even dimensions
+CODEC = "libx264"
+
+
+def frame_step(data, speed=SPEED, fps=FPS):
+    """:return: <int> the number of samples per frame, for a video of about fps frames per sec. at speed"""
+    rate = data['n_samples'] / float(data['time_length'])
+    return max(1, int(round(rate * speed / fps)))
+
+
+def render_frames(data, decimate=1, fig_size=FIG_SIZE, dpi=DPI):
+    """
+    Draw the frames of the animation of a motion trial, as animate_free_movement's
+    :param data: <dict> the data of the trial, see Analyzer.load_analysis
+    :param decimate: <int> samples per frame
+    :return: generator of the frames, a <memoryview> of (height, width, 4) RGBA bytes each, which is valid until the
+             next frame is drawn. The first item is the (width, height) of the frames
+    """
+    if data['session'] not in [FREE_MOTION, CIRCLES]:
+        raise ValueError("Only the data of sessions 'FREE_MOTION' or 'CIRCLES' can be animated")
+    points = data['npdata'][1:]
+    colors = velocity_colors(normalize_arr(data['vel']))
+
+    fig, ax = plt.subplots(figsize=fig_size, dpi=dpi)
+    try:
+        ax.set_title("subject: %s, %s session number %d" % (data['name'], data['session'], int(data['trial']) + 1))
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        ax.get_xaxis().set_visible(False)
+        ax.get_yaxis().set_visible(False)
+        ln, = ax.plot([], [], 'o', animated=True)
+        tail = TailBuffer(ANIMATION_TAIL)
+
+        canvas = fig.canvas
+        canvas.draw()
+        background = canvas.copy_from_bbox(fig.bbox)
+        yield canvas.get_width_height()
+        for start in range(0, len(points), decimate):
+            end = min(start + decimate, len(points))
+            tail.push(points[start:end])
+            canvas.restore_region(background)
+            ln.set_data(tail.x, tail.y)
+            ln.set_color(colors[end - 1])
+            ax.draw_artist(ln)
+            yield canvas.buffer_rgba()
+    finally:
+        plt.close(fig)
+
+
+def encoder_command(path, width, height, fps):
+    """The ffmpeg command which encodes the raw frames of its standard input into the video file of path"""
+    return [matplotlib.rcParams['animation.ffmpeg_path'], "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgba", "-s", "%dx%d" % (width, height), "-framerate", repr(fps),
+            "-i", "-", "-an", "-vcodec", CODEC, "-pix_fmt", "yuv420p", path]
+
+
+def export_video(data, path, speed=SPEED, decimate=None, command=encoder_command):
+    """
+    Export the animation of a motion trial to a video file
+    :param data: <dict> the data of the trial, see Analyzer.load_analysis
+    :param path: <String> the video file
+    :param speed: <float> of the video, relative to the trial. 1 for real time
+    :param decimate: <int> samples per frame. None for about FPS frames per sec.
+    :param command: <function> (path, width, height, fps) -> the command of the encoder, which reads the raw RGBA
+                    frames from its standard input
+    :return: <int> the number of frames & <float> the frame rate of the video
+    """
+    decimate = frame_step(data, speed) if decimate is None else decimate
+    fps = data['n_samples'] / float(data['time_length']) * speed / decimate
+    frames = render_frames(data, decimate)
+    width, height = next(frames)
+    encoder = subprocess.Popen(command(path, width, height, fps), stdin=subprocess.PIPE)
+    n = 0
+    try:
+        for frame in frames:
+            encoder.stdin.write(frame)
+            n += 1
+    finally:
+        frames.close()
+        encoder.stdin.close()
+        encoder.wait()
+    if encoder.returncode:
+        raise RuntimeError("the encoder failed with exit code %d" % encoder.returncode)
+    return n, fps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the animation of a motion trial to a video file")
+    parser.add_argument("path", help="a Data/<subject>/<Task>_<n>.csv file of a motion task")
+    parser.add_argument("--out", help="the video file (default: %s/<subject>_<Task>_<n>.mp4)" % VIDEO_DIR)
+    parser.add_argument("--speed", type=float, default=SPEED, help="of the video, relative to the trial")
+    parser.add_argument("--decimate", type=int, help="samples per frame (default: about %d frames per sec.)" % FPS)
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(VIDEO_DIR, "%s_%s.mp4" % (os.path.basename(os.path.dirname(args.path)),
+                                                            os.path.splitext(os.path.basename(args.path))[0]))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    data = load_analysis(args.path)
+    print("-------------Exporting %s------------" % args.path)
+    start = time.perf_counter()
+    n, fps = export_video(data, out, args.speed, args.decimate)
+    print("-------------%d frames (%.1f fps) in %.1fs, for a trial of %ss: %s------------" %
+          (n, fps, time.perf_counter() - start, data['time_length'], out))
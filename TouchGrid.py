@@ -0,0 +1,99 @@
+import math
+from heapq import heappush, heappop
+
+
+class TouchGrid:
+    """
+    Uniform-grid spatial hash of the main touches of the active channels, keyed on their screen position (spos).
+    The cells are as large as the grouping radius, so all the main touches which are close enough to a point are in
+    its own cell or in one of the 8 cells around it.
+    Besides the grid, the free (not active) channels are kept in a heap by their order, so the owner of a new touch -
+    the first channel, in order, which is either free or close enough - is found without scanning all the channels.
+    """
+
+    def __init__(self, channels, radius):
+        """
+        :param channels: <List> of TouchChannel, in the order they are offered to new touches
+        :param radius: <float> a touch closer than this to a main touch is grouped with it
+        """
+        self.radius = radius
+        self.order = {ch: i for i, ch in enumerate(channels)}
+        self.channels = list(channels)
+        self.cells = {}          # cell -> {channel: (x, y)}
+        self.where = {}          # channel -> cell
+        self.free = []           # heap of the orders of the channels that may be free
+        self.queued = set()      # the orders in the heap
+        for ch in channels:
+            if ch.isActive():
+                self.insert(ch, *ch.get_main_touch().spos)
+            else:
+                self._push_free(ch)
+
+    def cell(self, x, y):
+        return int(x // self.radius), int(y // self.radius)
+
+    def insert(self, ch, x, y):
+        """The channel became active, with its main touch at (x, y)"""
+        cell = self.cell(x, y)
+        self.cells.setdefault(cell, {})[ch] = (x, y)
+        self.where[ch] = cell
+
+    def move(self, ch, x, y):
+        """The main touch of the channel moved to (x, y)"""
+        cell = self.cell(x, y)
+        old = self.where.get(ch)
+        if old != cell:
+            self._drop(ch, old)
+            self.where[ch] = cell
+        self.cells.setdefault(cell, {})[ch] = (x, y)
+
+    def remove(self, ch):
+        """The channel is not active anymore"""
+        self._drop(ch, self.where.pop(ch, None))
+        self._push_free(ch)
+
+    def _push_free(self, ch):
+        order = self.order[ch]
+        if order not in self.queued:
+            self.queued.add(order)
+            heappush(self.free, order)
+
+    def _drop(self, ch, cell):
+        if cell is None:
+            return
+        members = self.cells[cell]
+        del members[ch]
+        if not members:
+            del self.cells[cell]
+
+    def first_free(self):
+        """The first channel, in order, which is not active. None if all are active"""
+        # the heap may hold stale entries of channels which were activated since - they are dropped lazily
+        while self.free:
+            ch = self.channels[self.free[0]]
+            if ch not in self.where:
+                return ch
+            self.queued.discard(heappop(self.free))
+        return None
+
+    def near(self, x, y):
+        """The active channels whose main touch is closer than the radius to (x, y)"""
+        cx, cy = self.cell(x, y)
+        res = []
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for ch, (mx, my) in self.cells.get((i, j), {}).items():
+                    if math.hypot(mx - x, my - y) < self.radius:
+                        res.append(ch)
+        return res
+
+    def owner(self, x, y):
+        """The channel a new touch at (x, y) belongs to: the first channel, in order, which is either not active,
+        or active with its main touch close enough to (x, y). None if there is no such channel"""
+        candidates = self.near(x, y)
+        free = self.first_free()
+        if free is not None:
+            candidates.append(free)
+        if not candidates:
+            return None
+        return min(candidates, key=self.order.__getitem__)
@@ -0,0 +1,111 @@
+import struct
+import numpy as np
+
+# A touch log is a header followed by fixed size little-endian records, one per touch event.
+# Positions are in screen coordinates (sx, sy) and time stamps are those of the MotionEvents, in sec.
+# The device of an event is the index of its name in DEVICES (the devices of Kivy's input providers); any other
+# device, which the TouchRouter never handles, is UNKNOWN_DEVICE.
+MAGIC = b"TLOG"
+VERSION = 2
+HEADER = struct.Struct("<4sH")
+RECORD = np.dtype([("kind", "u1"), ("flags", "u1"), ("device", "u1"), ("id", "<u4"),
+                   ("sx", "<f4"), ("sy", "<f4"), ("dsx", "<f4"), ("dsy", "<f4"), ("time", "<f8")])
+# the records of version 1, without the device (but the MOUSE flag)
+RECORD_V1 = np.dtype([("kind", "u1"), ("flags", "u1"), ("id", "<u4"),
+                      ("sx", "<f4"), ("sy", "<f4"), ("dsx", "<f4"), ("dsy", "<f4"), ("time", "<f8")])
+DEVICES = ("wm_touch", "mouse", "wm_pen", "mtdev", "hidinput", "tuio", "android", "mactouch", "leapfinger",
+           "unknown")
+DEVICE_CODES = {name: code for code, name in enumerate(DEVICES)}
+UNKNOWN_DEVICE = DEVICE_CODES["unknown"]
+
+# kinds
+DOWN, MOVE, UP = 0, 1, 2
+KINDS = {"down": DOWN, "move": MOVE, "up": UP}
+# flags. MOUSE only in the logs of version 1
+DOUBLE_TAP, TRIPLE_TAP, MOUSE = 1, 2, 4
+
+
+class TouchRecorder:
+    """
+    Records the raw touch events (id, sx, sy, dsx, dsy, time) into a compact binary touch log.
+    The records are collected into a preallocated numpy array, which is written to the file whenever it fills.
+    """
+
+    def __init__(self, path, block=4096):
+        """
+        :param path: <String> path of the log to create
+        :param block: <int> number of records collected before they are written to the file
+        """
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.block = np.zeros(block, dtype=RECORD)
+        self.n = 0
+        self.total = 0
+
+    def record(self, kind, touch):
+        """
+        :param kind: <String> one of 'down', 'move', 'up'
+        :param touch: <MotionEvent>
+        """
+        flags = (DOUBLE_TAP if getattr(touch, "is_double_tap", False) else 0) | \
+                (TRIPLE_TAP if getattr(touch, "is_triple_tap", False) else 0)
+        t = touch.time_end if kind == "up" and touch.time_end > 0 else touch.time_update
+        device = DEVICE_CODES.get(touch.device, UNKNOWN_DEVICE)
+        self.block[self.n] = (KINDS[kind], flags, device, touch.uid, touch.sx, touch.sy, touch.dsx, touch.dsy, t)
+        self.n += 1
+        if self.n == len(self.block):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.block[:self.n].tobytes())
+        self.total += self.n
+        self.n = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_log(path):
+    """Read a touch log into a numpy structured array of RECORD"""
+    with open(path, "rb") as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError("%s is not a touch log of version 1 to %d" % (path, VERSION))
+        if version == VERSION:
+            return np.fromfile(f, dtype=RECORD)
+        old = np.fromfile(f, dtype=RECORD_V1)
+        log = np.zeros(len(old), dtype=RECORD)
+        for name in RECORD_V1.names:
+            log[name] = old[name]
+        log["device"] = np.where(old["flags"] & MOUSE, DEVICE_CODES["mouse"], DEVICE_CODES["wm_touch"])
+        log["flags"] &= DOUBLE_TAP | TRIPLE_TAP
+        return log
+
+
+class ReplayTouch:
+    """A MotionEvent rebuilt from a touch log. Carries the attributes the touch pipeline reads"""
+
+    def __init__(self, uid, flags, device, sx, sy, t):
+        """:param device: <int> the index of the name of its device in DEVICES"""
+        self.id = self.uid = uid
+        self.device = DEVICES[device]
+        self.is_double_tap = bool(flags & DOUBLE_TAP)
+        self.is_triple_tap = bool(flags & TRIPLE_TAP)
+        self.osx, self.osy = sx, sy
+        self.psx, self.psy = sx, sy
+        self.sx, self.sy = sx, sy
+        self.dsx, self.dsy = 0.0, 0.0
+        self.time_start = self.time_update = t
+        self.time_end = -1
+
+    @property
+    def spos(self):
+        return self.sx, self.sy
+
+    def update(self, sx, sy, dsx, dsy, t):
+        self.psx, self.psy = self.sx, self.sy
+        self.sx, self.sy = sx, sy
+        self.dsx, self.dsy = dsx, dsy
+        self.time_update = t
@@ -0,0 +1,112 @@
+"""Deterministic replay of a touch log (see TouchLog.py) through the touch pipeline of Main.py, without a Kivy window.
+The events are fed through the same TouchRouter, TouchChannels, ChannelBank and ChannelScheduler as in the app, on a
+virtual clock which ticks every TIME_SERIES_DT, as fast as possible.
+Usage, from the root directory of the repository:
+    python TouchReplay.py session.tlog                          # replay and report the throughput
+    python TouchReplay.py session.tlog --write-golden gold.npy  # save the feature frames
+    python TouchReplay.py session.tlog --golden gold.npy        # compare the feature frames to the saved ones
+    python TouchReplay.py session.tlog --broadcast              # also send every frame to the clients, i.e. Max
+"""
+import os
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from Main import TouchChannel, TouchRouter, ChannelBank, ChannelScheduler, DataBroadcaster, parameters, \
+    CHANNELS, TIME_SERIES_DT
+from TouchLog import read_log, ReplayTouch, DOWN, MOVE
+
+
+class TouchReplay:
+    """Feeds the events of a touch log through the channel logic, and emits the feature frame of every tick"""
+
+    def __init__(self, log, channels=CHANNELS, dt=TIME_SERIES_DT, mouse_mode=False, broadcast=False):
+        """
+        :param log: <np.ndarray> of TouchLog.RECORD, as returned by read_log
+        :param channels: <int> number of channels
+        :param dt: <float> time between ticks, in sec.
+        :param mouse_mode: <bool> replay the mouse events instead of the touch device events
+        :param broadcast: <bool> send every frame to the clients of a DataBroadcaster too
+        """
+        self.log = log
+        self.dt = dt
+        self.bank = ChannelBank(channels)
+        self.channels = [TouchChannel(*parameters, bank=self.bank) for ch in range(channels)]
+        self.frame = None
+        listeners = [self.capture]
+        if broadcast:
+            listeners.append(DataBroadcaster(self.channels, self.bank).broadcast)
+        self.scheduler = ChannelScheduler(self.channels, listeners=listeners)
+        self.router = TouchRouter(self.channels, mouse_mode=mouse_mode, scheduler=self.scheduler)
+
+    def capture(self, dt, tick_time=None):
+        self.frame = self.bank.features()
+
+    def frames(self):
+        """Generator of (time, features) for every tick of the session, where features is a list per channel of:
+        [start_pos_x, start_pos_y, pos_x, pos_y, velocity, touch_time, mode, area]"""
+        if len(self.log) == 0:
+            return
+        touches = {}
+        handlers = {DOWN: self.router.on_touch_down, MOVE: self.router.on_touch_move}
+        next_tick = float(self.log["time"][0])
+        for kind, flags, device, uid, sx, sy, dsx, dsy, t in self.log.tolist():
+            while t >= next_tick:
+                self.scheduler.tick(self.dt)
+                yield next_tick, self.frame
+                next_tick += self.dt
+
+            if kind == DOWN:
+                touch = touches[uid] = ReplayTouch(uid, flags, device, sx, sy, t)
+            else:
+                touch = touches.get(uid)
+                if touch is None:
+                    continue
+                touch.update(sx, sy, dsx, dsy, t)
+            handlers.get(kind, self.router.on_touch_up)(touch)
+            if kind not in handlers:
+                del touches[uid]
+
+        # the state after the last event
+        self.scheduler.tick(self.dt)
+        yield next_tick, self.frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a touch log through the touch pipeline")
+    parser.add_argument("log", help="path of the touch log")
+    parser.add_argument("--channels", type=int, default=CHANNELS)
+    parser.add_argument("--mouse", action="store_true", help="replay the mouse events")
+    parser.add_argument("--broadcast", action="store_true", help="send the frames to the clients, i.e. Max")
+    parser.add_argument("--golden", help="compare the frames to this .npy file")
+    parser.add_argument("--write-golden", help="save the frames to this .npy file")
+    args = parser.parse_args()
+
+    log = read_log(args.log)
+    replay = TouchReplay(log, channels=args.channels, mouse_mode=args.mouse, broadcast=args.broadcast)
+    start = time.perf_counter()
+    frames = np.array([features for t, features in replay.frames()])
+    elapsed = time.perf_counter() - start
+    session = (log["time"][-1] - log["time"][0]) if len(log) else 0.0
+    print("%d events, %d frames (%.1f s of session) in %.3f s: %.0f frames/s, %.1fx real time" %
+          (len(log), len(frames), session, elapsed, len(frames) / elapsed, session / elapsed))
+
+    if args.write_golden:
+        np.save(args.write_golden, frames)
+        print("frames saved to %s" % args.write_golden)
+    if args.golden:
+        golden = np.load(args.golden)
+        if golden.shape != frames.shape or not np.allclose(golden, frames, rtol=1e-9, atol=1e-12):
+            bad = "shape %s != %s" % (frames.shape, golden.shape) if golden.shape != frames.shape else \
+                "first difference at frame %d" % np.argwhere(~np.isclose(golden, frames, rtol=1e-9, atol=1e-12))[0][0]
+            print("frames differ from %s: %s" % (args.golden, bad))
+            sys.exit(1)
+        print("frames match %s" % args.golden)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Convert an XDF recording (as LabRecorder writes them) once into columnar files, so that its streams are then queried
+without parsing the XDF file again: a directory with, for every stream,
+    <id>_values.npy   the samples, (n, channel_count), in the order of their time stamps (strings as unicode)
+    <id>_stamps.npy   the time stamps, sorted: the time index of the stream
+    <id>_order.npy    only when the stream was not recorded in the order of its time stamps: the index of every
+                      sample in the recording
+and meta.json, the header of the file & the metadata of every stream: its <info> fields, its type fields (the
+"Origin: <origin>, Grid: <grid>" of Main.py's generate_type_string), its header & footer and its clock offsets.
+The .npy files are memory-mapped when read, and the samples between 2 time stamps are a binary search on the time
+index, and views of the samples.
+Run from the root directory of the repository:
+    python XdfColumnar.py recording.xdf [--out recording_columns]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from XdfReader import XdfFile
+
+META = "meta.json"
+VERSION = 1
+SUFFIX = "_columns"         # of the directory of a recording, by default
+SORT_BLOCK = 2 ** 20        # samples reordered at a time, of a stream which was not recorded in order
+
+
+def parse_type_string(type_string):
+    """
+    :param type_string: <String> the type of a stream, e.g. "Origin: Bottom_left, Grid: Rectangle"
+    :return: <dict> its fields, e.g. {"Origin": "Bottom_left", "Grid": "Rectangle"}. Empty for other types
+    """
+    fields = {}
+    for field in type_string.split(","):
+        key, sep, value = field.partition(":")
+        if not sep:
+            return {}
+        fields[key.strip()] = value.strip()
+    return fields
+
+
+def column_path(directory, stream_id, column):
+    return os.path.join(directory, "%d_%s.npy" % (stream_id, column))
+
+
+def convert_stream(f, stream, directory):
+    """
+    Write the columns of a stream, chunk by chunk for numeric streams
+    :return: <dict> the metadata of the stream
+    """
+    n = sum(chunk.n for chunk in stream.chunks)
+    values_path = column_path(directory, stream.id, "values")
+    stamps = np.lib.format.open_memmap(column_path(directory, stream.id, "stamps"), "w+", np.float64, (n,))
+    if stream.dtype is None:
+        values = []
+    else:
+        values = np.lib.format.open_memmap(values_path, "w+", stream.dtype, (n, stream.channel_count))
+    pos = 0
+    for v, s in f.blocks(stream):
+        if stream.dtype is None:
+            values.extend(v)
+        else:
+            values[pos:pos + len(s)] = v
+        stamps[pos:pos + len(s)] = s
+        pos += len(s)
+    if stream.dtype is None:
+        values = np.array(values, dtype=str).reshape(n, stream.channel_count)
+
+    ordered = bool(np.all(stamps[1:] >= stamps[:-1]))
+    if not ordered:
+        # stable, so that the samples of a same time stamp stay in the order of the recording
+        order = np.argsort(stamps, kind="stable")
+        np.save(column_path(directory, stream.id, "order"), order)
+        stamps[:] = stamps[order]
+        if stream.dtype is None:
+            values = values[order]
+        else:
+            # into another file, SORT_BLOCK samples at a time
+            sorted_values = np.lib.format.open_memmap(values_path + ".tmp", "w+", stream.dtype, values.shape)
+            for start in range(0, n, SORT_BLOCK):
+                sorted_values[start:start + SORT_BLOCK] = values[order[start:start + SORT_BLOCK]]
+            sorted_values.flush()
+            del values, sorted_values
+            os.replace(values_path + ".tmp", values_path)
+    if stream.dtype is None:
+        np.save(values_path, values)
+    elif ordered:
+        values.flush()
+    stamps.flush()
+    return {"id": stream.id, "name": stream.name, "type": stream.type, "type_fields": parse_type_string(stream.type),
+            "channel_count": stream.channel_count, "nominal_srate": stream.nominal_srate,
+            "channel_format": stream.channel_format, "n_samples": n, "ordered": ordered, "info": stream.info,
+            "header": stream.header, "footer": stream.footer, "clock_times": stream.clock_times,
+            "clock_values": stream.clock_values}
+
+
+def convert(path, directory=None):
+    """
+    Convert an XDF recording into columnar files
+    :param path: <String> an .xdf file
+    :param directory: <String> the directory of the columns, <path without .xdf>_columns by default
+    :return: <String> the directory
+    """
+    directory = directory or os.path.splitext(path)[0] + SUFFIX
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, META)):
+        os.remove(os.path.join(directory, META))
+    with XdfFile(path) as f:
+        streams = [convert_stream(f, stream, directory) for stream in f.streams.values()]
+        meta = {"version": VERSION, "source": os.path.abspath(path), "header": f.header, "streams": streams}
+    # written last: a directory without it is an interrupted conversion
+    with open(os.path.join(directory, META), "w") as out:
+        json.dump(meta, out, indent=1)
+    return directory
+
+
+class ColumnarStream:
+    """A stream of a converted recording: its metadata, and its columns memory-mapped when first used"""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.id = meta["id"]
+        self.name = meta["name"]
+        self.type = meta["type"]
+        self.type_fields = meta["type_fields"]
+        self.info = meta["info"]
+        self.channel_count = meta["channel_count"]
+        self.nominal_srate = meta["nominal_srate"]
+        self.channel_format = meta["channel_format"]
+        self.clock_times = meta["clock_times"]
+        self.clock_values = meta["clock_values"]
+        self._values = self._stamps = None
+
+    def __repr__(self):
+        return "ColumnarStream(%d, %r, %r, %d x %s)" % (self.id, self.name, self.type, self.channel_count,
+                                                        self.channel_format)
+
+    @property
+    def values(self):
+        """<np.ndarray> (n, channel_count) the samples, in the order of their time stamps"""
+        if self._values is None:
+            self._values = np.load(column_path(self.directory, self.id, "values"), mmap_mode="r")
+        return self._values
+
+    @property
+    def stamps(self):
+        """<np.ndarray> the sorted time stamps"""
+        if self._stamps is None:
+            self._stamps = np.load(column_path(self.directory, self.id, "stamps"), mmap_mode="r")
+        return self._stamps
+
+    @property
+    def order(self):
+        """<np.ndarray> the index of every sample in the recording"""
+        if self.meta["ordered"]:
+            return np.arange(self.meta["n_samples"])
+        return np.load(column_path(self.directory, self.id, "order"), mmap_mode="r")
+
+    def span(self, t0=None, t1=None):
+        """:return: <slice> of the samples of time stamps between t0 & t1 (both included; None for no bound)"""
+        start = 0 if t0 is None else int(np.searchsorted(self.stamps, t0, side="left"))
+        end = len(self.stamps) if t1 is None else int(np.searchsorted(self.stamps, t1, side="right"))
+        return slice(start, max(start, end))
+
+    def between(self, t0=None, t1=None):
+        """
+        :return: the samples (<np.ndarray> (n, channel_count)) & the time stamps (<np.ndarray>) between t0 & t1, as
+                 views of the memory-mapped columns
+        """
+        span = self.span(t0, t1)
+        return self.values[span], self.stamps[span]
+
+
+class ColumnarRecording:
+    """A recording converted by convert"""
+
+    def __init__(self, directory):
+        """:param directory: <String> the directory of the columns"""
+        self.directory = directory
+        meta_path = os.path.join(directory, META)
+        if not os.path.exists(meta_path):
+            raise ValueError("%s is not a converted recording (or its conversion was interrupted)" % directory)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("version") != VERSION:
+            raise ValueError("%s was converted by another version (%s)" % (directory, meta.get("version")))
+        self.source = meta["source"]
+        self.header = meta["header"]
+        self.streams = {s["id"]: ColumnarStream(directory, s) for s in meta["streams"]}
+
+    def find(self, **fields):
+        """
+        :param fields: fields of the <info> of the stream header (e.g. name="SendDataC"), or of its type
+                       (e.g. Grid="Rectangle")
+        :return: <List> of the ColumnarStreams which match all the fields, in the order of the file
+        """
+        return [s for s in self.streams.values()
+                if all(s.info.get(k, s.type_fields.get(k)) == v for k, v in fields.items())]
+
+
+def open_recording(path):
+    """
+    :param path: <String> an .xdf file, converted at the first time, or the directory of a converted recording
+    :return: <ColumnarRecording>
+    """
+    if os.path.isdir(path):
+        return ColumnarRecording(path)
+    directory = os.path.splitext(path)[0] + SUFFIX
+    if not os.path.exists(os.path.join(directory, META)) or \
+            os.path.getmtime(os.path.join(directory, META)) < os.path.getmtime(path):
+        convert(path, directory)
+    return ColumnarRecording(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an XDF recording into columnar files")
+    parser.add_argument("path", help="an .xdf file")
+    parser.add_argument("--out", help="the directory of the columns (default: <path without .xdf>%s)" % SUFFIX)
+    args = parser.parse_args()
+
+    print("-------------Converting %s------------" % args.path)
+    start = time.perf_counter()
+    out = convert(args.path, args.out)
+    for stream in ColumnarRecording(out).streams.values():
+        print("%r: %d samples" % (stream, len(stream.stamps)))
+    print("-------------Converted in %.1fs: %s------------" % (time.perf_counter() - start, out))
@@ -0,0 +1,275 @@
+import mmap
+import struct
+from xml.etree.ElementTree import fromstring
+
+import numpy as np
+
+# An XDF file (see https://github.com/sccn/xdf/wiki/Specifications) is the magic code followed by chunks:
+# [NumLengthBytes (1, 4 or 8)] [Length, of the tag & the content] [Tag (uint16)] [Content]
+# The content of the stream chunks begins with the stream id (uint32), and the samples of a [Samples] chunk are:
+# [NumSampleBytes] [NumSamples] then, per sample, [TimeStampBytes (0 or 8)] [TimeStamp (double)] [Values]
+# where a numeric value is little-endian and a string value is [NumLengthBytes] [Length] [bytes].
+MAGIC = b"XDF:"
+FILE_HEADER, STREAM_HEADER, SAMPLES, CLOCK_OFFSET, BOUNDARY, STREAM_FOOTER = 1, 2, 3, 4, 5, 6
+FORMATS = {"float32": "<f4", "double64": "<f8", "int8": "i1", "int16": "<i2", "int32": "<i4", "int64": "<i8"}
+VARLEN = {1: struct.Struct("<B"), 4: struct.Struct("<I"), 8: struct.Struct("<Q")}
+STREAM_ID = struct.Struct("<I")
+TAG = struct.Struct("<H")
+DOUBLE = struct.Struct("<d")
+# the beginning of a chunk, up to the time stamp of its first sample: [NumLengthBytes] [Length] [Tag] [StreamId]
+# [NumSampleBytes] [NumSamples] [TimeStampBytes] [TimeStamp]
+HEAD_BYTES = 1 + 8 + TAG.size + STREAM_ID.size + 1 + 8 + 1 + DOUBLE.size
+
+
+def read_varlen(buf, pos):
+    """:return: <int> the variable-length integer at pos of buf, <int> the position after it"""
+    n = buf[pos]
+    if n not in VARLEN:
+        raise ValueError("invalid variable-length integer at byte %d" % pos)
+    return VARLEN[n].unpack_from(buf, pos + 1)[0], pos + 1 + n
+
+
+def xml_fields(xml):
+    """:return: <dict> the text of every child element of the root of xml, e.g. <info>'s name, type..."""
+    return {child.tag: child.text or "" for child in fromstring(xml)}
+
+
+class Chunk:
+    """
+    The location of a [Samples] chunk in the file.
+    A numeric chunk where every sample has its time stamp (as LabRecorder writes them) has fixed size samples, and
+    its samples are read as a numpy view of the file: its first & last time stamps are known without decoding it.
+    """
+
+    def __init__(self, start, end, n, fixed=False, first=None, last=None):
+        """
+        :param start: <int> offset of the first sample in the file
+        :param end: <int> offset of the end of the chunk
+        :param n: <int> number of samples
+        :param fixed: <bool> whether the samples have a fixed size
+        :param first: <float> time stamp of the first sample of a fixed chunk
+        :param last: <float> time stamp of the last sample of a fixed chunk
+        """
+        self.start, self.end, self.n = start, end, n
+        self.fixed, self.first, self.last = fixed, first, last
+
+
+class XdfStream:
+    """A stream of an XDF file: its header, footer, clock offsets & the locations of its [Samples] chunks"""
+
+    def __init__(self, stream_id, header):
+        self.id = stream_id
+        self.header = header
+        self.info = xml_fields(header)
+        self.name = self.info.get("name", "")
+        self.type = self.info.get("type", "")
+        self.channel_count = int(self.info["channel_count"])
+        self.nominal_srate = float(self.info.get("nominal_srate", 0) or 0)
+        self.channel_format = self.info["channel_format"]
+        self.footer = None
+        self.chunks = []
+        self.clock_times = []
+        self.clock_values = []
+        if self.channel_format == "string":
+            self.dtype = self.record = None
+        else:
+            self.dtype = np.dtype(FORMATS[self.channel_format])
+            # a sample of a fixed chunk
+            self.record = np.dtype([("stamp_bytes", "u1"), ("stamp", "<f8"),
+                                    ("values", self.dtype, (self.channel_count,))])
+
+    def __repr__(self):
+        return "XdfStream(%d, %r, %r, %d x %s)" % (self.id, self.name, self.type, self.channel_count,
+                                                   self.channel_format)
+
+
+class XdfFile:
+    """
+    Lazy access to an XDF file (as recorded by LabRecorder): the file is memory-mapped and indexed once (the stream
+    headers & footers, the clock offsets and the location of every [Samples] chunk), and the samples of a stream are
+    decoded only when they are read, only for that stream, and only for the chunks within the time range.
+    The time stamps are those of the file, i.e. as pyxdf.load_xdf(synchronize_clocks=False,
+    dejitter_timestamps=False); the clock offsets of every stream are available to synchronize them.
+    """
+
+    def __init__(self, path):
+        """:param path: <String> an .xdf file"""
+        self.path = path
+        self.file = open(path, "rb")
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_RANDOM"):
+            # the chunks are read here & there: no read ahead, which would bring the chunks of the other streams
+            self.buf.madvise(mmap.MADV_RANDOM)
+        if self.buf[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("%s is not an XDF file" % path)
+        self.header = {}
+        self.streams = {}
+        self.index()
+
+    def index(self):
+        """
+        Walk over the chunks of the file, reading only their headers (and the time stamps at their ends).
+        They are read from the file, not from the map, which would map the pages around them (those of every stream)
+        """
+        f, pos, size = self.file, len(MAGIC), len(self.buf)
+        while pos < size:
+            f.seek(pos)
+            head = f.read(HEAD_BYTES)
+            try:
+                length, content = read_varlen(head, 0)
+            except (ValueError, IndexError, struct.error):
+                break       # a truncated file, as of a crashed recording
+            end = pos + content + length
+            if end > size or len(head) < content + TAG.size:
+                break
+            tag = TAG.unpack_from(head, content)[0]
+            content += TAG.size
+            if tag == FILE_HEADER:
+                self.header = xml_fields(self.read_bytes(pos + content, end))
+            elif tag in (STREAM_HEADER, SAMPLES, CLOCK_OFFSET, STREAM_FOOTER):
+                stream_id = STREAM_ID.unpack_from(head, content)[0]
+                content += STREAM_ID.size
+                if tag == STREAM_HEADER:
+                    self.streams[stream_id] = XdfStream(stream_id, self.read_bytes(pos + content, end).decode(
+                        "utf-8", "replace"))
+                elif stream_id not in self.streams:
+                    pass    # a chunk of a stream without a header
+                elif tag == SAMPLES:
+                    self.streams[stream_id].chunks.append(self.index_chunk(self.streams[stream_id], head, pos,
+                                                                           content, end))
+                elif tag == CLOCK_OFFSET:
+                    self.streams[stream_id].clock_times.append(DOUBLE.unpack_from(head, content)[0])
+                    self.streams[stream_id].clock_values.append(DOUBLE.unpack_from(head, content + DOUBLE.size)[0])
+                else:
+                    self.streams[stream_id].footer = self.read_bytes(pos + content, end).decode("utf-8", "replace")
+            pos = end
+
+    def read_bytes(self, start, end):
+        self.file.seek(start)
+        return self.file.read(end - start)
+
+    def index_chunk(self, stream, head, pos, content, end):
+        """:param head: <bytes> the first HEAD_BYTES of the chunk, which begins at pos of the file"""
+        n, start = read_varlen(head, content)
+        start += pos
+        if stream.record is not None and n and end - start == n * stream.record.itemsize:
+            # as a sample is 1 + 8 bytes of time stamp at most, only samples which all have their time stamps fill it
+            first = DOUBLE.unpack_from(head, start - pos + 1)[0]
+            last = DOUBLE.unpack(self.read_bytes(start + (n - 1) * stream.record.itemsize + 1,
+                                                 start + (n - 1) * stream.record.itemsize + 1 + DOUBLE.size))[0]
+            return Chunk(start, end, n, True, first, last)
+        return Chunk(start, end, n)
+
+    def find(self, **fields):
+        """
+        :param fields: fields of the <info> of the stream header, e.g. name="SendDataC" or type="EEG"
+        :return: <List> of the XdfStreams which match all the fields, in the order of the file
+        """
+        return [s for s in self.streams.values() if all(s.info.get(k) == v for k, v in fields.items())]
+
+    def decode(self, stream, chunk, last_stamp):
+        """
+        Decode a chunk which is not fixed, sample by sample (as pyxdf): a missing time stamp is the previous one plus
+        the sampling interval
+        :return: values (<np.ndarray> (n, channel_count), or <List> of <List>s of strings), <np.ndarray> time stamps
+        """
+        buf, pos = self.buf, chunk.start
+        tdiff = 1.0 / stream.nominal_srate if stream.nominal_srate > 0 else 0.0
+        stamps = np.zeros(chunk.n)
+        if stream.dtype is None:
+            values = [[None] * stream.channel_count for _ in range(chunk.n)]
+        else:
+            values = np.zeros((chunk.n, stream.channel_count), dtype=stream.dtype)
+            sample_bytes = stream.channel_count * stream.dtype.itemsize
+        for k in range(chunk.n):
+            if buf[pos]:
+                last_stamp = DOUBLE.unpack_from(buf, pos + 1)[0]
+                pos += 1 + DOUBLE.size
+            else:
+                last_stamp += tdiff
+                pos += 1
+            stamps[k] = last_stamp
+            if stream.dtype is None:
+                for ch in range(stream.channel_count):
+                    length, pos = read_varlen(buf, pos)
+                    values[k][ch] = buf[pos:pos + length].decode(errors="replace")
+                    pos += length
+            else:
+                values[k] = np.frombuffer(buf, stream.dtype, stream.channel_count, pos)
+                pos += sample_bytes
+        return values, stamps
+
+    def blocks(self, stream, t0=None, t1=None, mapped=True):
+        """
+        The samples of a stream, chunk by chunk, for streams too long to be held at once.
+        :param stream: <XdfStream> or <int> stream id
+        :param t0: <float> first time stamp, None for the beginning of the stream
+        :param t1: <float> last time stamp, None for the end of the stream
+        :param mapped: <bool> whether the samples of fixed chunks are views of the memory-mapped file (no copy, valid
+                       until the file is closed), or copies read from the file (which do not map the pages around the
+                       chunks, i.e. the other streams, in memory)
+        :return: generator of values (<np.ndarray> (n, channel_count), or <List> of <List>s of strings) &
+                 <np.ndarray> time stamps
+        """
+        stream = self.streams[stream] if isinstance(stream, int) else stream
+        last_stamp = 0.0
+        for chunk in stream.chunks:
+            if chunk.fixed:
+                if (t0 is not None and chunk.last < t0) or (t1 is not None and chunk.first > t1):
+                    last_stamp = chunk.last
+                    continue
+                if mapped:
+                    samples = np.frombuffer(self.buf, stream.record, chunk.n, chunk.start)
+                else:
+                    samples = np.empty(chunk.n, stream.record)
+                    self.file.seek(chunk.start)
+                    self.file.readinto(samples)
+                values, stamps = samples["values"], samples["stamp"]
+            else:
+                values, stamps = self.decode(stream, chunk, last_stamp)
+            if len(stamps):
+                last_stamp = stamps[-1]
+            if t0 is not None or t1 is not None:
+                keep = np.ones(len(stamps), dtype=bool)
+                if t0 is not None:
+                    keep &= stamps >= t0
+                if t1 is not None:
+                    keep &= stamps <= t1
+                if not keep.all():
+                    values = values[keep] if stream.dtype is not None else \
+                        [v for v, k in zip(values, keep) if k]
+                    stamps = stamps[keep]
+            if len(stamps):
+                yield values, stamps
+
+    def read(self, stream, t0=None, t1=None):
+        """
+        The samples of a stream, as pyxdf.load_xdf's time_series & time_stamps
+        :param stream: <XdfStream> or <int> stream id
+        :param t0: <float> first time stamp, None for the beginning of the stream
+        :param t1: <float> last time stamp, None for the end of the stream
+        :return: time series (<np.ndarray> (n, channel_count), or <List> of <List>s of strings) &
+                 <np.ndarray> time stamps
+        """
+        stream = self.streams[stream] if isinstance(stream, int) else stream
+        blocks = list(self.blocks(stream, t0, t1, mapped=False))
+        if stream.dtype is None:
+            values = [sample for v, _ in blocks for sample in v]
+        elif blocks:
+            values = np.concatenate([v for v, _ in blocks])
+        else:
+            values = np.zeros((0, stream.channel_count), dtype=stream.dtype)
+        stamps = np.concatenate([s for _, s in blocks]) if blocks else np.zeros(0)
+        return values, stamps
+
+    def close(self):
+        if not self.buf.closed:
+            self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()